@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Adaptive analiz aralığı (cadence) hesaplayıcı
+Her session için bir sonraki frame'in ne zaman gönderilmesi gerektiğini önerir
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+class CadenceController:
+    """Sonuç kararlılığı, yüz varlığı ve sunucu yüküne göre analiz aralığı önerir.
+
+    - Duygu değişiyorsa (çocuk durum değiştiriyor) aralık kısalır
+    - Sonuçlar kararlıysa aralık yavaşça uzar
+    - Yüz yoksa (çocuk ekran başında değil) aralık katlanarak uzar
+    - Sunucu kapasitesinin üstünde eş zamanlı analiz varsa bütün öneriler ölçeklenir
+    """
+
+    def __init__(self, base_interval=None, min_interval=None, max_interval=None,
+                 capacity=None, history_size=5, session_ttl=600.0):
+        self.base_interval = base_interval if base_interval is not None else _env_float("ANALYSIS_BASE_INTERVAL", 3.0)
+        self.min_interval = min_interval if min_interval is not None else _env_float("ANALYSIS_MIN_INTERVAL", 1.0)
+        self.max_interval = max_interval if max_interval is not None else _env_float("ANALYSIS_MAX_INTERVAL", 12.0)
+        self.capacity = capacity if capacity is not None else max(1, int(_env_float("ANALYSIS_CAPACITY", os.cpu_count() or 1)))
+        # Global yük kolu: 1.0 = normal, 2.0 = bütün client'lar iki kat seyrek gönderir
+        self.scale = _env_float("ANALYSIS_CADENCE_SCALE", 1.0)
+        self.history_size = history_size
+        self.session_ttl = session_ttl
+
+        self._lock = threading.Lock()
+        self._sessions = {}  # session_id -> {"history": deque, "last_seen": float}
+        self._inflight = 0
+        self._latency_ewma = 0.0
+
+    # ----- Yük takibi -----
+
+    def begin(self, count=1):
+        """Analiz başladığında çağrılır (batch için frame sayısı)"""
+        with self._lock:
+            self._inflight += count
+
+    def end(self, latency, count=1):
+        """Analiz bittiğinde süresiyle (saniye) birlikte çağrılır"""
+        with self._lock:
+            self._inflight = max(0, self._inflight - count)
+            if self._latency_ewma == 0.0:
+                self._latency_ewma = latency
+            else:
+                self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+
+    def load_factor(self):
+        """>1.0 ise sunucu kapasitesinin üstünde çalışıyor"""
+        with self._lock:
+            return self._load_factor_locked()
+
+    def _load_factor_locked(self):
+        concurrency_load = self._inflight / float(self.capacity)
+        # Ortalama analiz süresi base aralığı aşıyorsa client'lar bizi yetişemeyeceğimiz hızda besliyor
+        latency_load = self._latency_ewma / self.base_interval if self.base_interval > 0 else 0.0
+        return max(concurrency_load, latency_load)
+
+    def set_scale(self, scale):
+        with self._lock:
+            self.scale = max(0.1, float(scale))
+
+    # ----- Session takibi -----
+
+    def observe(self, session_id, emotion, face_detected):
+        """Session için yeni analiz sonucunu kaydet"""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {"history": deque(maxlen=self.history_size), "last_seen": now}
+                self._sessions[session_id] = session
+            session["history"].append((emotion, bool(face_detected)))
+            session["last_seen"] = now
+            self._evict_stale_locked(now)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_stale_locked(self, now):
+        stale = [sid for sid, s in self._sessions.items() if now - s["last_seen"] > self.session_ttl]
+        for sid in stale:
+            del self._sessions[sid]
+
+    def recommend(self, session_id):
+        """Bir sonraki analiz için önerilen bekleme süresi (saniye)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            history = list(session["history"]) if session else []
+            load = self._load_factor_locked()
+            scale = self.scale
+
+        interval = self._interval_for_history(history)
+
+        # Sunucu yükü: kapasite aşıldıysa aralığı yük oranında aç
+        if load > 1.0:
+            interval *= min(load, 4.0)
+
+        interval *= scale
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _interval_for_history(self, history):
+        if not history:
+            return self.base_interval
+
+        # Ardışık yüz yok sayısı -> çocuk ekran başında değil, katlanarak geri çekil
+        absent_streak = 0
+        for _, face in reversed(history):
+            if face:
+                break
+            absent_streak += 1
+        if absent_streak >= 2:
+            return self.base_interval * (2 ** (absent_streak - 1))
+
+        latest = history[-1][0]
+        if len(history) >= 2 and history[-2][0] != latest:
+            # Durum değişiyor, daha sık bak
+            return self.min_interval
+
+        # Son sonuçla aynı olan ardışık sonuç sayısı kadar yavaşça uzat
+        stable_streak = 0
+        for emotion, _ in reversed(history):
+            if emotion != latest:
+                break
+            stable_streak += 1
+        return self.base_interval * (1.0 + 0.25 * (stable_streak - 1))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "inflight": self._inflight,
+                "capacity": self.capacity,
+                "latencyEwmaMs": round(self._latency_ewma * 1000, 1),
+                "loadFactor": round(self._load_factor_locked(), 3),
+                "scale": self.scale,
+            }
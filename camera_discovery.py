@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Kamera keşfi ve kayıtlı capture profili
+Backend/index kombinasyonlarını paralel dener, çalışan profili (backend, index,
+çözünürlük, FOURCC) diske yazar; sonraki açılışlar doğrudan bu profilden başlar.
+
+Ortam değişkenleri:
+    CAMERA_PROFILE_PATH=<dosya>   (varsayılan: bu klasörde camera_profile.json)
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+DEFAULT_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "camera_profile.json")
+AUTO_SOURCE = "auto"
+
+# IriUn ve çoğu USB webcam için iyi çalışan ayarlar
+DEFAULT_WIDTH = 640
+DEFAULT_HEIGHT = 480
+DEFAULT_FPS = 30
+DEFAULT_FOURCC = "MJPG"
+
+BLACK_FRAME_BRIGHTNESS = 10  # ortalama parlaklık bunun altındaysa siyah frame
+MAX_FAILED_READS = 20        # ardışık bu kadar başarısız read'de cihaz yok/meşgul sayılır
+FAILED_READ_BACKOFF = 0.02   # başarısız read sonrası bekleme (read hemen dönerse CPU yakmasın)
+
+
+def profile_path():
+    return os.environ.get("CAMERA_PROFILE_PATH") or DEFAULT_PROFILE_PATH
+
+
+def candidate_backends():
+    """Platforma uygun backend'ler, tercih sırasına göre -> [(id, isim)]"""
+    if sys.platform.startswith("win"):
+        names = [("CAP_DSHOW", "DirectShow"), ("CAP_MSMF", "Media Foundation")]
+    elif sys.platform == "darwin":
+        names = [("CAP_AVFOUNDATION", "AVFoundation")]
+    else:
+        names = [("CAP_V4L2", "Video4Linux2")]
+    backends = [(getattr(cv2, attr), name) for attr, name in names if hasattr(cv2, attr)]
+    backends.append((cv2.CAP_ANY, "Default"))
+    return backends
+
+
+def _fourcc_code(fourcc):
+    return cv2.VideoWriter_fourcc(*fourcc) if fourcc else None
+
+
+def _fourcc_name(code):
+    code = int(code)
+    chars = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4))
+    return chars if chars.isprintable() and chars.strip() else None
+
+
+def _apply_settings(cap, width, height, fps, fourcc):
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, _fourcc_code(fourcc))
+    if width and height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+
+
+def wait_for_valid_frame(cap, timeout=2.0, min_brightness=BLACK_FRAME_BRIGHTNESS):
+    """Siyah olmayan ilk frame'i bekle (başarılı read'ler arasında sleep yok; read bir sonraki frame'i bekler)
+
+    -> (frame, okunan frame sayısı) veya (None, sayı)
+    """
+    deadline = time.time() + timeout
+    reads = failures = 0
+    while time.time() < deadline:
+        ret, frame = cap.read()
+        reads += 1
+        if not ret or frame is None:
+            failures += 1
+            if failures >= MAX_FAILED_READS:
+                break
+            time.sleep(FAILED_READ_BACKOFF)
+            continue
+        failures = 0
+        # Tüm pikselleri toplamak yerine seyrek örnekle: warm-up kontrolü ucuz kalsın
+        if frame[::8, ::8].mean() > min_brightness:
+            return frame, reads
+    return None, reads
+
+
+def _source_arg(source):
+    """"0" gibi string index'leri int'e çevir, URL/dosya yolunu olduğu gibi bırak"""
+    if isinstance(source, int):
+        return source
+    text = str(source).strip()
+    return int(text) if text.isdigit() else text
+
+
+def open_with_profile(profile, warmup_timeout=2.0):
+    """Kayıtlı profille kamerayı aç -> (cap, frame) veya (None, None)"""
+    started = time.time()
+    cap = cv2.VideoCapture(_source_arg(profile["index"]), int(profile["backend"]))
+    if not cap.isOpened():
+        cap.release()
+        return None, None
+    _apply_settings(cap, profile.get("width"), profile.get("height"), profile.get("fps"), profile.get("fourcc"))
+    frame, reads = wait_for_valid_frame(cap, warmup_timeout)
+    if frame is None:
+        cap.release()
+        return None, None
+    print(f"⚡ [CAMERA] Kayıtlı profille açıldı: {profile['backendName']} #{profile['index']} "
+          f"({reads} frame, {(time.time() - started) * 1000:.0f}ms)")
+    return cap, frame
+
+
+def _probe(backend, backend_name, index, settings, warmup_timeout):
+    """Tek backend/index kombinasyonunu dene -> (profile, cap) veya (None, None)"""
+    started = time.time()
+    cap = cv2.VideoCapture(_source_arg(index), backend)
+    try:
+        if not cap.isOpened():
+            cap.release()
+            return None, None
+        _apply_settings(cap, *settings)
+        frame, reads = wait_for_valid_frame(cap, warmup_timeout)
+        if frame is None:
+            cap.release()
+            return None, None
+    except Exception:
+        cap.release()
+        return None, None
+
+    h, w = frame.shape[:2]
+    profile = {
+        "backend": int(backend),
+        "backendName": backend_name,
+        "index": index,
+        "width": w,
+        "height": h,
+        "fps": settings[2],
+        "fourcc": _fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)) or settings[3],
+        "warmupFrames": reads,
+        "openMs": round((time.time() - started) * 1000),
+    }
+    return profile, cap
+
+
+def probe_parallel(candidates, timeout=5.0, warmup_timeout=2.0, settings=None, keep_best=True):
+    """(backend, isim, index) adaylarını dene: farklı index'ler paralel, aynı index'in backend'leri sırayla
+
+    keep_best=True  -> en öncelikli başarılı aday için (profile, açık cap) döndürür
+    keep_best=False -> bütün başarılı profillerin listesi (cap'ler kapatılır)
+    Zaman aşımına uğrayan (takılan) probe'lar daemon thread'de kalır; geç biterlerse kendi cap'lerini kapatır.
+    """
+    settings = settings or (DEFAULT_WIDTH, DEFAULT_HEIGHT, DEFAULT_FPS, DEFAULT_FOURCC)
+    results = queue.Queue()
+    state_lock = threading.Lock()
+    state = {"closed": False}
+
+    def worker(group):
+        opened = False
+        for priority, backend, backend_name, index in group:
+            if opened:
+                profile, cap = None, None  # aynı cihaz başka backend'le zaten açıldı
+            else:
+                profile, cap = _probe(backend, backend_name, index, settings, warmup_timeout)
+                opened = profile is not None
+            with state_lock:
+                if state["closed"]:
+                    if cap is not None:
+                        cap.release()
+                    return
+                results.put((priority, profile, cap))
+
+    # Aynı index'in backend'leri aynı cihazdır (Linux'ta V4L2 #i ve CAP_ANY #i = /dev/video{i});
+    # paralel açılırlarsa biri EBUSY alır veya yarım ayarlı cihazı görür. Index'ler paralel,
+    # bir index'in backend'leri öncelik sırasıyla denenir; biri çalışınca diğerleri atlanır.
+    groups = {}
+    for priority, (backend, backend_name, index) in enumerate(candidates):
+        groups.setdefault(str(index), []).append((priority, backend, backend_name, index))
+
+    for key, group in groups.items():
+        threading.Thread(target=worker, args=(group,), name=f"camera_probe_{key}", daemon=True).start()
+
+    deadline = time.time() + timeout
+    pending = set(range(len(candidates)))
+    found = {}  # priority -> (profile, cap)
+    while pending and time.time() < deadline:
+        try:
+            priority, profile, cap = results.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            break
+        pending.discard(priority)
+        if profile is not None:
+            found[priority] = (profile, cap)
+        # Daha öncelikli bekleyen aday kalmadıysa hemen dön
+        if keep_best and found and min(found) < min(pending, default=len(candidates)):
+            break
+
+    with state_lock:
+        state["closed"] = True
+        while not results.empty():
+            priority, profile, cap = results.get_nowait()
+            if profile is not None:
+                found[priority] = (profile, cap)
+
+    if not keep_best:
+        for profile, cap in found.values():
+            cap.release()
+        return [found[p][0] for p in sorted(found)]
+
+    if not found:
+        return None, None
+    best = min(found)
+    for priority, (_, cap) in found.items():
+        if priority != best:
+            cap.release()
+    return found[best]
+
+
+def camera_candidates(source=None, max_index=5):
+    """Kaynağa göre aday listesi: index verilirse sadece o index, URL ise sadece CAP_ANY"""
+    backends = candidate_backends()
+    if source is None or str(source) == AUTO_SOURCE:
+        return [(b, name, idx) for b, name in backends for idx in range(max_index)]
+    arg = _source_arg(source)
+    if isinstance(arg, int):
+        return [(b, name, arg) for b, name in backends]
+    return [(cv2.CAP_ANY, "Default", arg)]
+
+
+def load_profiles():
+    try:
+        with open(profile_path()) as f:
+            data = json.load(f)
+        return data.get("profiles", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile(source_key, profile):
+    path = profile_path()
+    profiles = load_profiles()
+    profiles[source_key] = profile
+    tmp = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump({"profiles": profiles}, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ [CAMERA] Profil kaydedilemedi: {e}")
+
+
+def open_camera(source=None, use_cache=True, timeout=5.0):
+    """Kamerayı mümkün olan en hızlı yoldan aç -> (cap, profile, ilk frame) veya (None, None, None)
+
+    1. Kayıtlı profil varsa doğrudan onunla aç
+    2. Olmazsa backend/index'leri paralel dene, kazananı kaydet
+    """
+    source_key = AUTO_SOURCE if source is None else str(source)
+
+    if use_cache:
+        profile = load_profiles().get(source_key)
+        if profile:
+            cap, frame = open_with_profile(profile)
+            if cap is not None:
+                return cap, profile, frame
+            print("⚠️ [CAMERA] Kayıtlı profil çalışmadı, yeniden keşfediliyor...")
+
+    started = time.time()
+    profile, cap = probe_parallel(camera_candidates(source), timeout=timeout)
+    if profile is None:
+        print(f"❌ [CAMERA] Çalışan kamera bulunamadı ({time.time() - started:.1f}s)")
+        return None, None, None
+
+    print(f"✅ [CAMERA] Keşfedildi: {profile['backendName']} #{profile['index']} "
+          f"{profile['width']}x{profile['height']} {profile['fourcc']} ({time.time() - started:.1f}s)")
+    save_profile(source_key, profile)
+
+    # Probe'un okuduğu frame'i tekrar kullanmak yerine taze frame al
+    ret, frame = cap.read()
+    return cap, profile, frame if ret else None
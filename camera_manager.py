@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Çoklu kamera yönetimi + ortak batch inference
+Her kamera ayrı bir capture thread'i ve ayrı bir session'dır. Capture thread'leri sadece
+grab() yapar (decode yok); inference thread'i analiz zamanı gelen kameralardan en yeni frame'i
+ister, hepsini tek analyze_batch çağrısında işler. Zamanı gelen kamera sayısı batch
+sınırını aşarsa başlangıç noktası her turda kaydırılır (round-robin), hiçbir kamera aç kalmaz.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from camera_discovery import open_camera
+
+FRAME_WAIT = 0.5          # istenen frame'in decode edilmesi için en fazla bekleme
+IDLE_SLEEP = 0.05         # zamanı gelen kamera yoksa inference thread'inin uyuma sınırı
+BATCH_WINDOW = 0.1        # bu kadar içinde zamanı gelecek kameralar da aynı batch'e alınır
+MAX_READ_FAILURES = 30    # ardışık okuma hatasında kamera kapatılır
+
+
+class CameraWorker:
+    """Tek kamera: grab döngüsü, istenince en yeni frame'i decode eder"""
+
+    def __init__(self, source, session_id, child_id=None):
+        self.source = source
+        self.session_id = session_id
+        self.child_id = child_id
+        self.status = "starting"
+        self.error = None
+        self.profile = None
+        self.started_at = datetime.now().isoformat()
+        self.analyzed = 0
+        self.next_due = 0.0
+
+        self._stop = threading.Event()
+        self._wanted = threading.Event()
+        self._ready = threading.Event()
+        self._frame = None
+        self._thread = threading.Thread(target=self._run, name=f"camera_{session_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    @property
+    def alive(self):
+        return self.status in ("starting", "running")
+
+    def request_frame(self):
+        self._ready.clear()
+        self._wanted.set()
+
+    def take_frame(self, timeout):
+        """request_frame() sonrası decode edilen frame (yoksa None)"""
+        if not self._ready.wait(timeout):
+            return None
+        frame, self._frame = self._frame, None
+        return frame
+
+    def describe(self):
+        return {
+            "sessionId": self.session_id,
+            "source": self.source,
+            "childId": self.child_id,
+            "status": self.status,
+            "error": self.error,
+            "backend": self.profile.get("backendName") if self.profile else None,
+            "resolution": f"{self.profile['width']}x{self.profile['height']}" if self.profile else None,
+            "startedAt": self.started_at,
+            "analyzed": self.analyzed,
+        }
+
+    def _run(self):
+        cap = None
+        try:
+            cap, self.profile, _ = open_camera(self.source)
+            if cap is None:
+                self.status, self.error = "failed", "Kamera açılamadı"
+                return
+            if self._stop.is_set():
+                return
+            self.status = "running"
+            print(f"📹 [CAMERA] {self.session_id} başlatıldı ({self.source if self.source is not None else 'auto'})")
+
+            failures = 0
+            while not self._stop.is_set():
+                # grab ucuz (decode yok); buffer taze kalsın diye kamera hızında sürekli çalışır
+                if not cap.grab():
+                    failures += 1
+                    if failures >= MAX_READ_FAILURES:
+                        self.status, self.error = "failed", "Frame okunamıyor"
+                        return
+                    time.sleep(0.05)
+                    continue
+                failures = 0
+                if self._wanted.is_set():
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        self._frame = frame
+                        self._wanted.clear()
+                        self._ready.set()
+        except Exception as e:
+            self.status, self.error = "failed", str(e)
+            print(f"❌ [CAMERA] {self.session_id} hata: {e}")
+        finally:
+            if cap is not None:
+                cap.release()
+            if self.status != "failed":
+                self.status = "stopped"
+            self._ready.set()  # bekleyen inference thread'ini bırak
+            print(f"📹 [CAMERA] {self.session_id} kapatıldı")
+
+
+class CameraManager:
+    """Kameraları session_id ile yönetir; tek inference thread'i hepsini batch'ler
+
+    analyze_batch([(frame, session_id, profile_name)], child_ids=[...]) ve cadence.recommend(session_id)
+    emotion_server'dakiyle aynıdır; on_heartbeat(worker) paylaşılan depodaki kaydı tazeler.
+    """
+
+    def __init__(self, analyze_batch, cadence, max_batch=16, on_heartbeat=None, on_stop=None,
+                 heartbeat_interval=10.0):
+        self.analyze_batch = analyze_batch
+        self.cadence = cadence
+        self.max_batch = max_batch
+        self.on_heartbeat = on_heartbeat
+        self.on_stop = on_stop
+        self.heartbeat_interval = heartbeat_interval
+
+        self._lock = threading.Lock()
+        self._workers = {}   # session_id -> CameraWorker
+        self._offset = 0     # round-robin başlangıcı
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.batches = 0
+
+    def start(self, source, session_id, child_id=None):
+        """Yeni kamera başlat; session veya kaynak zaten açıksa ValueError"""
+        source_key = None if source is None else str(source)
+        with self._lock:
+            self._reap_locked()
+            if session_id in self._workers:
+                raise ValueError(f"Session zaten aktif: {session_id}")
+            for worker in self._workers.values():
+                if (None if worker.source is None else str(worker.source)) == source_key:
+                    raise ValueError(f"Kaynak zaten açık: {source_key or 'auto'} ({worker.session_id})")
+            worker = CameraWorker(source, session_id, child_id)
+            self._workers[session_id] = worker
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._inference_loop, name="camera_inference", daemon=True)
+                self._thread.start()
+        # Kayıt thread başlamadan yazılsın; hemen başarısız olursa reap sırasında silinir
+        self._heartbeat(worker)
+        worker.start()
+        self._wakeup.set()
+        return worker
+
+    def stop(self, session_id=None):
+        """Tek kamerayı (session_id) veya hepsini durdur -> durdurulan session'lar"""
+        with self._lock:
+            if session_id is None:
+                workers = list(self._workers.values())
+            else:
+                workers = [self._workers[session_id]] if session_id in self._workers else []
+            for worker in workers:
+                self._workers.pop(worker.session_id, None)
+        for worker in workers:
+            worker.stop()
+            self._finish(worker)
+        return [w.session_id for w in workers]
+
+    def find(self, source):
+        """Kaynağa göre açık kameranın session_id'si"""
+        source_key = None if source is None else str(source)
+        with self._lock:
+            for worker in self._workers.values():
+                if (None if worker.source is None else str(worker.source)) == source_key:
+                    return worker.session_id
+        return None
+
+    def active(self, session_id=None):
+        """Herhangi bir kamera (veya verilen session'ın kamerası) çalışıyor mu"""
+        with self._lock:
+            if session_id is not None:
+                worker = self._workers.get(session_id)
+                return worker is not None and worker.alive
+            return any(w.alive for w in self._workers.values())
+
+    def describe(self):
+        with self._lock:
+            self._reap_locked()
+            return [w.describe() for w in self._workers.values()]
+
+    def _heartbeat(self, worker):
+        if self.on_heartbeat is None:
+            return
+        try:
+            self.on_heartbeat(worker)
+        except Exception as e:
+            print(f"❌ [CAMERA] Heartbeat hatası: {e}")
+
+    def _finish(self, worker):
+        self.cadence.forget(worker.session_id)
+        if self.on_stop is not None:
+            try:
+                self.on_stop(worker)
+            except Exception as e:
+                print(f"❌ [CAMERA] Kapatma kaydı hatası: {e}")
+
+    def _reap_locked(self):
+        # Kendi kendine kapanan (failed/stopped) kameraları listeden düş
+        for session_id in [sid for sid, w in self._workers.items() if not w.alive]:
+            self._finish(self._workers.pop(session_id))
+
+    def _due_workers(self, now):
+        with self._lock:
+            self._reap_locked()
+            workers = [w for w in self._workers.values() if w.status == "running"]
+            if not workers:
+                return [], None
+            start = self._offset % len(workers)
+            ordered = workers[start:] + workers[:start]
+            due = [w for w in ordered if w.next_due <= now + BATCH_WINDOW][:self.max_batch]
+            self._offset += max(1, len(due))
+            next_due = min(w.next_due for w in workers)
+        return due, next_due
+
+    def _inference_loop(self):
+        last_heartbeat = {}  # session_id -> son heartbeat zamanı
+        while True:
+            with self._lock:
+                if not self._workers:
+                    self._thread = None
+                    return
+                workers = list(self._workers.values())
+            try:
+                self._step(workers, last_heartbeat)
+            except Exception as e:
+                # Tek inference thread'i ölürse bütün kameralar sessizce durur; hatayı yazıp devam et
+                print(f"❌ [CAMERA] Inference loop hatası: {e}")
+                time.sleep(IDLE_SLEEP)
+
+    def _step(self, workers, last_heartbeat):
+        now = time.time()
+        for session_id in set(last_heartbeat) - {w.session_id for w in workers}:
+            del last_heartbeat[session_id]
+        for worker in workers:
+            if worker.status == "running" and now - last_heartbeat.get(worker.session_id, 0) >= self.heartbeat_interval:
+                last_heartbeat[worker.session_id] = now
+                # Kilit altında: snapshot'tan sonra stop() edilen kameranın on_stop ile silinen
+                # kaydı yeniden yazılmasın (stop() kaydı ancak listeden çıkarınca siler)
+                with self._lock:
+                    if self._workers.get(worker.session_id) is worker:
+                        self._heartbeat(worker)
+
+        due, next_due = self._due_workers(now)
+        if not due or min(w.next_due for w in due) > now:
+            wait = IDLE_SLEEP if next_due is None else min(max(0.0, next_due - now), 1.0)
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+            return
+
+        # Bütün kameralardan aynı anda frame iste, sonra topla (decode'lar paralel)
+        for worker in due:
+            worker.request_frame()
+        deadline = time.time() + FRAME_WAIT
+        items, owners = [], []
+        for worker in due:
+            frame = worker.take_frame(max(0.0, deadline - time.time()))
+            if frame is None:
+                worker.next_due = time.time() + IDLE_SLEEP
+                continue
+            items.append((frame, worker.session_id, None))
+            owners.append(worker)
+        if not items:
+            return
+
+        try:
+            self.analyze_batch(items, child_ids=[worker.child_id for worker in owners])
+        finally:
+            # Analiz hata verse de kameralar bir sonraki tura ertelensin (sıcak döngüye girmesin)
+            self.batches += 1
+            done = time.time()
+            for worker in owners:
+                worker.analyzed += 1
+                worker.next_due = done + self.cadence.recommend(worker.session_id)
@@ -1,46 +1,23 @@
-import cv2
+import time
 
-print("🔍 IriUn webcam test...")
+from camera_discovery import (
+    AUTO_SOURCE, camera_candidates, probe_parallel, profile_path, save_profile
+)
 
-# Farklı backend'ler dene
-backends = [
-    (cv2.CAP_DSHOW, "DirectShow"),
-    (cv2.CAP_MSMF, "Media Foundation"),
-    (cv2.CAP_V4L2, "Video4Linux2"),
-    (0, "Default")
-]
+print("🔍 Kamera keşif testi (backend/index'ler paralel deneniyor)...")
 
-for backend_id, backend_name in backends:
-    print(f"\n📹 {backend_name} backend test...")
+started = time.time()
+profiles = probe_parallel(camera_candidates(), timeout=8.0, keep_best=False)
+elapsed = time.time() - started
 
-    for camera_idx in range(5):  # 0-4 index'leri dene
-        try:
-            cap = cv2.VideoCapture(camera_idx, backend_id)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret and frame is not None:
-                    h, w = frame.shape[:2]
-                    print(f"✅ Index {camera_idx}: {w}x{h} - {backend_name}")
+for profile in profiles:
+    print(f"✅ Index {profile['index']}: {profile['width']}x{profile['height']} - {profile['backendName']} "
+          f"({profile['fourcc']}, {profile['warmupFrames']} warm-up frame, {profile['openMs']}ms)")
 
-                    # 5 frame test et
-                    for i in range(5):
-                        ret, frame = cap.read()
-                        if ret:
-                            print(f"   Frame {i+1}: OK")
-                        else:
-                            print(f"   Frame {i+1}: FAIL")
-
-                    cap.release()
-                    print(f"🎯 ÇALIŞAN KAMERA: Index {camera_idx}, Backend {backend_name}")
-                    break
-                else:
-                    cap.release()
-            else:
-                cap.release()
-        except Exception as e:
-            print(f"❌ Index {camera_idx} hata: {e}")
-    else:
-        continue
-    break
+if profiles:
+    best = profiles[0]
+    save_profile(AUTO_SOURCE, best)
+    print(f"🎯 ÇALIŞAN KAMERA: Index {best['index']}, Backend {best['backendName']} ({elapsed:.1f}s)")
+    print(f"💾 Profil kaydedildi: {profile_path()}")
 else:
-    print("❌ Hiçbir kamera bulunamadı")
\ No newline at end of file
+    print(f"❌ Hiçbir kamera bulunamadı ({elapsed:.1f}s)")
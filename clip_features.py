@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+CLIP embedding yardımcıları
+Image ve text encoder'ları ayrı çalıştırıp L2-normalize embedding döndürür;
+logits = logit_scale * image @ text.T, CLIPModel(...).logits_per_image ile aynıdır.
+"""
+
+import torch
+
+
+def _as_tensor(output):
+    # transformers 5.x get_*_features çıktıyı ModelOutput içinde döndürüyor
+    if torch.is_tensor(output):
+        return output
+    return output.pooler_output
+
+
+def _normalize(features):
+    return features / features.norm(dim=-1, keepdim=True)
+
+
+def encode_texts(model, processor, texts, device):
+    """Promptları bir kez encode et -> [num_prompts, dim] normalize embedding"""
+    inputs = processor(text=texts, return_tensors="pt", padding=True).to(device)
+    with torch.no_grad():
+        features = _as_tensor(model.get_text_features(**inputs))
+    return _normalize(features)
+
+
+def encode_images(model, processor, images, device):
+    """PIL image listesi -> [num_images, dim] normalize embedding"""
+    inputs = processor(images=images, return_tensors="pt").to(device)
+    with torch.no_grad():
+        features = _as_tensor(model.get_image_features(**inputs))
+    return _normalize(features)
+
+
+def logit_scale(model):
+    """CLIP'in öğrenilmiş sıcaklık çarpanı (exp uygulanmış, python float)"""
+    return float(model.logit_scale.exp().item())
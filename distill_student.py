@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+CLIP teacher -> hafif student damıtma pipeline'ı
+1. label : Frame klasörünü server'ın CLIP skorlama yolundan (score_frames) geçir,
+           sınıf olasılıklarını soft label, yüz crop'larını girdi olarak kaydet
+2. train : Küçük CNN'i (emotion_student.StudentNet) KL loss ile teacher'a eşle
+3. report: Student'ın teacher kararlarıyla uyumu, sınıf bazlı recall ve hız karşılaştırması
+
+Örnek:
+    python distill_student.py label --frames debug_frames --out distill/labels.npz
+    python distill_student.py train --labels distill/labels.npz --out models/emotion_student.pt
+    python distill_student.py report --labels distill/labels.npz --model models/emotion_student.pt
+
+Eğitilen model emotion_server'da EMOTION_ANALYZER=student (veya istekte "analyzer": "student")
+ile, simple_emotion_server'da dosya varsa otomatik kullanılır.
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from emotion_student import (
+    StudentNet, StudentAnalyzer, FaceBoxDetector, face_crop, crops_to_tensor, DEFAULT_STUDENT_PATH
+)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def list_frames(frames_dir):
+    paths = []
+    for root, _, files in os.walk(frames_dir):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+
+def decide(probs, class_names, no_person_idx, threshold):
+    """Server'ın karar kuralı (argmax + no_person filtresi) -> [N] etiket"""
+    labels = np.array(class_names, dtype=object)[probs.argmax(axis=1)]
+    if no_person_idx is not None:
+        labels[probs[:, no_person_idx] > threshold] = "neutral"
+    return labels
+
+
+# ----- 1. Soft label üretimi -----
+
+def label_frames(frames_dir, out_path, profile_name=None, batch_size=16):
+    import emotion_server  # CLIP + prompt profilleri server ile aynı şekilde yüklenir
+
+    if emotion_server.prompt_profiles is None:
+        raise SystemExit("❌ [DISTILL] CLIP modeli yüklenemedi")
+    profile = emotion_server.prompt_profiles.get(profile_name)
+    paths = list_frames(frames_dir)
+    if not paths:
+        raise SystemExit(f"❌ [DISTILL] {frames_dir} içinde frame yok")
+
+    detector = FaceBoxDetector()
+    crops, probs, has_face, kept, teacher_ms = [], [], [], [], []
+    for start in range(0, len(paths), batch_size):
+        batch_paths = paths[start:start + batch_size]
+        frames = [(p, cv2.imread(p)) for p in batch_paths]
+        frames = [(p, f) for p, f in frames if f is not None]
+        if not frames:
+            continue
+
+        started = time.time()
+        scored = emotion_server.score_frames([f for _, f in frames], [profile.name] * len(frames))
+        teacher_ms.append((time.time() - started) * 1000 / len(frames))
+
+        for (path, frame), (_, frame_probs, _) in zip(frames, scored):
+            box = detector.box(frame)
+            crops.append(face_crop(frame, box))
+            probs.append(frame_probs.float().cpu().numpy())
+            has_face.append(box is not None)
+            kept.append(os.path.relpath(path, frames_dir))
+        print(f"🏷️  [DISTILL] {len(kept)}/{len(paths)} frame etiketlendi")
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    np.savez_compressed(
+        out_path,
+        crops=np.stack(crops).astype(np.uint8),
+        probs=np.stack(probs).astype(np.float32),
+        has_face=np.array(has_face, dtype=bool),
+        paths=np.array(kept),
+        class_names=np.array(profile.class_names),
+        meta=np.array(json.dumps({
+            "profile": profile.name,
+            "noPersonThreshold": profile.no_person_threshold,
+            "teacherMsPerFrame": float(np.mean(teacher_ms)),
+            "framesDir": os.path.abspath(frames_dir),
+            "createdAt": datetime.now().isoformat(),
+        })),
+    )
+    print(f"💾 [DISTILL] {len(kept)} soft label kaydedildi: {out_path} "
+          f"(teacher {np.mean(teacher_ms):.1f}ms/frame, {int(np.sum(has_face))} yüzlü)")
+
+
+def load_labels(path):
+    data = np.load(path)
+    return {
+        "crops": data["crops"],
+        "probs": data["probs"],
+        "has_face": data["has_face"],
+        "paths": data["paths"],
+        "class_names": [str(c) for c in data["class_names"]],
+        "meta": json.loads(str(data["meta"])),
+    }
+
+
+def split_indices(n, val_fraction, seed):
+    order = np.random.default_rng(seed).permutation(n)
+    n_val = max(1, int(round(n * val_fraction))) if n > 1 else 0
+    return order[n_val:], order[:n_val]
+
+
+# ----- 2. Eğitim -----
+
+def augment(x, generator):
+    """[B, 1, S, S] normalize batch: yatay flip + ±4 piksel kaydırma + kontrast"""
+    flip = torch.rand(x.shape[0], generator=generator) < 0.5
+    x = torch.where(flip[:, None, None, None], x.flip(-1), x)
+    dx, dy = (int(v) for v in torch.randint(-4, 5, (2,), generator=generator))
+    x = torch.roll(x, shifts=(dy, dx), dims=(2, 3))
+    contrast = 0.8 + 0.4 * torch.rand(x.shape[0], 1, 1, 1, generator=generator)
+    return x * contrast
+
+
+def distillation_loss(student_logits, teacher_probs, temperature):
+    """KL(teacher || student), ikisi de aynı sıcaklıkta yumuşatılır; T² ile ölçeklenir"""
+    teacher = F.softmax(torch.log(teacher_probs.clamp_min(1e-8)) / temperature, dim=-1)
+    student = F.log_softmax(student_logits / temperature, dim=-1)
+    return F.kl_div(student, teacher, reduction="batchmean") * temperature ** 2
+
+
+def train_student(labels_path, out_path, epochs=30, batch_size=64, lr=3e-3, temperature=2.0,
+                  val_fraction=0.15, seed=0):
+    labels = load_labels(labels_path)
+    class_names = labels["class_names"]
+    x_all = crops_to_tensor(labels["crops"])
+    p_all = torch.from_numpy(labels["probs"])
+    train_idx, val_idx = split_indices(len(x_all), val_fraction, seed)
+    print(f"🎓 [DISTILL] {len(train_idx)} train / {len(val_idx)} val frame, {len(class_names)} sınıf")
+
+    torch.manual_seed(seed)
+    generator = torch.Generator().manual_seed(seed)
+    model = StudentNet(len(class_names))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=1e-4)
+    steps_per_epoch = max(1, (len(train_idx) + batch_size - 1) // batch_size)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, max_lr=lr, epochs=epochs,
+                                                    steps_per_epoch=steps_per_epoch)
+
+    best_agreement, best_state = -1.0, None
+    eval_idx = val_idx if len(val_idx) else train_idx
+    for epoch in range(epochs):
+        model.train()
+        order = torch.from_numpy(train_idx)[torch.randperm(len(train_idx), generator=generator)]
+        total_loss = 0.0
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            logits = model(augment(x_all[idx], generator))
+            loss = distillation_loss(logits, p_all[idx], temperature)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total_loss += loss.item() * len(idx)
+
+        model.eval()
+        with torch.no_grad():
+            student_top = model(x_all[eval_idx]).argmax(dim=-1)
+        agreement = (student_top == p_all[eval_idx].argmax(dim=-1)).float().mean().item()
+        print(f"   epoch {epoch + 1:>3}/{epochs} - loss {total_loss / max(1, len(train_idx)):.4f} "
+              f"- val top-1 uyum {agreement:.1%}")
+        if agreement > best_agreement:
+            best_agreement = agreement
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    torch.save({
+        "state_dict": best_state,
+        "class_names": class_names,
+        "teacher_profile": labels["meta"].get("profile"),
+        "no_person_threshold": labels["meta"].get("noPersonThreshold", 0.35),
+        "temperature": temperature,
+        "val_indices": val_idx.tolist(),
+        "trained_at": datetime.now().isoformat(),
+    }, out_path)
+    print(f"💾 [DISTILL] Student kaydedildi: {out_path} (en iyi val uyumu {best_agreement:.1%})")
+
+
+# ----- 3. Teacher'a karşı rapor -----
+
+def student_report(labels_path, model_path, out_path=None, all_frames=False):
+    labels = load_labels(labels_path)
+    student = StudentAnalyzer(model_path)
+    checkpoint = torch.load(model_path, map_location="cpu", weights_only=True)
+    if student.class_names != labels["class_names"]:
+        raise SystemExit("❌ [DISTILL] Model ve label dosyasının sınıfları farklı")
+
+    idx = np.arange(len(labels["probs"]))
+    if not all_frames and checkpoint.get("val_indices"):
+        idx = np.array(checkpoint["val_indices"])  # sadece eğitimde görülmemiş frame'ler
+    crops, teacher_probs = labels["crops"][idx], labels["probs"][idx]
+
+    student_probs = student.predict_crops(crops).numpy()
+    class_names = student.class_names
+    teacher_dec = decide(teacher_probs, class_names, student.no_person_idx, student.no_person_threshold)
+    student_dec = decide(student_probs, class_names, student.no_person_idx, student.no_person_threshold)
+
+    per_class = {}
+    for name in sorted(set(teacher_dec)):
+        mask = teacher_dec == name
+        per_class[name] = {"frames": int(mask.sum()),
+                           "recall": round(float((student_dec[mask] == name).mean()), 4)}
+
+    kl = np.sum(teacher_probs * (np.log(np.clip(teacher_probs, 1e-8, None)) -
+                                 np.log(np.clip(student_probs, 1e-8, None))), axis=1)
+
+    # Tek frame gecikmesi (server'daki gibi batch=1), ilk çağrılar ısınma
+    for crop in crops[:5]:
+        student.predict_crops([crop])
+    timings = []
+    for crop in crops[:200]:
+        started = time.perf_counter()
+        student.predict_crops([crop])
+        timings.append((time.perf_counter() - started) * 1000)
+    student_ms = float(np.mean(timings))
+    teacher_ms = labels["meta"].get("teacherMsPerFrame")
+
+    report = {
+        "frames": int(len(idx)),
+        "split": "all" if all_frames or not checkpoint.get("val_indices") else "val",
+        "teacherProfile": student.teacher_profile,
+        "top1Agreement": round(float((student_probs.argmax(1) == teacher_probs.argmax(1)).mean()), 4),
+        "decisionAgreement": round(float((student_dec == teacher_dec).mean()), 4),
+        "meanKl": round(float(kl.mean()), 4),
+        "perClass": per_class,
+        "studentMsPerFrame": round(student_ms, 3),
+        "teacherMsPerFrame": round(teacher_ms, 3) if teacher_ms else None,
+        "speedup": round(teacher_ms / student_ms, 1) if teacher_ms and student_ms > 0 else None,
+        "parameters": sum(p.numel() for p in student.model.parameters()),
+    }
+
+    print(f"📋 [DISTILL] {report['frames']} frame ({report['split']}) - "
+          f"karar uyumu {report['decisionAgreement']:.1%}, top-1 uyum {report['top1Agreement']:.1%}, "
+          f"ortalama KL {report['meanKl']:.3f}")
+    for name, stats in per_class.items():
+        print(f"   {name:<12} {stats['frames']:>5} frame - recall {stats['recall']:.1%}")
+    speed = f" ({report['speedup']}x hızlı)" if report["speedup"] else ""
+    print(f"⚡ [DISTILL] Student {student_ms:.2f}ms/frame, teacher "
+          f"{report['teacherMsPerFrame'] or '-'}ms/frame{speed} (crop dahil değil)")
+
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 [DISTILL] Rapor kaydedildi: {out_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP teacher'dan hafif emotion student modeli damıt")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("label", help="Frame klasörünü CLIP ile soft label'la")
+    p.add_argument("--frames", required=True, help="Frame klasörü (alt klasörler dahil)")
+    p.add_argument("--out", default="distill/labels.npz")
+    p.add_argument("--profile", default=None, help="Teacher prompt profili (varsayılan: children)")
+    p.add_argument("--batch-size", type=int, default=16)
+
+    p = sub.add_parser("train", help="Student'ı soft label'lara göre eğit")
+    p.add_argument("--labels", default="distill/labels.npz")
+    p.add_argument("--out", default=DEFAULT_STUDENT_PATH)
+    p.add_argument("--epochs", type=int, default=30)
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--lr", type=float, default=3e-3)
+    p.add_argument("--temperature", type=float, default=2.0, help="Distillation sıcaklığı")
+    p.add_argument("--val-fraction", type=float, default=0.15)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--report", default=None, help="Eğitim sonrası rapor JSON dosyası")
+
+    p = sub.add_parser("report", help="Student'ı teacher kararlarıyla karşılaştır")
+    p.add_argument("--labels", default="distill/labels.npz")
+    p.add_argument("--model", default=DEFAULT_STUDENT_PATH)
+    p.add_argument("--all", action="store_true", help="Sadece val değil bütün frame'ler")
+    p.add_argument("--out", default=None, help="Rapor JSON dosyası")
+
+    args = parser.parse_args()
+    if args.command == "label":
+        label_frames(args.frames, args.out, args.profile, args.batch_size)
+    elif args.command == "train":
+        train_student(args.labels, args.out, args.epochs, args.batch_size, args.lr, args.temperature,
+                      args.val_fraction, args.seed)
+        student_report(args.labels, args.out, args.report)
+    else:
+        student_report(args.labels, args.model, args.out, args.all)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Frame embedding deposu
+Her analiz edilen frame'in normalize CLIP image embedding'ini float16 olarak saklar.
+Prompt bank veya eşik değiştiğinde geçmiş session'lar image encoder çalıştırılmadan
+yeniden skorlanabilir (bkz. rescore_embeddings.py).
+
+Dizin yapısı:
+    <root>/store.json                      -> {"dim": 512, "dtype": "float16", "model": ...}
+    <root>/<YYYY-MM-DD>/<session>.f16      -> ardışık float16 satırlar [N, dim]
+    <root>/<YYYY-MM-DD>/<session>.jsonl    -> satır başına frame metadata'sı
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+
+STORE_DTYPE = np.float16
+_SAFE_SESSION = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class EmbeddingStore:
+    """Append-only, günlük shard'lı float16 embedding deposu"""
+
+    def __init__(self, root, dim=None, model_name=None):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+        meta_path = os.path.join(root, "store.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if dim is not None and self.meta.get("dim") != dim:
+                raise ValueError(f"Embedding boyutu uyuşmuyor: store={self.meta.get('dim')} model={dim}")
+        else:
+            if dim is None:
+                raise ValueError(f"{root} boş, yeni store için dim gerekli")
+            self.meta = {"dim": int(dim), "dtype": "float16", "model": model_name}
+            with open(meta_path, "w") as f:
+                json.dump(self.meta, f)
+
+        self.dim = int(self.meta["dim"])
+
+    @staticmethod
+    def _session_key(session_id):
+        return _SAFE_SESSION.sub("_", str(session_id))[:128] or "default"
+
+    def append(self, session_id, embedding, record):
+        """Tek frame embedding'i ve metadata'sını ekle"""
+        row = np.asarray(embedding, dtype=STORE_DTYPE).reshape(-1)
+        if row.shape[0] != self.dim:
+            raise ValueError(f"Embedding boyutu {row.shape[0]}, beklenen {self.dim}")
+
+        day = datetime.now().strftime("%Y-%m-%d")
+        day_dir = os.path.join(self.root, day)
+        base = os.path.join(day_dir, self._session_key(session_id))
+        line = json.dumps(dict(record, sessionId=str(session_id)), ensure_ascii=False)
+
+        with self._lock:
+            os.makedirs(day_dir, exist_ok=True)
+            # Önce embedding, sonra metadata: okuma tarafı eksik satırları kırpar
+            with open(base + ".f16", "ab") as f:
+                f.write(row.tobytes())
+            with open(base + ".jsonl", "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def days(self, since=None, until=None):
+        result = []
+        for name in sorted(os.listdir(self.root)):
+            if not os.path.isdir(os.path.join(self.root, name)):
+                continue
+            if since and name < since:
+                continue
+            if until and name > until:
+                continue
+            result.append(name)
+        return result
+
+    def iter_sessions(self, since=None, until=None, session_id=None):
+        """(day, session_key, embeddings[N, dim] float16, records) üret"""
+        wanted = self._session_key(session_id) if session_id is not None else None
+        for day in self.days(since, until):
+            day_dir = os.path.join(self.root, day)
+            for name in sorted(os.listdir(day_dir)):
+                if not name.endswith(".f16"):
+                    continue
+                key = name[:-4]
+                if wanted is not None and key != wanted:
+                    continue
+
+                embeddings = np.fromfile(os.path.join(day_dir, name), dtype=STORE_DTYPE)
+                embeddings = embeddings[: (embeddings.size // self.dim) * self.dim].reshape(-1, self.dim)
+
+                records = []
+                meta_path = os.path.join(day_dir, key + ".jsonl")
+                if os.path.exists(meta_path):
+                    with open(meta_path, encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                records.append(json.loads(line))
+                            except ValueError:
+                                break
+
+                # Yarım kalmış yazma varsa iki tarafı da ortak uzunluğa kırp
+                count = min(len(embeddings), len(records))
+                yield day, key, embeddings[:count], records[:count]
+
+    def load(self, since=None, until=None, session_id=None):
+        """Seçilen aralığı tek matris halinde yükle -> (embeddings[N, dim], records)"""
+        chunks = []
+        records = []
+        for _, _, emb, recs in self.iter_sessions(since, until, session_id):
+            chunks.append(emb)
+            records.extend(recs)
+        if not chunks:
+            return np.zeros((0, self.dim), dtype=STORE_DTYPE), []
+        return np.concatenate(chunks, axis=0), records
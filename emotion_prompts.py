@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+CLIP emotion prompt bank'ı ve sınıf skorlama yardımcıları
+emotion_server.py ve offline araçlar (rescore_embeddings.py) aynı tanımları kullanır
+"""
+
+import numpy as np
+
+# "no_person" olasılığı bu eşiği geçerse yüz yok kabul edilir (deneyerek ayarlayın)
+NO_PERSON_THRESHOLD = 0.35
+
+emotion_prompt_bank = {
+    "happy": [
+        "a photo of a happy child",
+        "a kid smiling with bright eyes",
+        "a child's face showing joy",
+        "a cheerful child"
+    ],
+    "sad": [
+        # sad'i daha 'bariz' hale getir
+        "a photo of a sad child with tears",
+        "a kid crying with teary eyes and a downturned mouth",
+        "a child's face showing visible sadness and tears",
+        "a gloomy child with watery eyes"
+    ],
+    "neutral": [
+        # nötrü güçlendir
+        "a photo of a neutral child",
+        "a kid with a relaxed, calm face",
+        "a child's face showing no strong emotion",
+        "an expressionless child with relaxed muscles",
+        "a calm portrait of a child with no smile and no frown"
+    ],
+    "surprised": [
+        "a photo of a surprised child",
+        "a kid with wide open eyes and mouth",
+        "a child's face showing surprise",
+        "astonished child"
+    ],
+    "frustrated": [
+        "a photo of an angry child",
+        "a frustrated kid with furrowed brows",
+        "a child's face showing anger",
+        "irritated child"
+    ],
+    "confused": [
+        "a photo of a confused child",
+        "a kid tilting head with uneven eyebrows",
+        "a child's face showing confusion",
+        "puzzled child"
+    ],
+    "tired": [
+        "a photo of a tired child",
+        "a sleepy kid with drooping eyelids",
+        "a child's face showing fatigue",
+        "yawning child"
+    ],
+    "focused": [
+        "a photo of a focused child",
+        "a kid concentrating, attentive face",
+        "a child's face showing focus",
+        "an engaged child paying attention"
+    ],
+    "no_person": [
+        "a photo without any person",
+        "an object only, no human face",
+        "a landscape with no people"
+    ]
+}
+
+
+def flatten_prompt_bank(prompt_bank):
+    """Bütün promptları düz listeye aç -> (all_texts, class_slices)"""
+    all_texts = []
+    class_slices = {}
+    for cls, prompts in prompt_bank.items():
+        start = len(all_texts)
+        all_texts.extend(prompts)
+        end = len(all_texts)
+        class_slices[cls] = (start, end)
+    return all_texts, class_slices
+
+
+def class_pooling_matrix(class_slices, num_prompts):
+    """[num_prompts, num_classes] matris: logits @ P -> her sınıfın prompt ortalaması"""
+    pool = np.zeros((num_prompts, len(class_slices)), dtype=np.float32)
+    for col, (start, end) in enumerate(class_slices.values()):
+        pool[start:end, col] = 1.0 / (end - start)
+    return pool
@@ -4,23 +4,39 @@ Gerçek zamanlı emotion detection server
 Web uygulaması ile iletişim kurar
 """
 
+import os
+import base64
+import hmac
 import cv2
-from transformers import CLIPProcessor, CLIPModel
 from PIL import Image
 import torch
 import mediapipe as mp
 import time
 import json
-import threading
 from threading import Lock
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g
 from flask_cors import CORS
 import numpy as np
 from datetime import datetime
 
+from analysis_cadence import CadenceController
+from model_weights import load_clip, process_memory
+from clip_features import encode_images
+from embedding_store import EmbeddingStore
+from prompt_profiles import PromptProfileRegistry
+from emotion_student import load_student
+from session_store import create_session_store, node_id, AFFINITY_TTL
+from profiling import OnDemandProfiler
+from ipc_server import EmotionIpcServer
+from camera_manager import CameraManager
+from prototype_index import PrototypeIndex
+from model_manager import ModelManager, IDLE_TIMEOUT
+
+MAX_BATCH_FRAMES = 16  # /analyze_batch tek istekte en fazla bu kadar frame
+
 # Flask app setup
 app = Flask(__name__)
-CORS(app)  # React uygulamasından gelen isteklere izin ver
+CORS(app, expose_headers=["X-Session-Node"])  # React uygulamasından gelen isteklere izin ver
 
 # ----- Global durum -----
 state_lock = Lock()  # paylaşılan state için kilit
@@ -33,104 +49,135 @@ current_emotion_data = {
     "faceDetected": False
 }
 
-camera_active = False
-cap = None
+# Session bazlı adaptive analiz aralığı (client'lara nextAnalysisMs olarak döner)
+cadence = CadenceController()
+CAMERA_SESSION_ID = "camera"
+
+# Session sonuçları/toplamları ve kamera durumu: SESSION_STORE=sqlite ile replikalar arası paylaşılır.
+# current_emotion_data sadece bu process'in son sonucu olarak kalır.
+session_store = create_session_store()
+NODE_ID = node_id()
+CAMERA_HEARTBEAT = 10.0  # kamera kaydı bu aralıkla yenilenir; 3 katı süre yenilenmezse node ölü sayılır
+
+# POST /admin/profile ile sonraki N analiz / T saniye profillenir; kapalıyken tek bool kontrolü
+profiler = OnDemandProfiler()
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Her sonuç session_store'a yazıldıktan sonra çağrılır: listener(session_id, result) (örn. IPC abonelikleri)
+result_listeners = []
+ipc_server = None
 
 # ----- AI Model setup -----
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"🤖 Using device: {device}")
 
+# MODEL_IDLE_TIMEOUT açıksa (ve CLIP_WEIGHTS_MODE verilmemişse) CPU'da mmap tercih edilir:
+# yeniden yükleme disk/page cache'ten hızlı olur, bırakılan ağırlıklar process belleğinde kalmaz
+CLIP_WEIGHTS_MODE = "mmap" if IDLE_TIMEOUT > 0 and device == "cpu" and not os.environ.get("CLIP_WEIGHTS_MODE") else None
+
 try:
     model_name = "openai/clip-vit-base-patch32"
-    model = CLIPModel.from_pretrained(model_name).to(device)
-    model.eval()  # eval moduna al
-    processor = CLIPProcessor.from_pretrained(model_name)
+    # CLIP_WEIGHTS_MODE=mmap ile ağırlıklar process'ler arasında paylaşılır
+    model, processor = load_clip(model_name, device, CLIP_WEIGHTS_MODE)  # eval modunda döner
     print("✅ CLIP model loaded successfully")
 except Exception as e:
     print(f"❌ Model loading failed: {e}")
     model = None
     processor = None
-emotion_prompt_bank = {
-    "happy": [
-        "a photo of a happy child",
-        "a kid smiling with bright eyes",
-        "a child's face showing joy",
-        "a cheerful child"
-    ],
-    "sad": [
-        # sad'i daha 'bariz' hale getir
-        "a photo of a sad child with tears",
-        "a kid crying with teary eyes and a downturned mouth",
-        "a child's face showing visible sadness and tears",
-        "a gloomy child with watery eyes"
-    ],
-    "neutral": [
-        # nötrü güçlendir
-        "a photo of a neutral child",
-        "a kid with a relaxed, calm face",
-        "a child's face showing no strong emotion",
-        "an expressionless child with relaxed muscles",
-        "a calm portrait of a child with no smile and no frown"
-    ],
-    "surprised": [
-        "a photo of a surprised child",
-        "a kid with wide open eyes and mouth",
-        "a child's face showing surprise",
-        "astonished child"
-    ],
-    "frustrated": [
-        "a photo of an angry child",
-        "a frustrated kid with furrowed brows",
-        "a child's face showing anger",
-        "irritated child"
-    ],
-    "confused": [
-        "a photo of a confused child",
-        "a kid tilting head with uneven eyebrows",
-        "a child's face showing confusion",
-        "puzzled child"
-    ],
-    "tired": [
-        "a photo of a tired child",
-        "a sleepy kid with drooping eyelids",
-        "a child's face showing fatigue",
-        "yawning child"
-    ],
-    "focused": [
-        "a photo of a focused child",
-        "a kid concentrating, attentive face",
-        "a child's face showing focus",
-        "an engaged child paying attention"
-    ],
-    "no_person": [
-        "a photo without any person",
-        "an object only, no human face",
-        "a landscape with no people"
-    ]
-}
 
-# Bütün promptları düz listeye açıyoruz
-all_texts = []
-class_slices = {}
-for cls, prompts in emotion_prompt_bank.items():
-    start = len(all_texts)
-    all_texts.extend(prompts)
-    end = len(all_texts)
-    class_slices[cls] = (start, end)
+# ----- Prompt bank profilleri -----
+# Varsayılan "children" profili emotion_prompts.py'den; diğerleri PROMPT_PROFILES_DIR içindeki JSON'lardan.
+# Her profilin text embedding matrisi açılışta bir kez hesaplanır, frame başına sadece image encoder çalışır.
+prompt_profiles = None
+if model is not None:
+    try:
+        profiles_dir = os.environ.get("PROMPT_PROFILES_DIR") or \
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_banks")
+        prompt_profiles = PromptProfileRegistry(model, processor, device, profiles_dir)
+        prompt_profiles.load_defaults()
+    except Exception as e:
+        print(f"❌ Text embedding hesaplanamadı: {e}")
+        model = None
+        processor = None
+        prompt_profiles = None
+
+# ----- Embedding deposu (opsiyonel) -----
+# EMBEDDING_STORE_DIR verilirse her frame'in image embedding'i float16 olarak saklanır
+embedding_store = None
+if os.environ.get("EMBEDDING_STORE_DIR") and prompt_profiles is not None:
+    try:
+        embedding_store = EmbeddingStore(os.environ["EMBEDDING_STORE_DIR"],
+                                         dim=prompt_profiles.get().class_weights.shape[0],
+                                         model_name=model_name)
+        print(f"💾 [EMBEDDINGS] Store aktif: {embedding_store.root}")
+    except Exception as e:
+        print(f"❌ [EMBEDDINGS] Store açılamadı: {e}")
+
+# ----- Çocuk başına kalibrasyon (prototip indeksi) -----
+# POST /calibration/enroll ile kaydedilen örnekler; istekte childId varsa prompt skorlarıyla harmanlanır
+prototype_index = None
+if prompt_profiles is not None:
+    try:
+        prototype_index = PrototypeIndex(prompt_profiles.get().class_weights.shape[0], model_name=model_name)
+    except Exception as e:
+        print(f"❌ [CALIBRATION] Prototip indeksi açılamadı: {e}")
+
+# ----- Hafif student analyzer (opsiyonel) -----
+# distill_student.py ile CLIP'ten damıtılan model; STUDENT_MODEL_PATH (varsayılan models/emotion_student.pt)
+# EMOTION_ANALYZER=clip|student varsayılanı seçer, istekler "analyzer" alanıyla değiştirebilir
+ANALYZERS = ("clip", "student")
+DEFAULT_ANALYZER = os.environ.get("EMOTION_ANALYZER", "clip")
+if DEFAULT_ANALYZER not in ANALYZERS:
+    print(f"⚠️ [STUDENT] Bilinmeyen EMOTION_ANALYZER={DEFAULT_ANALYZER}, clip kullanılıyor")
+    DEFAULT_ANALYZER = "clip"
+student = load_student()
+if DEFAULT_ANALYZER == "student" and student is None:
+    print("⚠️ [STUDENT] Student modeli yok, clip kullanılıyor")
+    DEFAULT_ANALYZER = "clip"
 
 # ----- MediaPipe setup for gaze detection -----
 mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+
+def create_face_mesh():
+    return mp_face_mesh.FaceMesh(
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+face_mesh = create_face_mesh()
+
+# ----- Boşta model bırakma -----
+# MODEL_IDLE_TIMEOUT saniye istek gelmezse CLIP ve FaceMesh bırakılır, sonraki istekte yüklenir.
+# Profillerin text embedding'leri (küçük) bellekte kalır, yeniden yüklemede text encoder çalışmaz.
+def _load_clip():
+    global model, processor
+    model, processor = load_clip(model_name, device, CLIP_WEIGHTS_MODE)
+    prompt_profiles.attach(model, processor)
+
+def _unload_clip():
+    global model, processor
+    prompt_profiles.attach(None, None)
+    model = processor = None
+
+def _load_face_mesh():
+    global face_mesh
+    face_mesh = create_face_mesh()
+
+def _unload_face_mesh():
+    global face_mesh
+    mesh, face_mesh = face_mesh, None
+    mesh.close()
+
+clip_models = ModelManager("clip", _load_clip, _unload_clip, loaded=prompt_profiles is not None)
+gaze_models = ModelManager("gaze", _load_face_mesh, _unload_face_mesh)
 
 def detect_gaze(frame):
     """Gaze direction detection -> (lookingAtScreen: bool, faceDetected: bool)"""
     try:
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
+        with gaze_models.use():
+            results = face_mesh.process(rgb_frame)
 
         if not results.multi_face_landmarks:
             return False, False  # yüz yok
@@ -158,188 +205,610 @@ def detect_gaze(frame):
 
     return False, False
 
-def analyze_emotion(frame):
-    """Tek frame'de emotion analysis yap"""
+def embed_frames(frames):
+    """BGR frame listesi -> [N, dim] normalize CLIP image embedding"""
+    pil_images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+    with clip_models.use():
+        return encode_images(model, processor, pil_images, device)
+
+def score_frames(frames, profile_names, child_ids=None):
+    """Frame'leri tek image encoder geçişiyle encode edip her birini kendi profiliyle skorla
+
+    child_ids verilirse o çocuğun prototipleriyle kalibre edilir -> [(profile, probs, image_embed)]
+    """
+    image_embeds = embed_frames(frames)
+    scored = prompt_profiles.score(image_embeds, profile_names)
+    results = []
+    for i, (profile, probs) in enumerate(scored):
+        if child_ids and child_ids[i] and prototype_index is not None:
+            probs = prototype_index.blend(child_ids[i], profile.class_names, probs, image_embeds[i])
+        results.append((profile, probs, image_embeds[i]))
+    return results
+
+def finalize_analysis(frame, session_id, profile, probs, image_embed):
+    """Sınıf olasılıklarından sonucu oluştur, gaze'i ekle ve paylaşılan state'i güncelle"""
     global current_emotion_data
 
-    if model is None or processor is None:
-        return
-
-    try:
-        # PIL image'a çevir
-        pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-
-        # CLIP ile emotion detection
-        inputs = processor(
-            text=all_texts,
-            images=pil_image,
-            return_tensors="pt",
-            padding=True
-        ).to(device)
-
-        with torch.no_grad():
-            outputs = model(**inputs)
-
-        logits = outputs.logits_per_image[0]  # shape: [num_prompts]
-
-        # Her sınıf için ortalama logit
-        class_logits = []
-        class_names = []
-        for cls, (start, end) in class_slices.items():
-            class_names.append(cls)
-            class_logits.append(logits[start:end].mean())
-
-        class_logits = torch.stack(class_logits)
-        probs = torch.softmax(class_logits, dim=0)
-
-        # En yüksek olasılığı seç
-        best_idx = int(torch.argmax(probs).item())
-        predicted_emotion = class_names[best_idx]
-        confidence = float(probs[best_idx].item())
-
-        # "no_person" varsa yüz tespiti için filtre
-        if "no_person" in class_names:
-            no_person_idx = class_names.index("no_person")
-            if probs[no_person_idx] > 0.35:  # eşik: deneyerek ayarlayın
-                predicted_emotion = "neutral"
-                face_detected = False
-            else:
-                looking_at_screen, face_detected = detect_gaze(frame)
-        else:
-            looking_at_screen, face_detected = detect_gaze(frame)
+    # En yüksek olasılığı seç
+    best_idx = int(torch.argmax(probs).item())
+    predicted_emotion = profile.class_names[best_idx]
+    confidence = float(probs[best_idx].item())
 
-        # Global data güncelle
-        with state_lock:
-            current_emotion_data = {
-                "emotion": predicted_emotion,
-                "confidence": confidence,
-                "timestamp": datetime.now().isoformat(),
-                "lookingAtScreen": looking_at_screen,
-                "faceDetected": face_detected
-            }
+    # "no_person" varsa yüz tespiti için filtre
+    if profile.no_person_idx is not None and probs[profile.no_person_idx] > profile.no_person_threshold:
+        predicted_emotion = "neutral"
+        looking_at_screen = False
+        face_detected = False
+    else:
+        looking_at_screen, face_detected = detect_gaze(frame)
 
-        print(f"😊 [EMOTION] {predicted_emotion} ({confidence:.1%}) - "
-              f"Looking: {looking_at_screen} - Face: {face_detected}")
+    # Global data güncelle
+    with state_lock:
+        current_emotion_data = {
+            "emotion": predicted_emotion,
+            "confidence": confidence,
+            "timestamp": datetime.now().isoformat(),
+            "lookingAtScreen": looking_at_screen,
+            "faceDetected": face_detected,
+            "profile": profile.name
+        }
+        result = dict(current_emotion_data)
+
+    cadence.observe(session_id, predicted_emotion, face_detected)
 
+    try:
+        session_store.put_result(session_id, result)
     except Exception as e:
-        print(f"❌ [EMOTION] Analysis error: {e}")
-        with state_lock:
-            current_emotion_data["faceDetected"] = False
-
-def camera_loop():
-    """Kamera loop'u - ayrı thread'de çalışır"""
-    global cap, camera_active
-
+        print(f"❌ [SESSIONS] Sonuç yazılamadı: {e}")
+
+    for listener in result_listeners:
+        try:
+            listener(session_id, result)
+        except Exception as e:
+            print(f"❌ [EMOTION] Sonuç dinleyicisi hatası: {e}")
+
+    if embedding_store is not None and image_embed is not None:
+        try:
+            embedding_store.append(session_id, image_embed.float().cpu().numpy(), {
+                "timestamp": result["timestamp"],
+                "emotion": predicted_emotion,
+                "confidence": confidence,
+                "faceDetected": face_detected,
+                "profile": profile.name,
+            })
+        except Exception as e:
+            print(f"❌ [EMBEDDINGS] Kaydedilemedi: {e}")
+
+    print(f"😊 [EMOTION] {predicted_emotion} ({confidence:.1%}) - "
+          f"Looking: {looking_at_screen} - Face: {face_detected} - Profile: {profile.name}")
+    return result
+
+def _analysis_failed(session_ids, error):
+    print(f"❌ [EMOTION] Analysis error: {error}")
+    with state_lock:
+        current_emotion_data["faceDetected"] = False
+        result = dict(current_emotion_data)
+    for session_id in session_ids:
+        cadence.observe(session_id, result["emotion"], False)
+    return result
+
+def analyzer_ready(analyzer):
+    if analyzer == "student":
+        return student is not None
+    return prompt_profiles is not None  # CLIP bırakılmış olsa da istekte yeniden yüklenir
+
+def analyze_emotion(frame, session_id=CAMERA_SESSION_ID, profile_name=None, analyzer=None, child_id=None):
+    """Tek frame'de emotion analysis yap, sonucu döndür"""
+    analyzer = analyzer or DEFAULT_ANALYZER
+    if not analyzer_ready(analyzer):
+        return None
+
+    started = time.time()
+    cadence.begin()
     try:
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("❌ [CAMERA] Webcam açılamadı")
-            return
-
-        print("📹 [CAMERA] Webcam başlatıldı")
-        camera_active = True
-
-        last_analysis_time = 0
-        analysis_interval = 3.0  # 3 saniyede bir analiz
-
-        while camera_active:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            current_time = time.time()
+        with profiler.scope(1):
+            if analyzer == "student":
+                # Student teacher profilinin sınıflarıyla eğitildi, profile_name kullanılmaz
+                return finalize_analysis(frame, session_id, student, student.predict(frame), None)
+            profile, probs, image_embed = score_frames([frame], [profile_name], [child_id])[0]
+            return finalize_analysis(frame, session_id, profile, probs, image_embed)
+    except Exception as e:
+        return _analysis_failed([session_id], e)
+    finally:
+        cadence.end(time.time() - started)
 
-            # 3 saniyede bir emotion analysis
-            if current_time - last_analysis_time >= analysis_interval:
-                analyze_emotion(frame)
-                last_analysis_time = current_time
+def analyze_batch(items, analyzer=None, child_ids=None):
+    """[(frame, session_id, profile_name)] -> sonuç listesi; farklı profiller tek encoder geçişinde
 
-            time.sleep(0.1)  # CPU kullanımını azalt
+    child_ids: items ile aynı uzunlukta, kalibrasyon için çocuk id'leri (None olabilir)
+    """
+    analyzer = analyzer or DEFAULT_ANALYZER
+    if not items or not analyzer_ready(analyzer):
+        return None
 
+    started = time.time()
+    cadence.begin(len(items))
+    try:
+        with profiler.scope(len(items)):
+            frames = [frame for frame, _, _ in items]
+            if analyzer == "student":
+                scored = [(student, probs, None) for probs in student.predict_frames(frames)]
+            else:
+                scored = score_frames(frames, [name for _, _, name in items], child_ids)
+            return [
+                finalize_analysis(frame, session_id, profile, probs, image_embed)
+                for (frame, session_id, _), (profile, probs, image_embed) in zip(items, scored)
+            ]
     except Exception as e:
-        print(f"❌ [CAMERA] Loop error: {e}")
+        result = _analysis_failed([session_id for _, session_id, _ in items], e)
+        return [dict(result) for _ in items]
     finally:
-        if cap:
-            cap.release()
-        camera_active = False
-        print("📹 [CAMERA] Kapatıldı")
+        cadence.end(time.time() - started, len(items))
+
+def camera_meta(worker):
+    return {
+        "node": NODE_ID,
+        "sessionId": worker.session_id,
+        "source": worker.source,
+        "status": worker.status,
+        "backend": worker.profile.get("backendName") if worker.profile else None,
+        "startedAt": worker.started_at,
+    }
+
+def _remove_camera_record(worker):
+    session_store.remove_camera(worker.session_id)
+
+# Her kamera ayrı capture thread'i + ayrı session; hepsi tek inference thread'inde batch'lenir
+camera_manager = CameraManager(
+    analyze_batch,
+    cadence,
+    max_batch=MAX_BATCH_FRAMES,
+    on_heartbeat=lambda worker: session_store.set_camera(worker.session_id, camera_meta(worker)),
+    on_stop=_remove_camera_record,
+    heartbeat_interval=CAMERA_HEARTBEAT,
+)
 
 # ----- API Endpoints -----
 
+@app.before_request
+def _profile_request_begin():
+    # Profil açıksa bütün istek (JSON parse, decode, jsonify) örneklensin
+    if profiler.active:
+        profiler.enter()
+        g.profiled = True
+
+@app.teardown_request
+def _profile_request_end(exc):
+    if g.get("profiled"):
+        profiler.exit()
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    with state_lock:
-        model_loaded = (model is not None)
+    model_loaded = prompt_profiles is not None
     return jsonify({
         "status": "healthy",
-        "camera_active": camera_active,
+        "camera_active": camera_manager.active(),
+        "cameras": len(camera_manager.describe()),
         "model_loaded": model_loaded,
+        "analyzer": DEFAULT_ANALYZER,
+        "studentLoaded": student is not None,
+        "calibratedChildren": len(prototype_index.describe()) if prototype_index is not None else 0,
+        "models": {"clip": clip_models.stats(), "gaze": gaze_models.stats()},
+        "cadence": cadence.stats(),
+        "memory": process_memory(),
+        "node": NODE_ID,
+        "sessionStore": session_store.stats(),
+        "ipc": ipc_server.stats() if ipc_server is not None else None,
         "timestamp": datetime.now().isoformat()
     })
 
+def camera_source(value):
+    """JSON'daki kaynak: None/"auto" -> otomatik, rakam -> index, diğerleri URL/yol"""
+    if value is None or str(value).strip() in ("", "auto"):
+        return None
+    text = str(value).strip()
+    return int(text) if text.isdigit() else text
+
 @app.route('/start_camera', methods=['POST'])
 def start_camera():
-    global camera_active
-
-    if camera_active:
-        return jsonify({"error": "Camera already active"}), 400
+    """{source, sessionId, childId} (hepsi opsiyonel): yeni kamera ayrı bir session olarak açılır"""
+    data = request.get_json(silent=True) or {}
+    source = camera_source(data.get('source'))
+    session_id = data.get('sessionId') or (CAMERA_SESSION_ID if source is None else f"camera-{source}")
+
+    # Paylaşılan depoda başka bir node aynı session'ı veya kaynağı tutuyorsa ikinci kez açma
+    now = time.time()
+    for camera_id, camera in session_store.list_cameras().items():
+        owner = camera.get("node")
+        alive = now - camera.get("updatedAt", 0) < 3 * CAMERA_HEARTBEAT
+        same = camera_id == session_id or camera.get("source") == source
+        if owner and owner != NODE_ID and alive and same:
+            return jsonify({"error": "Camera active on another node", "node": owner, "sessionId": camera_id}), 409
 
     try:
-        camera_thread = threading.Thread(target=camera_loop, name="camera_loop_thread", daemon=True)
-        camera_thread.start()
-
-        return jsonify({"success": True, "message": "Camera started successfully"})
-
+        camera_manager.start(source, session_id, data.get('childId'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    return jsonify({"success": True, "message": "Camera started successfully",
+                    "sessionId": session_id, "source": source})
+
 @app.route('/stop_camera', methods=['POST'])
 def stop_camera():
-    global camera_active
-    camera_active = False
-    return jsonify({"success": True, "message": "Camera stopped"})
+    """{sessionId} veya {source} verilirse sadece o kamera, boşsa hepsi durur"""
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('sessionId')
+    if session_id is None and 'source' in data:
+        session_id = camera_manager.find(camera_source(data.get('source')))
+        if session_id is None:
+            return jsonify({"error": "Kamera bulunamadı"}), 404
+    if session_id is not None:
+        stopped = camera_manager.stop(session_id)
+        if not stopped:
+            return jsonify({"error": f"Kamera bulunamadı: {session_id}"}), 404
+    else:
+        stopped = camera_manager.stop()
+    return jsonify({"success": True, "message": "Camera stopped", "stopped": stopped})
+
+@app.route('/cameras', methods=['GET'])
+def list_cameras():
+    """Bu node'daki kameralar + paylaşılan depodaki diğer node'ların kameraları"""
+    local = camera_manager.describe()
+    local_ids = {camera["sessionId"] for camera in local}
+    now = time.time()
+    remote = [
+        dict(meta, sessionId=camera_id)
+        for camera_id, meta in session_store.list_cameras().items()
+        if camera_id not in local_ids and meta.get("node") != NODE_ID
+        and now - meta.get("updatedAt", 0) < 3 * CAMERA_HEARTBEAT
+    ]
+    return jsonify({"node": NODE_ID, "cameras": local, "remote": remote,
+                    "batches": camera_manager.batches})
 
 @app.route('/emotion_data', methods=['GET'])
 def get_emotion_data():
-    with state_lock:
-        data = dict(current_emotion_data)
+    """?sessionId= verilirse o session'ın son sonucu, yoksa (bütün node'lardaki) en son sonuç"""
+    session_id = request.args.get('sessionId')
+    if session_id:
+        data = session_store.get_result(session_id)
+        if data is None:
+            return jsonify({"error": f"Session bulunamadı: {session_id}"}), 404
+        return jsonify(data)
+
+    data = session_store.latest()
+    if data is None:
+        with state_lock:
+            data = dict(current_emotion_data)
     return jsonify(data)
 
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """Session'ın son sonucu, toplamları ve sahibi olan node"""
+    result = session_store.get_result(session_id)
+    if result is None:
+        return jsonify({"error": f"Session bulunamadı: {session_id}"}), 404
+    return jsonify({
+        "sessionId": session_id,
+        "result": result,
+        "aggregate": session_store.get_aggregate(session_id),
+        "node": session_store.owner(session_id),
+    })
+
+def claim_session(session_id):
+    """Session'ı bu node'a bağlamayı dene -> sahibi olan node (load balancer ipucu)"""
+    try:
+        return session_store.claim(session_id, NODE_ID, AFFINITY_TTL)
+    except Exception as e:
+        print(f"❌ [SESSIONS] Affinity güncellenemedi: {e}")
+        return NODE_ID
+
+def decode_frame(frame_base64):
+    """Base64 JPEG -> BGR frame (decode edilemezse None)"""
+    frame_bytes = base64.b64decode(frame_base64)
+    nparr = np.frombuffer(frame_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def unknown_analyzer(analyzer):
+    """Analyzer geçersizse veya yüklü değilse hata mesajı, değilse None"""
+    if analyzer is None:
+        return None
+    if analyzer not in ANALYZERS:
+        return f"Bilinmeyen analyzer: {analyzer}"
+    if not analyzer_ready(analyzer):
+        return f"Analyzer yüklü değil: {analyzer}"
+    return None
+
+def unknown_profile(profile_name):
+    """Profil bilinmiyorsa hata mesajı, biliniyorsa None"""
+    if prompt_profiles is None:
+        return None
+    try:
+        prompt_profiles.get(profile_name)
+        return None
+    except KeyError:
+        return f"Bilinmeyen profil: {profile_name}"
+
+def analyze_request(frame, session_id, profile_name=None, analyzer=None, child_id=None):
+    """Decode edilmiş tek frame isteği (HTTP ve IPC ortak yolu) -> yanıt dict'i"""
+    owner = claim_session(session_id)
+    resp = analyze_emotion(frame, session_id, profile_name, analyzer, child_id)
+    if resp is None:
+        with state_lock:
+            resp = dict(current_emotion_data)
+
+    # Client bir sonraki frame'i bu kadar bekleyip göndermeli
+    resp["nextAnalysisMs"] = int(cadence.recommend(session_id) * 1000)
+    # Sonraki frame'ler sıcak tracker/cache'i tutan node'a gitsin
+    resp["node"] = owner
+    return resp
+
+def ipc_request(frame, session_id, profile_name, analyzer):
+    """IPC SUBMIT handler'ı: HTTP ile aynı doğrulama, geçersiz istekte ValueError"""
+    error = unknown_analyzer(analyzer) or unknown_profile(profile_name)
+    if error:
+        raise ValueError(error)
+    return analyze_request(frame, session_id, profile_name, analyzer)
+
+def start_ipc_server(path):
+    """EMOTION_IPC_SOCKET yolunda Unix socket kanalını aç, sonuç yayınlarını bağla"""
+    global ipc_server
+    ipc_server = EmotionIpcServer(path, ipc_request).start()
+    result_listeners.append(ipc_server.publish)
+    return ipc_server
+
 @app.route('/analyze_frame', methods=['POST'])
 def analyze_frame_endpoint():
     try:
         data = request.json or {}
         frame_base64 = data.get('frame')
+        session_id = str(data.get('sessionId') or request.remote_addr or "default")
+        profile_name = data.get('profile')
+        analyzer = data.get('analyzer')
+        child_id = data.get('childId')
 
         if not frame_base64:
             return jsonify({"error": "Frame data bulunamadı"}), 400
 
-        # Base64 decode
-        import base64
-        frame_bytes = base64.b64decode(frame_base64)
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        error = unknown_analyzer(analyzer) or unknown_profile(profile_name)
+        if error:
+            return jsonify({"error": error}), 400
 
+        frame = decode_frame(frame_base64)
         if frame is None:
             return jsonify({"error": "Frame decode edilemedi"}), 400
 
-        analyze_emotion(frame)
-
-        with state_lock:
-            resp = dict(current_emotion_data)
-        return jsonify(resp)
+        resp = analyze_request(frame, session_id, profile_name, analyzer, child_id)
+        response = jsonify(resp)
+        response.headers["X-Session-Node"] = resp["node"]
+        return response
 
     except Exception as e:
         print(f"❌ [ANALYZE FRAME] Hata: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/analyze_batch', methods=['POST'])
+def analyze_batch_endpoint():
+    """Birden fazla frame'i (farklı session/profil olabilir) tek image encoder geçişinde analiz et
+
+    Body: {"frames": [{"frame": <base64>, "sessionId": "...", "profile": "...", "childId": "..."}, ...],
+           "analyzer": "clip"}
+    """
+    try:
+        data = request.json or {}
+        entries = data.get('frames')
+        analyzer = data.get('analyzer')
+        if not isinstance(entries, list) or not entries:
+            return jsonify({"error": "frames listesi bulunamadı"}), 400
+        error = unknown_analyzer(analyzer)
+        if error:
+            return jsonify({"error": error}), 400
+        if len(entries) > MAX_BATCH_FRAMES:
+            return jsonify({"error": f"En fazla {MAX_BATCH_FRAMES} frame gönderilebilir"}), 400
+
+        items, child_ids = [], []
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not entry.get('frame'):
+                return jsonify({"error": f"{i}. frame data bulunamadı"}), 400
+            profile_name = entry.get('profile')
+            error = unknown_profile(profile_name)
+            if error:
+                return jsonify({"error": error}), 400
+            frame = decode_frame(entry['frame'])
+            if frame is None:
+                return jsonify({"error": f"{i}. frame decode edilemedi"}), 400
+            session_id = str(entry.get('sessionId') or request.remote_addr or "default")
+            items.append((frame, session_id, profile_name))
+            child_ids.append(entry.get('childId'))
+
+        results = analyze_batch(items, analyzer, child_ids)
+        if results is None:
+            return jsonify({"error": "Model yüklü değil"}), 503
+
+        for (_, session_id, _), resp in zip(items, results):
+            resp["nextAnalysisMs"] = int(cadence.recommend(session_id) * 1000)
+            resp["node"] = claim_session(session_id)
+        return jsonify({"results": results})
+
+    except Exception as e:
+        print(f"❌ [ANALYZE BATCH] Hata: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/prompt_profiles', methods=['GET'])
+def list_prompt_profiles():
+    if prompt_profiles is None:
+        return jsonify({"error": "Model yüklü değil"}), 503
+    return jsonify({"profiles": prompt_profiles.describe()})
+
+@app.route('/prompt_profiles', methods=['POST'])
+def register_prompt_profile():
+    """Yeni profil ekle/güncelle: {"name": "...", "prompts": {...}, "noPersonThreshold": 0.35, "persist": true}"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    if prompt_profiles is None:
+        return jsonify({"error": "Model yüklü değil"}), 503
+    data = request.json or {}
+    name = data.get('name')
+    try:
+        with clip_models.use():  # text encoder için model gerekli
+            profile = prompt_profiles.register(name, data.get('prompts'), data.get('noPersonThreshold'))
+        if data.get('persist'):
+            prompt_profiles.save(name, data['prompts'], data.get('noPersonThreshold'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, "profile": profile.describe()})
+
+@app.route('/prompt_profiles/reload', methods=['POST'])
+def reload_prompt_profiles():
+    """PROMPT_PROFILES_DIR içindeki dosyaları yeniden yükle (restart gerekmez)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    if prompt_profiles is None:
+        return jsonify({"error": "Model yüklü değil"}), 503
+    with clip_models.use():
+        loaded = prompt_profiles.load_dir()
+    return jsonify({"success": True, "loaded": loaded, "profiles": prompt_profiles.describe()})
+
+@app.route('/calibration/enroll', methods=['POST'])
+def enroll_calibration():
+    """Çocuğa etiketli örnek ekle: {"childId": "...", "emotion": "happy", "frame" | "frames": [...], "profile": "..."}"""
+    if prototype_index is None:
+        return jsonify({"error": "Model yüklü değil"}), 503
+    data = request.json or {}
+    child_id = data.get('childId')
+    emotion = data.get('emotion')
+    frames_base64 = data.get('frames') or ([data['frame']] if data.get('frame') else [])
+    try:
+        PrototypeIndex.validate_child(child_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not isinstance(frames_base64, list) or not frames_base64:
+        return jsonify({"error": "Frame data bulunamadı"}), 400
+    if len(frames_base64) > MAX_BATCH_FRAMES:
+        return jsonify({"error": f"En fazla {MAX_BATCH_FRAMES} frame gönderilebilir"}), 400
+    error = unknown_profile(data.get('profile'))
+    if error:
+        return jsonify({"error": error}), 400
+    class_names = prompt_profiles.get(data.get('profile')).class_names
+    if emotion not in class_names:
+        return jsonify({"error": f"Bilinmeyen emotion: {emotion}", "emotions": class_names}), 400
+
+    frames = []
+    for i, frame_base64 in enumerate(frames_base64):
+        frame = decode_frame(frame_base64)
+        if frame is None:
+            return jsonify({"error": f"{i}. frame decode edilemedi"}), 400
+        frames.append(frame)
+
+    try:
+        embeds = embed_frames(frames).float().cpu().numpy()
+        child = prototype_index.enroll(child_id, emotion, embeds)
+    except Exception as e:
+        print(f"❌ [CALIBRATION] Kayıt hatası: {e}")
+        return jsonify({"error": str(e)}), 500
+    print(f"🎯 [CALIBRATION] {child_id}: {len(frames)} {emotion} örneği eklendi")
+    return jsonify({"success": True, "child": child})
+
+@app.route('/calibration/enroll', methods=['GET'])
+def list_calibration():
+    """?childId= verilirse o çocuğun sınıf başına örnek sayıları, yoksa bütün çocuklar"""
+    if prototype_index is None:
+        return jsonify({"error": "Model yüklü değil"}), 503
+    child_id = request.args.get('childId')
+    if child_id:
+        child = prototype_index.describe(child_id)
+        if child is None:
+            return jsonify({"error": f"Kalibrasyon bulunamadı: {child_id}"}), 404
+        return jsonify(child)
+    return jsonify({"children": prototype_index.describe()})
+
+@app.route('/calibration/enroll', methods=['DELETE'])
+def delete_calibration():
+    """Çocuğun bir emotion'unu (?emotion=) veya bütün kalibrasyonunu sil"""
+    if prototype_index is None:
+        return jsonify({"error": "Model yüklü değil"}), 503
+    data = request.get_json(silent=True) or {}
+    child_id = request.args.get('childId') or data.get('childId')
+    emotion = request.args.get('emotion') or data.get('emotion')
+    try:
+        PrototypeIndex.validate_child(child_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not prototype_index.remove(child_id, emotion):
+        return jsonify({"error": f"Kalibrasyon bulunamadı: {child_id}"}), 404
+    return jsonify({"success": True, "child": prototype_index.describe(child_id)})
+
+@app.route('/cadence', methods=['POST'])
+def set_cadence_scale():
+    """Global yük kolu: bütün önerilen aralıkları ölçekle (örn. {"scale": 2.0})"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    data = request.json or {}
+    try:
+        cadence.set_scale(data.get('scale', 1.0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Geçersiz scale"}), 400
+    return jsonify({"success": True, "cadence": cadence.stats()})
+
+def admin_denied():
+    """ADMIN_TOKEN varsa token ister, yoksa sadece localhost'a izin verir -> hata response'u veya None"""
+    if ADMIN_TOKEN:
+        token = request.headers.get("X-Admin-Token") or ""
+        auth = request.headers.get("Authorization") or ""
+        if auth.startswith("Bearer "):
+            token = token or auth[len("Bearer "):]
+        if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({"error": "Yetkisiz"}), 401
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "ADMIN_TOKEN tanımlı değil, sadece localhost"}), 403
+    return None
+
+@app.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """Sonraki N analizi ve/veya T saniyeyi profille: {"frames": 20, "seconds": 30}"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    data = request.json or {}
+    try:
+        frames = int(data['frames']) if data.get('frames') else None
+        seconds = float(data['seconds']) if data.get('seconds') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Geçersiz frames/seconds"}), 400
+    try:
+        out_dir = profiler.start(frames, seconds)
+    except RuntimeError as e:
+        return jsonify({"error": str(e), "status": profiler.status()}), 409
+    return jsonify({"success": True, "dir": out_dir, "status": profiler.status()}), 202
+
+@app.route('/admin/profile', methods=['GET'])
+def profile_status():
+    denied = admin_denied()
+    if denied:
+        return denied
+    return jsonify(profiler.status())
+
 @app.route('/emotion_stream', methods=['GET'])
 def emotion_stream():
+    """?sessionId= verilirse o kameranın sonuçları, yoksa (sessionId içeren) en son sonuç"""
+    session_id = request.args.get('sessionId')
+    if session_id and not camera_manager.active(session_id):
+        return jsonify({"error": f"Aktif kamera bulunamadı: {session_id}"}), 404
+
     def generate():
-        while camera_active:
-            with state_lock:
-                payload = json.dumps(current_emotion_data)
-            yield f"data: {payload}\n\n"
+        while camera_manager.active(session_id):
+            if session_id:
+                data = session_store.get_result(session_id)
+                if data is not None:
+                    data = dict(data, sessionId=session_id)
+            else:
+                data = session_store.latest()
+            if data is not None:
+                yield f"data: {json.dumps(data)}\n\n"
             time.sleep(1)
     return app.response_class(generate(), mimetype='text/plain')
 
@@ -353,8 +822,15 @@ if __name__ == '__main__':
     print("🚀 Emotion Detection Server başlatılıyor...")
     print("📡 Port: 5000")
     print("🌐 CORS enabled for React app")
-    print("📹 Camera endpoint: POST /start_camera")
+    print("📹 Camera endpoint: POST /start_camera  {source, sessionId}")
+    print("🎥 Cameras: GET /cameras")
     print("😊 Emotion endpoint: GET /emotion_data")
     print("🏥 Health check: GET /health")
 
+    if os.environ.get("EMOTION_IPC_SOCKET"):
+        try:
+            start_ipc_server(os.environ["EMOTION_IPC_SOCKET"])
+        except Exception as e:
+            print(f"❌ [IPC] Socket açılamadı: {e}")
+
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+CLIP'ten damıtılmış hafif emotion modeli (student)
+64x64 gri yüz crop'u üzerinde küçük bir CNN; CPU'da milisaniyeler içinde çalışır.
+Eğitim: distill_student.py (CLIP skorları soft label olarak kullanılır).
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+import torch
+import torch.nn as nn
+
+DEFAULT_STUDENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "emotion_student.pt")
+INPUT_SIZE = 64
+FACE_MARGIN = 0.35  # face_cascade.FaceCascade ROI payı ile aynı
+
+
+class StudentNet(nn.Module):
+    """3 conv blok + global average pooling, ~72K parametre"""
+
+    def __init__(self, num_classes):
+        super().__init__()
+
+        def block(cin, cout):
+            return nn.Sequential(
+                nn.Conv2d(cin, cout, 3, padding=1, bias=False),
+                nn.BatchNorm2d(cout),
+                nn.ReLU(inplace=True),
+                nn.Conv2d(cout, cout, 3, padding=1, bias=False),
+                nn.BatchNorm2d(cout),
+                nn.ReLU(inplace=True),
+                nn.MaxPool2d(2),
+            )
+
+        self.features = nn.Sequential(block(1, 16), block(16, 32), block(32, 64))
+        self.head = nn.Sequential(nn.AdaptiveAvgPool2d(1), nn.Flatten(), nn.Dropout(0.2),
+                                  nn.Linear(64, num_classes))
+
+    def forward(self, x):
+        return self.head(self.features(x))
+
+
+def square_box(x0, y0, x1, y1, w, h, margin=FACE_MARGIN):
+    """Kutuyu pay ekleyip kare yap, frame sınırlarına kırp -> int piksel kutu"""
+    cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+    half = max(x1 - x0, y1 - y0, 16) * (1.0 + 2.0 * margin) / 2.0
+    return (max(0, int(cx - half)), max(0, int(cy - half)),
+            min(w, int(cx + half)), min(h, int(cy + half)))
+
+
+def face_crop(frame, box=None):
+    """BGR frame + opsiyonel piksel kutu -> [INPUT_SIZE, INPUT_SIZE] uint8 gri crop
+
+    Kutu yoksa frame'in ortasından kare crop alınır (no_person gibi sınıflar için).
+    """
+    h, w = frame.shape[:2]
+    if box is None:
+        side = min(h, w)
+        x0, y0 = (w - side) // 2, (h - side) // 2
+        box = (x0, y0, x0 + side, y0 + side)
+    x0, y0, x1, y1 = box
+    crop = frame[y0:y1, x0:x1]
+    if crop.size == 0:
+        crop = frame
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def crops_to_tensor(crops):
+    """[N, S, S] uint8 -> [N, 1, S, S] float tensor (per-crop normalize, ışık farklarına dayanıklı)"""
+    x = torch.from_numpy(np.asarray(crops, dtype=np.float32)).unsqueeze(1) / 255.0
+    mean = x.mean(dim=(2, 3), keepdim=True)
+    std = x.std(dim=(2, 3), keepdim=True).clamp_min(1e-3)
+    return (x - mean) / std
+
+
+class FaceBoxDetector:
+    """Student için yüz kutusu: küçültülmüş frame'de MediaPipe short-range detection"""
+
+    def __init__(self, detect_width=320, min_detection_confidence=0.5):
+        import mediapipe as mp
+        self.detect_width = detect_width
+        self.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=0, min_detection_confidence=min_detection_confidence)
+        self._lock = threading.Lock()
+
+    def box(self, frame):
+        h, w = frame.shape[:2]
+        small = frame
+        if w > self.detect_width:
+            small = cv2.resize(frame, (self.detect_width, int(round(h * self.detect_width / float(w)))),
+                               interpolation=cv2.INTER_AREA)
+        with self._lock:
+            results = self.detector.process(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        if not results.detections:
+            return None
+        b = max(results.detections, key=lambda d: d.score[0]).location_data.relative_bounding_box
+        return square_box(b.xmin * w, b.ymin * h, (b.xmin + b.width) * w, (b.ymin + b.height) * h, w, h)
+
+
+class StudentAnalyzer:
+    """Eğitilmiş student modeli; PromptProfile ile aynı alanları taşır (emotion_server.finalize_analysis)"""
+
+    name = "student"
+
+    def __init__(self, path=DEFAULT_STUDENT_PATH, detector=None):
+        checkpoint = torch.load(path, map_location="cpu", weights_only=True)
+        self.class_names = list(checkpoint["class_names"])
+        self.teacher_profile = checkpoint.get("teacher_profile")
+        self.no_person_threshold = checkpoint.get("no_person_threshold", 0.35)
+        self.no_person_idx = self.class_names.index("no_person") if "no_person" in self.class_names else None
+
+        self.model = StudentNet(len(self.class_names))
+        self.model.load_state_dict(checkpoint["state_dict"])
+        self.model.eval()
+        self.detector = detector
+        self._lock = threading.Lock()
+
+    def predict_crops(self, crops):
+        """[N, S, S] uint8 crop -> [N, num_classes] olasılık tensor'u"""
+        with self._lock, torch.no_grad():
+            return torch.softmax(self.model(crops_to_tensor(crops)), dim=-1)
+
+    def predict(self, frame, box=None):
+        """Tek frame -> [num_classes] olasılık; kutu verilmezse dedektör (varsa) kullanılır"""
+        if box is None and self.detector is not None:
+            box = self.detector.box(frame)
+        return self.predict_crops([face_crop(frame, box)])[0]
+
+    def predict_frames(self, frames):
+        """Birden fazla frame tek forward geçişinde -> [N, num_classes]"""
+        boxes = [self.detector.box(f) if self.detector is not None else None for f in frames]
+        return self.predict_crops([face_crop(f, b) for f, b in zip(frames, boxes)])
+
+    def describe(self):
+        return {"name": self.name, "classes": self.class_names, "teacherProfile": self.teacher_profile}
+
+
+def load_student(path=None, with_detector=True):
+    """Model dosyası varsa StudentAnalyzer, yoksa None"""
+    path = path or os.environ.get("STUDENT_MODEL_PATH") or DEFAULT_STUDENT_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        analyzer = StudentAnalyzer(path, FaceBoxDetector() if with_detector else None)
+        print(f"🎓 [STUDENT] Model yüklendi: {path} ({len(analyzer.class_names)} sınıf)")
+        return analyzer
+    except Exception as e:
+        print(f"❌ [STUDENT] Model yüklenemedi: {e}")
+        return None
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+İki aşamalı yüz cascade'i
+1. Short-range face detection küçültülmüş kopya üzerinde
+2. FaceMesh sadece tespit edilen kutunun etrafındaki ROI crop'unda
+ROI frame'ler arasında taşınır: yüz ROI içinde kaldıkça detection atlanır.
+Her session'ın kendi tracking modundaki FaceMesh'i vardır (LRU, max_tracked ile sınırlı);
+böylece taşınan ROI'de FaceMesh de kendi iç detector'ını değil önceki landmark'ları kullanır.
+Landmark'lar tam frame koordinatlarına geri çevrilir (detect_gaze değişmeden çalışır).
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import mediapipe as mp
+
+
+class CascadeResult:
+    """process() çıktısı: landmarks tam frame'e göre normalize, detection atlandıysa None"""
+
+    def __init__(self, landmarks=None, detection=None, roi=None, detected=False):
+        self.landmarks = landmarks
+        self.detection = detection
+        self.roi = roi
+        self.detected = detected  # bu frame'de detection çalıştı mı
+
+
+class FaceCascade:
+    def __init__(self, detect_width=320, roi_margin=0.35, edge_margin=0.05,
+                 min_detection_confidence=0.9, max_tracked=32):
+        self.detect_width = detect_width
+        self.max_tracked = max_tracked    # en fazla bu kadar session'ın ROI'si ve FaceMesh'i tutulur
+        self.roi_margin = roi_margin      # ROI = yüz kutusu + her yönde bu oranda pay
+        self.edge_margin = edge_margin    # landmark'lar crop kenarına bu kadar yaklaşırsa ROI'ye güvenme
+        self.face_detection = mp.solutions.face_detection.FaceDetection(
+            model_selection=0,  # short-range model (2m içi, webcam için yeterli ve hızlı)
+            min_detection_confidence=min_detection_confidence
+        )
+        self._lock = threading.Lock()  # MediaPipe graph'ları thread-safe değil
+        self._rois = {}  # stream/session anahtarı -> (x0, y0, x1, y1) tam frame pikseli
+        # Session anahtarı -> tracking modunda FaceMesh; tracking durumu session'lar arasında karışmaz
+        self._meshes = OrderedDict()
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._rois.clear()
+                while self._meshes:
+                    self._meshes.popitem(last=False)[1].close()
+            else:
+                self._rois.pop(key, None)
+                mesh = self._meshes.pop(key, None)
+                if mesh is not None:
+                    mesh.close()
+
+    def process(self, frame, key="default"):
+        """BGR frame -> CascadeResult"""
+        h, w = frame.shape[:2]
+        with self._lock:
+            roi = self._rois.get(key)
+
+            # 1) Önceki ROI hâlâ yüzü içeriyorsa detection'ı atla
+            if roi is not None:
+                landmarks = self._mesh_in_roi(frame, roi, key, check_edges=True)
+                if landmarks is not None:
+                    new_roi = self._roi_from_landmarks(landmarks, w, h)
+                    self._remember(key, new_roi)
+                    return CascadeResult(landmarks=landmarks, roi=new_roi, detected=False)
+
+            # 2) Küçültülmüş kopyada yüz tespiti
+            detection = self._detect(frame)
+            if detection is None:
+                self._rois.pop(key, None)
+                return CascadeResult(detected=True)
+
+            box = detection.location_data.relative_bounding_box
+            roi = self._expand(box.xmin * w, box.ymin * h, (box.xmin + box.width) * w,
+                               (box.ymin + box.height) * h, w, h)
+
+            # 3) FaceMesh sadece ROI crop'unda
+            landmarks = self._mesh_in_roi(frame, roi, key, check_edges=False)
+            if landmarks is None:
+                self._rois.pop(key, None)
+                return CascadeResult(detection=detection, roi=roi, detected=True)
+
+            new_roi = self._roi_from_landmarks(landmarks, w, h)
+            self._remember(key, new_roi)
+            return CascadeResult(landmarks=landmarks, detection=detection, roi=new_roi, detected=True)
+
+    def _remember(self, key, roi):
+        # En son kullanılan sona gelsin; limit aşılırsa en eski session'ı at
+        self._rois.pop(key, None)
+        self._rois[key] = roi
+        while len(self._rois) > self.max_tracked:
+            self._rois.pop(next(iter(self._rois)))
+
+    def _mesh(self, key):
+        """Session'ın FaceMesh'i (yoksa oluştur); limit aşılırsa en eski session'ınki kapatılır"""
+        mesh = self._meshes.pop(key, None)
+        if mesh is None:
+            mesh = mp.solutions.face_mesh.FaceMesh(
+                static_image_mode=False,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        self._meshes[key] = mesh
+        while len(self._meshes) > self.max_tracked:
+            self._meshes.popitem(last=False)[1].close()
+        return mesh
+
+    def _detect(self, frame):
+        h, w = frame.shape[:2]
+        if w > self.detect_width:
+            scale = self.detect_width / float(w)
+            small = cv2.resize(frame, (self.detect_width, int(round(h * scale))), interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+        results = self.face_detection.process(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        if not results.detections:
+            return None
+        # Relative bounding box ölçekten bağımsız; en güvenilir yüzü al
+        return max(results.detections, key=lambda d: d.score[0])
+
+    def _mesh_in_roi(self, frame, roi, key, check_edges):
+        x0, y0, x1, y1 = roi
+        crop = frame[y0:y1, x0:x1]
+        if crop.size == 0:
+            return None
+        # ROI yüzü takip ettiği için crop'ta yüz yerinde kalır; tracking modu önceki
+        # landmark'lardan devam eder, FaceMesh'in iç detector'ı sadece takip kopunca çalışır
+        results = self._mesh(key).process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        if not results.multi_face_landmarks:
+            return None
+        landmarks = results.multi_face_landmarks[0]
+
+        if check_edges:
+            xs = [lm.x for lm in landmarks.landmark]
+            ys = [lm.y for lm in landmarks.landmark]
+            m = self.edge_margin
+            if min(xs) < m or min(ys) < m or max(xs) > 1 - m or max(ys) > 1 - m:
+                return None  # yüz ROI'den taşıyor, yeniden tespit et
+
+        self._to_frame_coords(landmarks, roi, frame.shape[1], frame.shape[0])
+        return landmarks
+
+    @staticmethod
+    def _to_frame_coords(landmarks, roi, frame_w, frame_h):
+        """Crop'a göre normalize landmark'ları tam frame'e göre normalize et (yerinde)"""
+        x0, y0, x1, y1 = roi
+        cw, ch = float(x1 - x0), float(y1 - y0)
+        for lm in landmarks.landmark:
+            lm.x = (x0 + lm.x * cw) / frame_w
+            lm.y = (y0 + lm.y * ch) / frame_h
+            lm.z = lm.z * cw / frame_w  # z, x ile aynı ölçekte
+
+    def _roi_from_landmarks(self, landmarks, w, h):
+        xs = [lm.x * w for lm in landmarks.landmark]
+        ys = [lm.y * h for lm in landmarks.landmark]
+        return self._expand(min(xs), min(ys), max(xs), max(ys), w, h)
+
+    def _expand(self, x0, y0, x1, y1, w, h):
+        """Kutuyu pay ekleyip kare yap, frame sınırlarına kırp -> int piksel ROI"""
+        cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+        side = max(x1 - x0, y1 - y0, 32) * (1.0 + 2.0 * self.roi_margin)
+        half = side / 2.0
+        nx0, ny0 = max(0, int(cx - half)), max(0, int(cy - half))
+        nx1, ny1 = min(w, int(cx + half)), min(h, int(cy + half))
+        return nx0, ny0, nx1, ny1
@@ -8,29 +8,16 @@ import cv2
 import mediapipe as mp
 import time
 
+from camera_discovery import open_camera
+
 # MediaPipe setup
 mp_face_detection = mp.solutions.face_detection
 mp_drawing = mp.solutions.drawing_utils
 face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.9)
 
-# IriUn webcam DirectShow backend ile
-cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-
-# IriUn için özel ayarlar
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
-cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-
-print("📹 IriUn DirectShow ile kamera açılıyor...")
-
-# Birkaç frame atla (IriUn başlangıçta siyah frame verebilir)
-for i in range(5):
-    ret, frame = cap.read()
-    if ret:
-        print(f"🔍 Frame {i+1}: {frame.shape}")
-    else:
-        print(f"❌ Frame {i+1}: Okunamadı")
+# Kayıtlı capture profilinden aç; yoksa backend/index'ler paralel denenir
+print("📹 Kamera açılıyor...")
+cap, profile, _ = open_camera()
 
 if cap is None or not cap.isOpened():
     print("❌ Hiçbir kamera bulunamadı!")
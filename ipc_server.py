@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Aynı makinedeki tüketiciler için Unix domain socket kanalı
+HTTP/JSON/base64 yerine sabit başlıklı ikili mesajlar; frame JPEG ya da ham BGR gönderilebilir
+(ham BGR'de decode da yapılmaz). Analiz HTTP endpoint'leriyle aynı yoldan ve aynı session
+modeliyle çalışır (emotion_server.analyze_request).
+
+Ortam değişkeni: EMOTION_IPC_SOCKET=/tmp/emotion.sock (verilmezse kanal açılmaz)
+
+Mesaj: başlık "!2sBBI" = b"EM", versiyon, tip, payload uzunluğu; ardından payload.
+Bütün sayılar big-endian, metinler UTF-8.
+    SUBMIT      "!IBBHHHH" request_id, format (0=JPEG, 1=BGR), analyzer (0=varsayılan, 1=clip, 2=student),
+                session_len, profile_len, width, height  + session + profile + görüntü byte'ları
+    SUBSCRIBE   "!H" session_len + session   (boş session = bütün sonuçlar)
+    UNSUBSCRIBE "!H" session_len + session
+    RESULT      "!IfBdIBBBH" request_id (abonelik yayınında 0), confidence, flags (1=looking, 2=face),
+                timestamp (epoch), next_analysis_ms, emotion_len, profile_len, node_len, session_len
+                + emotion + profile + node + session
+    ERROR       "!IH" request_id, message_len + message
+"""
+
+import itertools
+import os
+import queue
+import socket
+import stat
+import struct
+import threading
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+VERSION = 1
+MAGIC = b"EM"
+HEADER = struct.Struct("!2sBBI")
+SUBMIT = struct.Struct("!IBBHHHH")
+SESSION = struct.Struct("!H")
+RESULT = struct.Struct("!IfBdIBBBH")
+ERROR = struct.Struct("!IH")
+
+MSG_SUBMIT, MSG_SUBSCRIBE, MSG_UNSUBSCRIBE, MSG_RESULT, MSG_ERROR = 1, 2, 3, 4, 5
+FORMAT_JPEG, FORMAT_BGR = 0, 1
+ANALYZERS = {0: None, 1: "clip", 2: "student"}
+ANALYZER_CODES = {name: code for code, name in ANALYZERS.items()}
+FLAG_LOOKING, FLAG_FACE = 1, 2
+
+MAX_PAYLOAD = 16 * 1024 * 1024  # 16MB (4K ham BGR frame'e yeter)
+SEND_QUEUE_SIZE = 64            # yavaş abonenin yayınları bundan sonra atılır
+
+
+class IpcError(Exception):
+    pass
+
+
+# ----- Kodlama -----
+
+def _text(raw):
+    """UTF-8 alan -> str; bozuk byte'lar bağlantıyı düşürmesin, ERROR frame'i ile dönsün"""
+    try:
+        return bytes(raw).decode()
+    except UnicodeDecodeError as e:
+        raise IpcError(f"Geçersiz UTF-8 alan: {e.reason}")
+
+
+def _field(text, limit=255):
+    """str -> en fazla limit byte UTF-8; çok byte'lı karakter ortadan bölünmez"""
+    return str(text).encode()[:limit].decode(errors="ignore").encode()
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        r = sock.recv_into(view[got:])
+        if r == 0:
+            raise ConnectionError("Bağlantı kapandı")
+        got += r
+    return buf
+
+
+def read_message(sock):
+    """-> (tip, payload)"""
+    magic, version, msg_type, length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise IpcError("Geçersiz mesaj başlığı")
+    if length > MAX_PAYLOAD:
+        raise IpcError(f"Mesaj çok büyük: {length}")
+    return msg_type, _recv_exact(sock, length) if length else bytearray()
+
+
+def pack_message(msg_type, *parts):
+    length = sum(len(p) for p in parts)
+    return b"".join((HEADER.pack(MAGIC, VERSION, msg_type, length),) + parts)
+
+
+def pack_submit(request_id, session_id, image, profile=None, analyzer=None):
+    """image: JPEG byte'ları veya [H, W, 3] uint8 BGR numpy dizisi"""
+    session = (session_id or "").encode()
+    profile_bytes = (profile or "").encode()
+    if isinstance(image, np.ndarray):
+        frame = np.ascontiguousarray(image, dtype=np.uint8)
+        h, w = frame.shape[:2]
+        head = SUBMIT.pack(request_id, FORMAT_BGR, ANALYZER_CODES[analyzer], len(session), len(profile_bytes), w, h)
+        data = frame.reshape(-1).data  # 1 boyutlu: len() byte sayısı olsun
+    else:
+        head = SUBMIT.pack(request_id, FORMAT_JPEG, ANALYZER_CODES[analyzer], len(session), len(profile_bytes), 0, 0)
+        data = bytes(image)
+    return pack_message(MSG_SUBMIT, head, session, profile_bytes, data)
+
+
+def unpack_submit(payload):
+    """-> (request_id, session_id, profile, analyzer, frame)"""
+    request_id, fmt, analyzer, session_len, profile_len, w, h = SUBMIT.unpack_from(payload)
+    offset = SUBMIT.size
+    session_id = _text(payload[offset:offset + session_len])
+    offset += session_len
+    profile = _text(payload[offset:offset + profile_len]) or None
+    offset += profile_len
+    image = memoryview(payload)[offset:]
+
+    if analyzer not in ANALYZERS:
+        raise IpcError(f"Bilinmeyen analyzer kodu: {analyzer}")
+    if fmt == FORMAT_BGR:
+        if len(image) != w * h * 3:
+            raise IpcError("BGR boyutu width*height*3 ile uyuşmuyor")
+        frame = np.frombuffer(image, np.uint8).reshape(h, w, 3)
+    elif fmt == FORMAT_JPEG:
+        frame = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise IpcError("Frame decode edilemedi")
+    else:
+        raise IpcError(f"Bilinmeyen frame formatı: {fmt}")
+    return request_id, session_id, profile, ANALYZERS[analyzer], frame
+
+
+def pack_session(msg_type, session_id):
+    session = (session_id or "").encode()
+    return pack_message(msg_type, SESSION.pack(len(session)), session)
+
+
+def unpack_session(payload):
+    (length,) = SESSION.unpack_from(payload)
+    return _text(payload[SESSION.size:SESSION.size + length])
+
+
+def pack_result(request_id, session_id, result):
+    flags = (FLAG_LOOKING if result.get("lookingAtScreen") else 0) | (FLAG_FACE if result.get("faceDetected") else 0)
+    try:
+        timestamp = datetime.fromisoformat(result["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        timestamp = 0.0
+    emotion = _field(result.get("emotion", ""))
+    profile = _field(result.get("profile") or "")
+    node = _field(result.get("node") or "")
+    session = (session_id or "").encode()
+    head = RESULT.pack(request_id, float(result.get("confidence", 0.0)), flags, timestamp,
+                       int(result.get("nextAnalysisMs") or 0), len(emotion), len(profile), len(node), len(session))
+    return pack_message(MSG_RESULT, head, emotion, profile, node, session)
+
+
+def unpack_result(payload):
+    """-> (request_id, HTTP /analyze_frame ile aynı alanlara sahip dict)"""
+    (request_id, confidence, flags, timestamp, next_ms,
+     emotion_len, profile_len, node_len, session_len) = RESULT.unpack_from(payload)
+    offset = RESULT.size
+    fields = []
+    for length in (emotion_len, profile_len, node_len, session_len):
+        fields.append(_text(payload[offset:offset + length]))
+        offset += length
+    emotion, profile, node, session_id = fields
+    result = {
+        "emotion": emotion,
+        "confidence": confidence,
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat() if timestamp else None,
+        "lookingAtScreen": bool(flags & FLAG_LOOKING),
+        "faceDetected": bool(flags & FLAG_FACE),
+        "profile": profile or None,
+        "sessionId": session_id,
+    }
+    if next_ms:
+        result["nextAnalysisMs"] = next_ms
+    if node:
+        result["node"] = node
+    return request_id, result
+
+
+def pack_error(request_id, message):
+    text = _field(message, 65535)
+    return pack_message(MSG_ERROR, ERROR.pack(request_id, len(text)), text)
+
+
+def unpack_error(payload):
+    request_id, length = ERROR.unpack_from(payload)
+    return request_id, _text(payload[ERROR.size:ERROR.size + length])
+
+
+# ----- Server -----
+
+class _Connection:
+    """Tek client: okuma kendi thread'inde, yazma sıralı kuyruktan ayrı thread'de"""
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.subscriptions = set()  # "" = bütün session'lar
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._closed = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._read_loop, name="ipc_reader", daemon=True).start()
+        threading.Thread(target=self._write_loop, name="ipc_writer", daemon=True).start()
+
+    def send(self, data, block=True):
+        """Yanıtlar bekler (block), abonelik yayınları kuyruk doluysa atılır"""
+        if self._closed.is_set():
+            return
+        try:
+            self._queue.put(data, block=block, timeout=5.0 if block else None)
+        except queue.Full:
+            self.dropped += 1
+
+    def wants(self, session_id):
+        subs = self.subscriptions
+        return bool(subs) and ("" in subs or session_id in subs)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.server._remove(self)
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _write_loop(self):
+        while not self._closed.is_set():
+            data = self._queue.get()
+            if data is None:
+                return
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.close()
+                return
+
+    def _read_loop(self):
+        try:
+            while not self._closed.is_set():
+                msg_type, payload = read_message(self.sock)
+                if msg_type == MSG_SUBMIT:
+                    self._handle_submit(payload)
+                elif msg_type in (MSG_SUBSCRIBE, MSG_UNSUBSCRIBE):
+                    self._handle_subscription(msg_type, payload)
+                else:
+                    self.send(pack_error(0, f"Bilinmeyen mesaj tipi: {msg_type}"))
+        except (ConnectionError, OSError):
+            pass
+        except (IpcError, struct.error) as e:
+            self.send(pack_error(0, e))
+        finally:
+            self.close()
+
+    def _handle_subscription(self, msg_type, payload):
+        # Frame sınırları sağlam: bozuk payload bağlantıyı kapatmaz, ERROR ile bildirilir
+        try:
+            session_id = unpack_session(payload)
+        except (IpcError, struct.error) as e:
+            self.send(pack_error(0, e))
+            return
+        if msg_type == MSG_SUBSCRIBE:
+            self.subscriptions = self.subscriptions | {session_id}
+        else:
+            self.subscriptions = self.subscriptions - {session_id}
+
+    def _handle_submit(self, payload):
+        request_id = 0
+        try:
+            # Hata yanıtı doğru isteğe gitsin diye id'yi frame'den önce oku
+            (request_id,) = struct.unpack_from("!I", payload)
+            request_id, session_id, profile, analyzer, frame = unpack_submit(payload)
+            result = self.server.handler(frame, session_id or "ipc", profile, analyzer)
+            self.send(pack_result(request_id, session_id, result))
+        except (IpcError, ValueError, struct.error) as e:
+            self.send(pack_error(request_id, e))
+        except Exception as e:
+            print(f"❌ [IPC] Analiz hatası: {e}")
+            self.send(pack_error(request_id, e))
+
+
+class EmotionIpcServer:
+    """handler(frame, session_id, profile, analyzer) -> sonuç dict'i; geçersiz istekte ValueError"""
+
+    def __init__(self, path, handler):
+        self.path = path
+        self.handler = handler
+        self._lock = threading.Lock()
+        self._connections = set()
+        self._sock = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise IpcError(f"{self.path} socket değil, silinmedi")
+            os.unlink(self.path)  # önceki çalışmadan kalan socket
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o660)  # sadece aynı kullanıcı/grup
+        self._sock.listen(64)
+        threading.Thread(target=self._accept_loop, name="ipc_accept", daemon=True).start()
+        print(f"🔌 [IPC] Unix socket dinleniyor: {self.path}")
+        return self
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def publish(self, session_id, result):
+        """Sonucu abone olan bağlantılara yayınla (analiz thread'ini bloklamaz)"""
+        with self._lock:
+            targets = [c for c in self._connections if c.wants(session_id)]
+        if not targets:
+            return
+        data = pack_result(0, session_id, result)
+        for conn in targets:
+            conn.send(data, block=False)
+
+    def stats(self):
+        with self._lock:
+            return {"path": self.path, "connections": len(self._connections),
+                    "dropped": sum(c.dropped for c in self._connections)}
+
+    def _remove(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+
+    def _accept_loop(self):
+        while self._sock is not None:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            conn = _Connection(self, sock)
+            with self._lock:
+                self._connections.add(conn)
+            conn.start()
+
+
+# ----- Client -----
+
+class EmotionIpcClient:
+    """Python tüketiciler için client
+
+        client = EmotionIpcClient("/tmp/emotion.sock")
+        result = client.analyze(frame_bgr, "kiosk-1")          # HTTP /analyze_frame ile aynı alanlar
+        client.subscribe("kiosk-1", lambda r: print(r["emotion"]))
+    """
+
+    def __init__(self, path=None, timeout=30.0):
+        self.path = path or os.environ.get("EMOTION_IPC_SOCKET")
+        self.timeout = timeout
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self.path)
+        self._send_lock = threading.Lock()
+        self._pending = {}  # request_id -> [Event, sonuç]
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._callbacks = {}  # session ("" = hepsi) -> callback
+        self._closed = False
+        threading.Thread(target=self._read_loop, name="ipc_client_reader", daemon=True).start()
+
+    def analyze(self, image, session_id, profile=None, analyzer=None):
+        """image: JPEG byte'ları veya BGR numpy frame -> sonuç dict'i; hata durumunda IpcError"""
+        request_id = next(self._ids) % 0xFFFFFFFF + 1  # 0 abonelik yayınlarına ayrılmış
+        slot = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = slot
+        try:
+            self._send(pack_submit(request_id, session_id, image, profile, analyzer))
+            if not slot[0].wait(self.timeout):
+                raise IpcError("Yanıt zaman aşımına uğradı")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        if isinstance(slot[1], Exception):
+            raise slot[1]
+        return slot[1]
+
+    def subscribe(self, session_id, callback):
+        """session_id=None -> bütün session'ların sonuçları; callback reader thread'inde çağrılır"""
+        self._callbacks[session_id or ""] = callback
+        self._send(pack_session(MSG_SUBSCRIBE, session_id))
+
+    def unsubscribe(self, session_id=None):
+        self._callbacks.pop(session_id or "", None)
+        self._send(pack_session(MSG_UNSUBSCRIBE, session_id))
+
+    def close(self):
+        self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, data):
+        with self._send_lock:
+            self._sock.sendall(data)
+
+    def _resolve(self, request_id, value):
+        with self._pending_lock:
+            slot = self._pending.get(request_id)
+        if slot is not None:
+            slot[1] = value
+            slot[0].set()
+
+    def _read_loop(self):
+        try:
+            while True:
+                msg_type, payload = read_message(self._sock)
+                if msg_type == MSG_RESULT:
+                    request_id, result = unpack_result(payload)
+                    if request_id:
+                        self._resolve(request_id, result)
+                        continue
+                    callback = self._callbacks.get(result["sessionId"]) or self._callbacks.get("")
+                    if callback is not None:
+                        try:
+                            callback(result)
+                        except Exception as e:
+                            print(f"❌ [IPC] Callback hatası: {e}")
+                elif msg_type == MSG_ERROR:
+                    request_id, message = unpack_error(payload)
+                    if request_id:
+                        self._resolve(request_id, IpcError(message))
+                    else:
+                        print(f"❌ [IPC] Server hatası: {message}")
+        except (ConnectionError, OSError, IpcError):
+            if not self._closed:
+                print("⚠️ [IPC] Server bağlantısı kapandı")
+        finally:
+            with self._pending_lock:
+                slots = list(self._pending.values())
+            for slot in slots:
+                slot[1] = IpcError("Bağlantı kapandı")
+                slot[0].set()
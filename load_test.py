@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Emotion server yük testi
+Kayıtlı JPEG frame'leri N adet sanal tarayıcı session'ı ile localhost server'a gönderir
+
+Örnek:
+    python load_test.py --sessions 50 --ramp linear:30 --duration 120 --server-pid 12345
+"""
+
+import argparse
+import base64
+import glob
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+# cameraEmotionService.ts ile aynı değerler
+CLIENT_TICK_SECONDS = 1.0        # setInterval(..., 1000)
+DEFAULT_ANALYSIS_MS = 3000       # DEFAULT_ANALYSIS_INTERVAL
+MIN_ANALYSIS_MS = 1000           # MIN_ANALYSIS_INTERVAL
+MAX_ANALYSIS_MS = 15000          # MAX_ANALYSIS_INTERVAL
+CLIENT_WIDTH, CLIENT_HEIGHT, CLIENT_JPEG_QUALITY = 640, 480, 80
+
+
+def load_frames(frames_dir):
+    """Frame'leri client'ın gönderdiği base64 JPEG formatına getir"""
+    paths = sorted(glob.glob(os.path.join(frames_dir, "*.jpg")) + glob.glob(os.path.join(frames_dir, "*.jpeg")))
+    if not paths:
+        raise SystemExit(f"❌ [LOAD] {frames_dir} içinde JPEG bulunamadı")
+
+    try:
+        import cv2
+    except ImportError:
+        cv2 = None
+
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        if cv2 is not None:
+            # Tarayıcıdaki canvas.toDataURL('image/jpeg', 0.8) ile aynı boyut/kalite
+            import numpy as np
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is not None:
+                img = cv2.resize(img, (CLIENT_WIDTH, CLIENT_HEIGHT))
+                ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, CLIENT_JPEG_QUALITY])
+                if ok:
+                    data = buf.tobytes()
+        frames.append(base64.b64encode(data).decode("ascii"))
+
+    print(f"🖼️ [LOAD] {len(frames)} frame yüklendi ({frames_dir})")
+    return frames
+
+
+def parse_ramp(spec, sessions):
+    """Ramp profilinden session başlangıç zamanlarını (saniye) üret
+
+    constant         -> hepsi t=0'da
+    linear:<sn>      -> <sn> saniyeye eşit dağıtılmış
+    step:<n>:<sn>    -> her <sn> saniyede <n> session
+    """
+    parts = spec.split(":")
+    kind = parts[0]
+    if kind == "constant":
+        return [0.0] * sessions
+    if kind == "linear" and len(parts) == 2:
+        duration = float(parts[1])
+        return [duration * i / max(1, sessions) for i in range(sessions)]
+    if kind == "step" and len(parts) == 3:
+        per_step, step_seconds = int(parts[1]), float(parts[2])
+        return [(i // max(1, per_step)) * step_seconds for i in range(sessions)]
+    raise SystemExit(f"❌ [LOAD] Geçersiz ramp profili: {spec}")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))  # nearest-rank
+    return ordered[idx]
+
+
+def read_rss_mb(pid):
+    """Linux /proc üzerinden server RSS (MB)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+class Metrics:
+    """Thread-safe istek metrikleri"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}   # endpoint -> [saniye]
+        self.statuses = {}    # endpoint -> {status: adet}
+        self.window_requests = 0
+        self.timeline = []    # periyodik örnekler
+
+    def record(self, endpoint, status, latency):
+        with self.lock:
+            self.statuses.setdefault(endpoint, {})
+            self.statuses[endpoint][status] = self.statuses[endpoint].get(status, 0) + 1
+            if status == 200:
+                self.latencies.setdefault(endpoint, []).append(latency)
+            self.window_requests += 1
+
+    def take_window(self):
+        with self.lock:
+            count = self.window_requests
+            self.window_requests = 0
+            return count
+
+    def summary(self):
+        with self.lock:
+            result = {}
+            for endpoint, statuses in self.statuses.items():
+                total = sum(statuses.values())
+                lat = self.latencies.get(endpoint, [])
+                errors = sum(n for s, n in statuses.items() if s != 200)
+                result[endpoint] = {
+                    "requests": total,
+                    "p50Ms": round(percentile(lat, 50) * 1000, 1),
+                    "p99Ms": round(percentile(lat, 99) * 1000, 1),
+                    "errorRate": round(errors / total, 4) if total else 0.0,
+                    "rate429": round(statuses.get(429, 0) / total, 4) if total else 0.0,
+                    "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+                }
+            return result
+
+
+def http_request(url, body=None, timeout=30.0):
+    """(status, parsed_json_or_None) döndürür; bağlantı hatası status=0"""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method="POST" if data else "GET")
+    if data:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            raw = resp.read()
+            try:
+                return resp.status, json.loads(raw)
+            except ValueError:
+                return resp.status, None
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, OSError):
+        return 0, None
+
+
+def browser_session(base_url, frames, metrics, stop_event, poll_emotion_data):
+    """cameraEmotionService.captureAndAnalyzeFrame döngüsünü taklit et"""
+    session_id = str(uuid.uuid4())
+    analysis_interval = DEFAULT_ANALYSIS_MS / 1000.0
+    last_analysis = 0.0
+    frame_idx = random.randrange(len(frames))
+
+    while not stop_event.is_set():
+        now = time.time()
+        if last_analysis == 0.0 or now - last_analysis >= analysis_interval:
+            last_analysis = now
+            started = time.time()
+            status, data = http_request(f"{base_url}/analyze_frame",
+                                        {"frame": frames[frame_idx], "sessionId": session_id})
+            metrics.record("/analyze_frame", status, time.time() - started)
+            frame_idx = (frame_idx + 1) % len(frames)
+
+            # Server'ın önerdiği aralığı client ile aynı sınırlarla uygula
+            next_ms = data.get("nextAnalysisMs") if isinstance(data, dict) else None
+            if isinstance(next_ms, (int, float)):
+                analysis_interval = min(MAX_ANALYSIS_MS, max(MIN_ANALYSIS_MS, next_ms)) / 1000.0
+            else:
+                analysis_interval = DEFAULT_ANALYSIS_MS / 1000.0
+
+        if poll_emotion_data:
+            started = time.time()
+            status, _ = http_request(f"{base_url}/emotion_data")
+            metrics.record("/emotion_data", status, time.time() - started)
+
+        stop_event.wait(CLIENT_TICK_SECONDS)
+
+
+def stream_consumer(base_url, metrics, stop_event):
+    """/emotion_stream'e bağlanıp satır okuyan tüketici"""
+    while not stop_event.is_set():
+        started = time.time()
+        try:
+            with urllib.request.urlopen(f"{base_url}/emotion_stream", timeout=10.0) as resp:
+                first = True
+                for line in resp:
+                    if first:
+                        metrics.record("/emotion_stream", resp.status, time.time() - started)
+                        first = False
+                    if stop_event.is_set():
+                        return
+                    if not line.strip():
+                        continue
+                if first:
+                    # Kamera aktif değilse stream hemen kapanır
+                    metrics.record("/emotion_stream", resp.status, time.time() - started)
+        except urllib.error.HTTPError as e:
+            metrics.record("/emotion_stream", e.code, time.time() - started)
+        except (urllib.error.URLError, OSError):
+            metrics.record("/emotion_stream", 0, time.time() - started)
+        stop_event.wait(CLIENT_TICK_SECONDS)
+
+
+def run(args):
+    base_url = args.url.rstrip("/")
+    frames = load_frames(args.frames_dir)
+    start_offsets = parse_ramp(args.ramp, args.sessions)
+
+    status, _ = http_request(f"{base_url}/health", timeout=5.0)
+    if status != 200:
+        raise SystemExit(f"❌ [LOAD] {base_url}/health cevap vermiyor (status={status})")
+
+    metrics = Metrics()
+    stop_event = threading.Event()
+    threads = []
+    t0 = time.time()
+
+    def spawn(target, *targs):
+        t = threading.Thread(target=target, args=targs, daemon=True)
+        t.start()
+        threads.append(t)
+
+    for _ in range(args.stream_clients):
+        spawn(stream_consumer, base_url, metrics, stop_event)
+
+    print(f"🚀 [LOAD] {args.sessions} session, ramp={args.ramp}, süre={args.duration}s -> {base_url}")
+
+    pending = sorted(start_offsets)
+    active = 0
+    next_report = t0 + args.report_interval
+    while True:
+        now = time.time()
+        elapsed = now - t0
+        if elapsed >= args.duration:
+            break
+
+        while pending and pending[0] <= elapsed:
+            pending.pop(0)
+            spawn(browser_session, base_url, frames, metrics, stop_event, args.poll_emotion_data)
+            active += 1
+
+        if now >= next_report:
+            requests_in_window = metrics.take_window()
+            rss = read_rss_mb(args.server_pid) if args.server_pid else None
+            uss = None
+            if args.server_pid is None:
+                # PID verilmediyse emotion_server /health içindeki bellek bilgisini kullan
+                _, health = http_request(f"{base_url}/health", timeout=5.0)
+                memory = health.get("memory") if isinstance(health, dict) else None
+                if isinstance(memory, dict):
+                    rss, uss = memory.get("rssMb"), memory.get("ussMb")
+            sample = {
+                "t": round(elapsed, 1),
+                "activeSessions": active,
+                "throughputRps": round(requests_in_window / args.report_interval, 2),
+                "rssMb": round(rss, 1) if rss is not None else None,
+                "ussMb": uss,
+            }
+            metrics.timeline.append(sample)
+            print(f"📊 [LOAD] t={sample['t']}s sessions={active} "
+                  f"rps={sample['throughputRps']} rss={sample['rssMb']}MB")
+            next_report += args.report_interval
+
+        time.sleep(0.05)
+
+    stop_event.set()
+    for t in threads:
+        t.join(timeout=5.0)
+
+    total_seconds = time.time() - t0
+    summary = metrics.summary()
+    total_requests = sum(ep["requests"] for ep in summary.values())
+    report = {
+        "url": base_url,
+        "sessions": args.sessions,
+        "ramp": args.ramp,
+        "durationSeconds": round(total_seconds, 1),
+        "throughputRps": round(total_requests / total_seconds, 2) if total_seconds else 0.0,
+        "endpoints": summary,
+        "timeline": metrics.timeline,
+    }
+
+    print("\n📋 [LOAD] Sonuçlar")
+    print(f"   Toplam throughput: {report['throughputRps']} req/s")
+    for endpoint, s in summary.items():
+        print(f"   {endpoint}: {s['requests']} istek | p50 {s['p50Ms']}ms | p99 {s['p99Ms']}ms | "
+              f"hata %{s['errorRate'] * 100:.1f} | 429 %{s['rate429'] * 100:.1f}")
+    rss_values = [s["rssMb"] for s in metrics.timeline if s["rssMb"] is not None]
+    if rss_values:
+        print(f"   Server RSS: min {min(rss_values):.1f}MB / max {max(rss_values):.1f}MB")
+
+    if args.report_json:
+        with open(args.report_json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 [LOAD] Rapor kaydedildi: {args.report_json}")
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emotion server yük testi")
+    parser.add_argument("--url", default="http://localhost:5000", help="Server adresi")
+    parser.add_argument("--sessions", type=int, default=10, help="Sanal tarayıcı session sayısı")
+    parser.add_argument("--duration", type=float, default=60.0, help="Toplam test süresi (saniye)")
+    parser.add_argument("--ramp", default="constant",
+                        help="constant | linear:<saniye> | step:<adet>:<saniye>")
+    parser.add_argument("--frames-dir", default="debug_frames", help="Gönderilecek JPEG klasörü")
+    parser.add_argument("--stream-clients", type=int, default=0, help="/emotion_stream tüketici sayısı")
+    parser.add_argument("--poll-emotion-data", action="store_true",
+                        help="Her session her saniye /emotion_data da çeksin")
+    parser.add_argument("--server-pid", type=int, default=None, help="RSS takibi için server PID")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Zaman serisi örnekleme aralığı")
+    parser.add_argument("--report-json", default=None, help="Sonuç raporunun yazılacağı JSON dosyası")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
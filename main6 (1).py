@@ -6,9 +6,13 @@ import mediapipe as mp
 import time
 import atexit
 import numpy as np
+import os
 import requests
 import json
 import random
+import threading
+
+from clip_features import encode_texts, encode_images, logit_scale
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
@@ -16,19 +20,23 @@ model_name = "openai/clip-vit-base-patch32"
 model = CLIPModel.from_pretrained(model_name).to(device)
 processor = CLIPProcessor.from_pretrained(model_name)
 
+# Promptlar server'ın "main6" profiliyle aynı dosyadan gelir (iki kopya birbirinden kopmasın)
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_banks", "main6.json"), encoding="utf-8") as f:
+    main6_prompt_bank = json.load(f)["prompts"]
+# Ekranda "a happy child" / "an angry child"; sınıf başına ilk prompt kullanılır
 emotion_labels_dict = {
-    "a happy child": "a child with a wide smile and bright eyes, looking happy",
-    "a sad child": "a child with teary eyes and a downturned mouth, looking sad",
-    "a bored child": "a child with a bored expression, half-closed eyes, drooping eyelids, yawning or resting their chin on their hand",
-    "a confused child": "a child tilting their head slightly, with eyebrows raised unevenly, looking confused",
-    "a surprised child": "a child with wide open eyes and mouth, showing surprise",
-    "an angry child": "a child with tightly pressed lips and furrowed eyebrows, showing anger",
-    "a neutral child": "a child with relaxed facial muscles and a calm expression, looking neutral"
+    f"{'an' if emotion[0] in 'aeiou' else 'a'} {emotion} child": prompts[0]
+    for emotion, prompts in main6_prompt_bank.items()
 }
 
 emotion_prompts = list(emotion_labels_dict.values())
 display_labels = list(emotion_labels_dict.keys())
 
+# Promptlar sabit: text embedding'lerini bir kez hesapla, frame başına sadece image encoder
+model.eval()
+text_embeds = encode_texts(model, processor, emotion_prompts, device)
+clip_scale = logit_scale(model)
+
 mp_face_mesh = mp.solutions.face_mesh
 face_mesh = mp_face_mesh.FaceMesh(refine_landmarks=True)
 
@@ -81,6 +89,110 @@ def get_color_name(h, s, v):
         else:
             return "Unknown"
 
+class InferenceWorker:
+    """CLIP + FaceMesh'i arka planda çalıştırır; her zaman en yeni frame'i işler"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = None  # (frame, capture_time) - işlenmeyen eski frame'in üstüne yazılır
+        self._result = None
+        self._result_id = 0
+        self._running = True
+        self.fps = 0.0
+        self._thread = threading.Thread(target=self._run, name="inference_worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame):
+        with self._cond:
+            self._pending = (frame, time.time())
+            self._cond.notify()
+
+    def latest(self):
+        """(result_id, result) - result_id yeni sonuç gelince artar"""
+        with self._cond:
+            return self._result_id, self._result
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=2.0)
+
+    def _run(self):
+        last_done = None
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, captured_at = self._pending
+                self._pending = None
+
+            try:
+                result = self._infer(frame)
+            except Exception as e:
+                print(f"❌ [INFERENCE] Hata: {e}")
+                continue
+            result["captured_at"] = captured_at
+
+            now = time.time()
+            if last_done is not None:
+                rate = 1.0 / max(now - last_done, 1e-6)
+                self.fps = rate if self.fps == 0.0 else 0.8 * self.fps + 0.2 * rate
+            last_done = now
+
+            with self._cond:
+                self._result = result
+                self._result_id += 1
+
+    def _infer(self, frame):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        image_embeds = encode_images(model, processor, [Image.fromarray(rgb_frame)], device)
+        probs = (clip_scale * image_embeds @ text_embeds.T).softmax(dim=1)
+        best_prob, best_idx = torch.max(probs, 1)
+        predicted_label = display_labels[best_idx.item()]
+
+        gaze_status = "UNKNOWN"
+        looking = False
+
+        results = face_mesh.process(rgb_frame)
+
+        h, w, _ = frame.shape
+        if results.multi_face_landmarks:
+            for face_landmarks in results.multi_face_landmarks:
+                left_iris = [468, 469, 470, 471]
+                right_iris = [473, 474, 475, 476]
+
+                lx = int(sum([face_landmarks.landmark[i].x for i in left_iris]) / len(left_iris) * w)
+                rx = int(sum([face_landmarks.landmark[i].x for i in right_iris]) / len(right_iris) * w)
+
+                gaze_x = (lx + rx) // 2
+
+                if w * 0.4 < gaze_x < w * 0.6:
+                    gaze_status = "LOOKING AT SCREEN"
+                    looking = True
+                    color = (0, 255, 0)
+                else:
+                    gaze_status = "NOT LOOKING AT SCREEN"
+                    looking = False
+                    color = (0, 0, 255)
+                break
+        else:
+            color = (0, 255, 255)
+            gaze_status = "NO FACE DETECTED"
+
+        return {"label": predicted_label, "gaze_status": gaze_status, "looking": looking, "color": color}
+
+
+worker = InferenceWorker()
+atexit.register(worker.stop)
+
+last_result_id = 0
+render_fps = 0.0
+
+# Render döngüsü kamera hızında çalışır, en son inference sonucunu overlay eder
 while True:
     ret, frame = cap.read()
     if not ret:
@@ -89,60 +201,33 @@ while True:
     current_time = time.time()
     elapsed = current_time - last_time
     last_time = current_time
+    if elapsed > 0:
+        render_fps = 1.0 / elapsed if render_fps == 0.0 else 0.9 * render_fps + 0.1 * (1.0 / elapsed)
 
-    pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-    inputs = processor(
-        text=emotion_prompts,
-        images=pil_image,
-        return_tensors="pt",
-        padding=True
-    ).to(device)
-
-    with torch.no_grad():
-        outputs_clip = model(**inputs)
+    worker.submit(frame)
+    result_id, result = worker.latest()
 
-    logits_per_image = outputs_clip.logits_per_image
-    probs = logits_per_image.softmax(dim=1)
+    if result is not None:
+        predicted_label = result["label"]
+        gaze_status = result["gaze_status"]
+        looking = result["looking"]
+        color = result["color"]
+        result_age = current_time - result["captured_at"]
 
-    best_prob, best_idx = torch.max(probs, 1)
-    predicted_label = display_labels[best_idx.item()]
-
-    gaze_status = "UNKNOWN"
-    looking = False
-
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(rgb_frame)
-
-    h, w, _ = frame.shape
-    if results.multi_face_landmarks:
-        for face_landmarks in results.multi_face_landmarks:
-            left_iris = [468, 469, 470, 471]
-            right_iris = [473, 474, 475, 476]
-
-            lx = int(sum([face_landmarks.landmark[i].x for i in left_iris]) / len(left_iris) * w)
-            rx = int(sum([face_landmarks.landmark[i].x for i in right_iris]) / len(right_iris) * w)
-
-            gaze_x = (lx + rx) // 2
-
-            if w * 0.4 < gaze_x < w * 0.6:
-                gaze_status = "LOOKING AT SCREEN"
-                looking = True
-                color = (0, 255, 0)
-            else:
-                gaze_status = "NOT LOOKING AT SCREEN"
-                looking = False
-                color = (0, 0, 255)
-            break
-    else:
-        color = (0, 255, 255)
-        gaze_status = "NO FACE DETECTED"
-
-    if predicted_label in emotion_stats:
+        # Süre render hızında, bakma oranı her yeni inference sonucunda sayılır
         emotion_stats[predicted_label]["time"] += elapsed
-        emotion_stats[predicted_label]["total"] += 1
-        if looking:
-            emotion_stats[predicted_label]["looked"] += 1
+        if result_id != last_result_id:
+            emotion_stats[predicted_label]["total"] += 1
+            if looking:
+                emotion_stats[predicted_label]["looked"] += 1
+            last_result_id = result_id
+    else:
+        predicted_label = "..."
+        gaze_status = "WAITING FOR MODEL"
+        color = (128, 128, 128)
+        result_age = 0.0
 
+    h, w, _ = frame.shape
     frame = cv2.resize(frame, (int(w * 1.3), int(h * 1.3)))
     h, w, _ = frame.shape
     canvas = 255 * np.ones((h + 200, w + 400, 3), dtype=np.uint8)
@@ -173,6 +258,14 @@ while True:
     cv2.putText(canvas, f"Object Color: {color_name}", (w + 20, 180),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2, cv2.LINE_AA)
 
+    # Pipeline durumu: sonuç yaşı ve iki döngünün hızı
+    cv2.putText(canvas, f"Result age: {result_age:.2f}s", (w + 20, 240),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (80, 80, 80), 1, cv2.LINE_AA)
+    cv2.putText(canvas, f"Render: {render_fps:.1f} fps", (w + 20, 270),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (80, 80, 80), 1, cv2.LINE_AA)
+    cv2.putText(canvas, f"Inference: {worker.fps:.1f} fps", (w + 20, 300),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (80, 80, 80), 1, cv2.LINE_AA)
+
     total_time = time.time() - start_time
     y_offset = h + 40
     for label, stats in emotion_stats.items():
@@ -194,5 +287,6 @@ while True:
     if cv2.waitKey(1) & 0xFF == ord("q"):
         break
 
+worker.stop()
 cap.release()
 cv2.destroyAllWindows()
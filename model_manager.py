@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Boşta model bırakma / ihtiyaçta yeniden yükleme
+MODEL_IDLE_TIMEOUT saniye boyunca kullanılmayan model bırakılır (referanslar silinir, gc,
+CUDA cache ve glibc malloc_trim ile bellek OS'a geri verilir). Sonraki istek modeli yeniden
+yükler; yükleme/bırakma sürerken gelen istekler condition üzerinde sırayla bekler.
+
+Kullanım:
+    manager = ModelManager("clip", load, unload)
+    with manager.use():
+        ...  # model bu blok boyunca bırakılmaz
+
+MODEL_IDLE_TIMEOUT=0 (varsayılan) bırakmayı kapatır; modeller eskisi gibi hep yüklü kalır.
+"""
+
+import ctypes
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+from model_weights import process_memory
+
+IDLE_TIMEOUT = float(os.environ.get("MODEL_IDLE_TIMEOUT", "0"))
+
+
+def trim_heap():
+    """glibc'de serbest kalan heap sayfalarını OS'a geri ver (başka platformlarda no-op)"""
+    try:
+        return bool(ctypes.CDLL("libc.so.6").malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+def release_memory():
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    trim_heap()
+
+
+def _rss_mb():
+    memory = process_memory()
+    return memory.get("rssMb") if memory else None
+
+
+class ModelManager:
+    """Tek bir model grubunun yaşam döngüsü: load() yükler, unload() referansları bırakır"""
+
+    def __init__(self, name, load, unload, idle_timeout=None, loaded=True):
+        self.name = name
+        self.load_fn = load
+        self.unload_fn = unload
+        self.idle_timeout = IDLE_TIMEOUT if idle_timeout is None else float(idle_timeout)
+        self.loaded = loaded
+
+        self._cond = threading.Condition()
+        self._busy = False      # yükleme veya bırakma sürüyor
+        self._in_flight = 0     # use() içindeki istek sayısı
+        self._last_used = time.time()
+        self.loads = 0
+        self.unloads = 0
+        self.last_load_seconds = None
+
+        if self.idle_timeout > 0:
+            threading.Thread(target=self._idle_loop, name=f"{name}_idle_unloader", daemon=True).start()
+
+    @contextmanager
+    def use(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self):
+        """Model yüklü değilse yükle (tek thread yükler, diğerleri bekler)"""
+        with self._cond:
+            while True:
+                if self._busy:
+                    self._cond.wait()
+                    continue
+                if self.loaded:
+                    self._in_flight += 1
+                    self._last_used = time.time()
+                    return
+                self._busy = True
+                break
+
+        started = time.time()
+        try:
+            self.load_fn()
+        except Exception:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self.loaded = True
+            self._busy = False
+            self.loads += 1
+            self.last_load_seconds = round(time.time() - started, 3)
+            self._in_flight += 1
+            self._last_used = time.time()
+            self._cond.notify_all()
+        print(f"♻️ [MODELS] {self.name} yeniden yüklendi ({self.last_load_seconds}s, rss={_rss_mb()}MB)")
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._last_used = time.time()
+
+    def unload(self):
+        """Kullanımda değilse hemen bırak -> bırakıldı mı"""
+        with self._cond:
+            if not self.loaded or self._busy or self._in_flight:
+                return False
+            self._busy = True
+
+        before = _rss_mb()
+        try:
+            self.unload_fn()
+        except Exception as e:
+            # Referanslar hâlâ duruyor olabilir: model yüklü sayılmaya devam etsin
+            print(f"❌ [MODELS] {self.name} bırakılamadı: {e}")
+            with self._cond:
+                self._busy = False
+                self._last_used = time.time()  # idle döngüsü hemen tekrar denemesin
+                self._cond.notify_all()
+            return False
+
+        release_memory()
+        with self._cond:
+            self.loaded = False
+            self._busy = False
+            self.unloads += 1
+            self._cond.notify_all()
+        print(f"💤 [MODELS] {self.name} bırakıldı (rss {before}MB -> {_rss_mb()}MB)")
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "loaded": self.loaded,
+                "inFlight": self._in_flight,
+                "idleSeconds": round(time.time() - self._last_used, 1),
+                "idleTimeout": self.idle_timeout,
+                "loads": self.loads,
+                "unloads": self.unloads,
+                "lastLoadSeconds": self.last_load_seconds,
+            }
+
+    def _idle_loop(self):
+        interval = min(max(self.idle_timeout / 4.0, 0.5), 10.0)
+        while True:
+            time.sleep(interval)
+            with self._cond:
+                idle = self.loaded and not self._busy and not self._in_flight \
+                    and time.time() - self._last_used >= self.idle_timeout
+            if idle:
+                self.unload()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+CLIP ağırlık yükleme yardımcıları
+mmap modunda model bir kez diske dönüştürülür, her process ağırlıkları read-only map eder;
+böylece aynı makinedeki N process page cache'teki tek fiziksel kopyayı paylaşır.
+
+Ortam değişkenleri:
+    CLIP_WEIGHTS_MODE=pretrained|mmap   (varsayılan: pretrained)
+    CLIP_MMAP_DIR=<klasör>              (varsayılan: <repo>/model_cache/<model adı>)
+
+Tek seferlik dönüşüm:
+    python model_weights.py openai/clip-vit-base-patch32
+"""
+
+import os
+import sys
+import time
+
+import torch
+from transformers import CLIPConfig, CLIPModel, CLIPProcessor
+
+try:
+    import fcntl  # Linux/macOS: aynı anda açılan process'ler dönüşümü tek sefer yapsın
+except ImportError:
+    fcntl = None
+
+WEIGHTS_FILE = "weights.pt"
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+
+
+def default_mmap_dir(model_name):
+    # cwd'den bağımsız: farklı dizinden başlatılan süreçler aynı dosyayı (aynı page cache'i) map'lesin
+    return os.environ.get("CLIP_MMAP_DIR") or os.path.join(MODEL_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def convert_to_mmap(model_name, out_dir):
+    """from_pretrained ile yükleyip mmap'lenebilir formatta kaydet (parametreler + buffer'lar)"""
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"🔄 [WEIGHTS] {model_name} mmap formatına dönüştürülüyor -> {out_dir}")
+
+    model = CLIPModel.from_pretrained(model_name)
+    model.eval()
+    model.config.save_pretrained(out_dir)
+    CLIPProcessor.from_pretrained(model_name).save_pretrained(out_dir)
+
+    # Non-persistent buffer'lar (örn. position_ids) state_dict'te yok, ayrıca kaydediyoruz
+    tensors = {name: p.detach().contiguous() for name, p in model.named_parameters()}
+    tensors.update({name: b.detach().contiguous() for name, b in model.named_buffers()})
+
+    tmp_path = os.path.join(out_dir, WEIGHTS_FILE + ".tmp")
+    torch.save(tensors, tmp_path)
+    os.replace(tmp_path, os.path.join(out_dir, WEIGHTS_FILE))
+    print(f"✅ [WEIGHTS] Dönüşüm tamamlandı ({len(tensors)} tensor)")
+
+
+def _ensure_converted(model_name, out_dir):
+    weights_path = os.path.join(out_dir, WEIGHTS_FILE)
+    if os.path.exists(weights_path):
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+    lock_file = open(os.path.join(out_dir, ".convert.lock"), "w")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Kilidi beklerken başka bir process dönüştürmüş olabilir
+        if not os.path.exists(weights_path):
+            convert_to_mmap(model_name, out_dir)
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _assign_tensors(model, tensors):
+    """Tensor'ları kopyalamadan modülün parametre/buffer slotlarına yerleştir"""
+    for name, tensor in tensors.items():
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name) if module_name else model
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+
+
+def load_mmap(model_dir):
+    """Dönüştürülmüş ağırlıkları read-only mmap ile yükle (sadece CPU)"""
+    config = CLIPConfig.from_pretrained(model_dir)
+
+    # Meta device'ta iskelet oluştur -> rastgele init için bellek ayrılmaz
+    with torch.device("meta"):
+        model = CLIPModel(config)
+
+    tensors = torch.load(os.path.join(model_dir, WEIGHTS_FILE), map_location="cpu",
+                         mmap=True, weights_only=True)
+    _assign_tensors(model, tensors)
+
+    missing = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise RuntimeError(f"mmap ağırlıklarında eksik tensor: {missing[:5]}")
+
+    model.eval()
+    processor = CLIPProcessor.from_pretrained(model_dir)
+    return model, processor
+
+
+def load_clip(model_name, device, mode=None):
+    """CLIP_WEIGHTS_MODE'a (veya verilen mode'a) göre (model, processor) döndür"""
+    mode = (mode or os.environ.get("CLIP_WEIGHTS_MODE", "pretrained")).lower()
+
+    if mode == "mmap" and device == "cpu":
+        started = time.time()
+        model_dir = default_mmap_dir(model_name)
+        try:
+            _ensure_converted(model_name, model_dir)
+            model, processor = load_mmap(model_dir)
+            print(f"🗺️ [WEIGHTS] mmap ile yüklendi ({model_dir}, {time.time() - started:.2f}s)")
+            return model, processor
+        except Exception as e:
+            print(f"⚠️ [WEIGHTS] mmap yükleme başarısız, from_pretrained'e dönülüyor: {e}")
+    elif mode == "mmap":
+        # GPU'da ağırlıklar zaten device belleğine kopyalanıyor, mmap paylaşımı anlamsız
+        print(f"⚠️ [WEIGHTS] mmap modu sadece CPU'da geçerli, device={device}")
+
+    model = CLIPModel.from_pretrained(model_name).to(device)
+    model.eval()
+    processor = CLIPProcessor.from_pretrained(model_name)
+    return model, processor
+
+
+def process_memory():
+    """Bu process'in bellek kullanımı (MB): rss, pss ve process'e özel (uss) kısım"""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+
+    def mb(kb):
+        return round(kb / 1024.0, 1)
+
+    return {
+        "rssMb": mb(fields.get("Rss", 0)),
+        "pssMb": mb(fields.get("Pss", 0)),
+        "ussMb": mb(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)),
+        "sharedMb": mb(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)),
+    }
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "openai/clip-vit-base-patch32"
+    target = sys.argv[2] if len(sys.argv) > 2 else default_mmap_dir(name)
+    convert_to_mmap(name, target)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Doğruluk / gecikme / bellek Pareto taraması
+Etiketli bir frame klasörünü bütün konfigürasyon kombinasyonlarıyla server'ın gerçek
+analyze_emotion yolundan geçirir; her konfigürasyon için doğruluk, sınıf bazlı recall,
+ortalama/p99 gecikme ve tepe RSS artışını ölçer, baskın olmayan (Pareto) konfigürasyonları işaretler.
+
+Klasör yapısı: <data>/<etiket>/*.jpg  (etiket = server emotion'u, örn. happy, sad;
+"no_person" klasöründeki frame'ler faceDetected=False dönerse doğru sayılır)
+
+Örnek:
+    python pareto_sweep.py --data labeled_frames --prompts 1,3,all --thresholds 0.25,0.35,0.45 \\
+        --resolutions 224,480,full --crops full,face --analyzers clip,student --out sweep.json
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import threading
+import time
+
+# Proje modülleri ortam değişkenlerini import anında okur: override'lar her import'tan önce.
+# Tarama server'ın kalıcı depolarını kirletmesin
+os.environ.pop("EMBEDDING_STORE_DIR", None)
+os.environ["SESSION_STORE"] = "memory"
+os.environ["MODEL_IDLE_TIMEOUT"] = "0"  # konfigürasyonlar arasında model bırakılıp RSS ölçümünü bozmasın
+
+import cv2
+import numpy as np
+
+from load_test import percentile, read_rss_mb
+from model_manager import trim_heap
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+NO_PERSON = "no_person"
+METRIC_DIRECTIONS = {"accuracy": "max", "meanMs": "min", "p99Ms": "min", "peakRssMb": "min"}
+
+
+class PeakRssSampler:
+    """Arka planda RSS örnekleyip konfigürasyon süresince tepe değeri tutar
+
+    Ölçüm başında önceki konfigürasyonların artıkları toplanıp OS'a geri verilir;
+    `growth` = tepe - başlangıç, yani yüklü model hariç sadece bu konfigürasyonun ek maliyeti.
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.baseline = 0.0
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def growth(self):
+        return max(0.0, self.peak - self.baseline)
+
+    def __enter__(self):
+        gc.collect()
+        trim_heap()
+        self.baseline = self.peak = read_rss_mb(os.getpid()) or 0.0
+        self._thread = threading.Thread(target=self._run, name="rss_sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _sample(self):
+        rss = read_rss_mb(os.getpid())
+        if rss is not None:
+            self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+
+def load_dataset(data_dir, limit=None):
+    """-> [(etiket, frame)] ; her alt klasör bir etiket"""
+    samples = []
+    for label in sorted(os.listdir(data_dir)):
+        label_dir = os.path.join(data_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        files = sorted(f for f in os.listdir(label_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for filename in files[:limit] if limit else files:
+            frame = cv2.imread(os.path.join(label_dir, filename))
+            if frame is not None:
+                samples.append((label, frame))
+    return samples
+
+
+def parse_list(text, cast=str):
+    return [cast(v.strip()) for v in text.split(",") if v.strip()]
+
+
+def resize_max_side(frame, max_side):
+    h, w = frame.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return frame
+    scale = max_side / float(max(h, w))
+    return cv2.resize(frame, (int(round(w * scale)), int(round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def crop_to_face(frame, face_detector):
+    """Yüz kutusu (pay dahil) crop'u; yüz yoksa frame olduğu gibi"""
+    box = face_detector.box(frame)
+    if box is None:
+        return frame
+    x0, y0, x1, y1 = box
+    crop = frame[y0:y1, x0:x1]
+    return crop if crop.size else frame
+
+
+def truncated_bank(prompt_bank, count):
+    """Her sınıfın ilk `count` promptu (None = hepsi)"""
+    return {cls: prompts[:count] if count else list(prompts) for cls, prompts in prompt_bank.items()}
+
+
+def build_configs(args, server):
+    analyzers = [a for a in parse_list(args.analyzers) if server.analyzer_ready(a)]
+    skipped = set(parse_list(args.analyzers)) - set(analyzers)
+    if skipped:
+        print(f"⚠️ [SWEEP] Yüklü olmayan analyzer'lar atlandı: {', '.join(sorted(skipped))}")
+
+    prompt_counts = [None if p == "all" else int(p) for p in parse_list(args.prompts)]
+    thresholds = parse_list(args.thresholds, float)
+    resolutions = [0 if r == "full" else int(r) for r in parse_list(args.resolutions)]
+    crops = parse_list(args.crops)
+
+    configs = []
+    for analyzer, prompts, threshold, resolution, crop in itertools.product(
+            analyzers, prompt_counts, thresholds, resolutions, crops):
+        if analyzer == "student" and prompts != prompt_counts[0]:
+            continue  # student prompt kullanmaz, tek sefer çalışsın
+        configs.append({
+            "analyzer": analyzer,
+            "prompts": "-" if analyzer == "student" else (prompts or "all"),
+            "threshold": threshold,
+            "resolution": resolution or "full",
+            "crop": crop,
+        })
+    return configs
+
+
+@contextlib.contextmanager
+def configured(server, config, base_profile):
+    """Konfigürasyonu geçici profil/eşik olarak uygula -> analyze_emotion'a verilecek profil adı"""
+    if config["analyzer"] == "student":
+        previous = server.student.no_person_threshold
+        server.student.no_person_threshold = config["threshold"]
+        try:
+            yield None
+        finally:
+            server.student.no_person_threshold = previous
+        return
+
+    count = None if config["prompts"] == "all" else config["prompts"]
+    name = f"sweep-p{config['prompts']}-t{int(round(config['threshold'] * 100))}"
+    with server.clip_models.use(), contextlib.redirect_stdout(io.StringIO()):
+        server.prompt_profiles.register(name, truncated_bank(base_profile.prompt_bank, count), config["threshold"])
+    try:
+        yield name
+    finally:
+        server.prompt_profiles.remove(name)
+
+
+def run_config(server, config, samples, base_profile, face_detector, warmup):
+    session_id = "sweep-" + "-".join(str(v) for v in config.values())
+    latencies, correct, per_class = [], 0, {}
+    warmup = min(warmup, len(samples) - 1)  # en az bir frame ölçülsün
+
+    with configured(server, config, base_profile) as profile_name, PeakRssSampler() as rss:
+        for i, (label, frame) in enumerate(samples):
+            started = time.perf_counter()
+            frame = resize_max_side(frame, config["resolution"] if config["resolution"] != "full" else 0)
+            if config["crop"] == "face":
+                frame = crop_to_face(frame, face_detector)
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = server.analyze_emotion(frame, session_id, profile_name, config["analyzer"])
+            elapsed = (time.perf_counter() - started) * 1000
+            if i >= warmup:
+                latencies.append(elapsed)
+
+            if label == NO_PERSON:
+                hit = not result["faceDetected"]
+            else:
+                hit = result["emotion"] == label
+            correct += int(hit)
+            stats = per_class.setdefault(label, [0, 0])
+            stats[0] += int(hit)
+            stats[1] += 1
+        server.cadence.forget(session_id)
+        server.session_store.forget(session_id)
+
+    return dict(
+        config,
+        accuracy=round(correct / float(len(samples)), 4),
+        recall={label: round(hit / float(total), 4) for label, (hit, total) in sorted(per_class.items())},
+        meanMs=round(float(np.mean(latencies)), 2) if latencies else None,
+        p99Ms=round(percentile(latencies, 99), 2) if latencies else None,
+        peakRssMb=round(rss.growth, 1),
+    )
+
+
+def pareto_frontier(results, objectives):
+    """Hiçbir hedefte daha kötü olmayıp en az birinde daha iyi olan başka sonuç yoksa frontier'dadır"""
+    def oriented(result):
+        return [result[m] if METRIC_DIRECTIONS[m] == "max" else -result[m] for m in objectives]
+
+    points = [oriented(r) for r in results]
+    frontier = []
+    for i, p in enumerate(points):
+        dominated = any(
+            all(q[k] >= p[k] for k in range(len(p))) and any(q[k] > p[k] for k in range(len(p)))
+            for j, q in enumerate(points) if j != i
+        )
+        if not dominated:
+            frontier.append(i)
+    return frontier
+
+
+def print_table(results, frontier):
+    header = f"{'':2}{'analyzer':<9}{'prompts':>8}{'thr':>6}{'res':>6}{'crop':>6}" \
+             f"{'acc':>8}{'mean ms':>9}{'p99 ms':>9}{'+rss MB':>9}"
+    print(header)
+    print("-" * len(header))
+    order = sorted(range(len(results)), key=lambda i: (-results[i]["accuracy"], results[i]["meanMs"] or 0))
+    for i in order:
+        r = results[i]
+        mark = "*" if i in frontier else ""
+        print(f"{mark:<2}{r['analyzer']:<9}{str(r['prompts']):>8}{r['threshold']:>6.2f}{str(r['resolution']):>6}"
+              f"{r['crop']:>6}{r['accuracy']:>8.1%}{r['meanMs'] or 0:>9.1f}{r['p99Ms'] or 0:>9.1f}"
+              f"{r['peakRssMb']:>9.0f}")
+    print("* = Pareto frontier")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emotion pipeline konfigürasyonlarının Pareto taraması")
+    parser.add_argument("--data", required=True, help="Etiketli frame klasörü (<etiket>/*.jpg)")
+    parser.add_argument("--profile", default=None, help="Prompt'ların alınacağı profil (varsayılan: children)")
+    parser.add_argument("--prompts", default="1,3,all", help="Sınıf başına prompt sayıları")
+    parser.add_argument("--thresholds", default="0.25,0.35,0.45", help="no_person eşikleri")
+    parser.add_argument("--resolutions", default="224,480,full", help="Uzun kenar (piksel) veya full")
+    parser.add_argument("--crops", default="full,face", help="full ve/veya face")
+    parser.add_argument("--analyzers", default="clip,student", help="clip ve/veya student")
+    parser.add_argument("--limit", type=int, default=None, help="Etiket başına en fazla bu kadar frame")
+    parser.add_argument("--warmup", type=int, default=3, help="Gecikmeye sayılmayan ilk frame sayısı")
+    parser.add_argument("--objectives", default="accuracy,p99Ms",
+                        help=f"Pareto hedefleri ({', '.join(METRIC_DIRECTIONS)})")
+    parser.add_argument("--out", default=None, help="Sonuç JSON dosyası")
+    args = parser.parse_args()
+
+    objectives = parse_list(args.objectives)
+    unknown = [m for m in objectives if m not in METRIC_DIRECTIONS]
+    if unknown:
+        raise SystemExit(f"❌ [SWEEP] Bilinmeyen hedef: {', '.join(unknown)}")
+
+    samples = load_dataset(args.data, args.limit)
+    if not samples:
+        raise SystemExit(f"❌ [SWEEP] {args.data} içinde etiketli frame yok")
+    labels = sorted({label for label, _ in samples})
+    print(f"📂 [SWEEP] {len(samples)} frame, {len(labels)} etiket: {', '.join(labels)}")
+
+    import emotion_server as server  # model, profiller ve gaze server ile birebir aynı yüklenir
+    if server.prompt_profiles is None and server.student is None:
+        raise SystemExit("❌ [SWEEP] Hiçbir analyzer yüklenemedi")
+    base_profile = server.prompt_profiles.get(args.profile) if server.prompt_profiles else None
+
+    face_detector = None
+    if "face" in parse_list(args.crops):
+        from emotion_student import FaceBoxDetector
+        face_detector = FaceBoxDetector()
+
+    configs = build_configs(args, server)
+    print(f"🧪 [SWEEP] {len(configs)} konfigürasyon taranacak")
+    results = []
+    for n, config in enumerate(configs, 1):
+        result = run_config(server, config, samples, base_profile, face_detector, args.warmup)
+        results.append(result)
+        print(f"   [{n}/{len(configs)}] {config} -> {result['accuracy']:.1%}, "
+              f"{result['meanMs']}ms ort, {result['p99Ms']}ms p99")
+
+    frontier = pareto_frontier(results, objectives)
+    print()
+    print_table(results, frontier)
+
+    if args.out:
+        report = {
+            "data": os.path.abspath(args.data),
+            "frames": len(samples),
+            "labels": labels,
+            "objectives": objectives,
+            "results": results,
+            "frontier": [results[i] for i in frontier],
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 [SWEEP] Rapor kaydedildi: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+İsteğe bağlı profil toplama (sonraki N analiz veya T saniye)
+- torch profiler: analiz frame'lerinin op bazlı süreleri + chrome trace
+- örnekleyici Python profiler: sys._current_frames ile profillenen thread'lerin stack'leri
+  (processor, forward, face_mesh.process, JSON, lock beklemeleri hepsi görünür)
+
+Çıktılar PROFILE_DIR/<zaman>/ altında (varsayılan: bu klasörde profiles/):
+    summary.json      en çok zaman alan fonksiyonlar ve torch op'ları
+    top_functions.txt okunabilir özet
+    stacks.folded     flamegraph.pl / speedscope için katlanmış stack'ler
+    torch_trace.json  chrome://tracing veya Perfetto ile açılır
+
+Kapalıyken maliyet tek bir bool kontrolüdür (scope() NULL_SCOPE döner).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+
+import torch
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+MAX_SECONDS = 300.0  # sadece frame sayısı verilirse güvenlik sınırı
+NULL_SCOPE = nullcontext()
+
+
+def _frame_key(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Scope:
+    def __init__(self, profiler, frames):
+        self.profiler = profiler
+        self.frames = frames
+
+    def __enter__(self):
+        self.profiler.enter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.exit(self.frames)
+        return False
+
+
+class OnDemandProfiler:
+    """Aynı anda tek profil oturumu; analiz kodu scope() ile sarılır"""
+
+    def __init__(self, root=None, sample_interval=0.005):
+        self.root = root or os.environ.get("PROFILE_DIR") or DEFAULT_PROFILE_DIR
+        self.sample_interval = sample_interval
+        self.active = False  # sıcak yoldaki tek kontrol
+        self.last_summary = None
+
+        self._lock = threading.Lock()
+        self._torch_lock = threading.Lock()  # torch profiler aynı anda tek thread'de çalışabiliyor
+        self._depth = {}      # thread ident -> iç içe scope sayısı
+        self._torch = {}      # thread ident -> açık torch profile
+        self._done = threading.Event()
+        self._session = None
+
+    # ----- Sıcak yol -----
+
+    def scope(self, frames=0):
+        """Profil açıksa bu thread'i izlemeye al; frames kadar analiz sayılır"""
+        if not self.active:
+            return NULL_SCOPE
+        return _Scope(self, frames)
+
+    def enter(self):
+        if not self.active:
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(ident, 0)
+        if depth == 0 and self._torch_lock.acquire(blocking=False):
+            prof = torch.profiler.profile(activities=self._activities())
+            prof.__enter__()
+            self._torch[ident] = prof
+        # Örnekleyici thread'i profiler kurulduktan sonra görsün
+        with self._lock:
+            self._depth[ident] = depth + 1
+
+    def exit(self, frames=0):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(ident)
+            if depth is None:
+                return  # scope profil başlamadan açılmıştı
+            if depth > 1:
+                self._depth[ident] = depth - 1
+            else:
+                del self._depth[ident]
+        prof = self._torch.pop(ident, None) if depth == 1 else None
+        if prof is not None:
+            try:
+                prof.__exit__(None, None, None)
+                self._collect_torch(prof)
+            finally:
+                self._torch_lock.release()
+        if frames:
+            self._count(frames)
+
+    # ----- Oturum kontrolü -----
+
+    def start(self, frames=None, seconds=None):
+        """Profil oturumunu başlat -> çıktı klasörü; zaten çalışıyorsa RuntimeError"""
+        if not frames and not seconds:
+            frames = 20
+        with self._lock:
+            if self.active or self._session is not None:
+                raise RuntimeError("Profil zaten çalışıyor")
+            out_dir = os.path.join(self.root, datetime.now().strftime("%Y%m%d-%H%M%S"))
+            os.makedirs(out_dir, exist_ok=True)
+            self._session = {
+                "dir": out_dir,
+                "targetFrames": int(frames) if frames else None,
+                "targetSeconds": float(seconds) if seconds else None,
+                "startedAt": time.time(),
+                "frames": 0,
+                "torchFrames": 0,
+                "samples": 0,
+                "self": Counter(),
+                "cumulative": Counter(),
+                "stacks": Counter(),
+                "torchOps": {},
+                "traceEvents": [],
+            }
+            self._done.clear()
+            self.active = True
+
+        timeout = min(float(seconds), MAX_SECONDS) if seconds else MAX_SECONDS
+        threading.Thread(target=self._run, args=(timeout,), name="profiler_sampler", daemon=True).start()
+        print(f"🔬 [PROFILE] Başladı: {frames or '-'} frame / {seconds or '-'}s -> {out_dir}")
+        return out_dir
+
+    def status(self):
+        with self._lock:
+            if not self.active:
+                return {"active": False, "last": self.last_summary}
+            s = self._session
+            return {"active": True, "dir": s["dir"], "frames": s["frames"], "samples": s["samples"],
+                    "targetFrames": s["targetFrames"], "targetSeconds": s["targetSeconds"],
+                    "elapsedSeconds": round(time.time() - s["startedAt"], 2)}
+
+    def _count(self, frames):
+        with self._lock:
+            if self._session is None:
+                return
+            self._session["frames"] += frames
+            target = self._session["targetFrames"]
+            if target and self._session["frames"] >= target:
+                self._done.set()
+
+    def _activities(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        return activities
+
+    # ----- Toplama -----
+
+    def _run(self, timeout):
+        deadline = time.time() + timeout
+        me = threading.get_ident()
+        while not self._done.is_set() and time.time() < deadline:
+            self._sample(me)
+            self._done.wait(self.sample_interval)
+
+        with self._lock:
+            self.active = False  # yeni scope açılmasın; açık olanlar exit'te kapanır
+        # Açık torch profile'ları olan thread'lerin frame'i bitirmesini kısa süre bekle
+        waited = time.time()
+        while self._torch and time.time() - waited < 5.0:
+            time.sleep(0.01)
+        try:
+            self._write()
+        except Exception as e:
+            print(f"❌ [PROFILE] Rapor yazılamadı: {e}")
+
+    def _sample(self, sampler_ident):
+        with self._lock:
+            tracked = [ident for ident in self._depth if ident != sampler_ident]
+        if not tracked:
+            return
+        frames = sys._current_frames()
+        with self._lock:
+            s = self._session
+            for ident in tracked:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame.f_code))
+                    frame = frame.f_back
+                s["samples"] += 1
+                s["self"][stack[0]] += 1
+                for key in set(stack):
+                    s["cumulative"][key] += 1
+                s["stacks"][";".join(reversed(stack))] += 1
+
+    def _collect_torch(self, prof):
+        with self._lock:
+            session = self._session
+        if session is None:
+            return  # oturum bu frame bitmeden kapandı
+        ops = {}
+        for event in prof.events():
+            entry = ops.setdefault(event.name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += event.self_cpu_time_total
+            entry[2] += event.cpu_time_total
+
+        trace_path = os.path.join(session["dir"], f".trace-{threading.get_ident()}.json")
+        prof.export_chrome_trace(trace_path)
+        try:
+            with open(trace_path) as f:
+                events = json.load(f).get("traceEvents", [])
+        finally:
+            os.remove(trace_path)
+
+        with self._lock:
+            s = session
+            s["torchFrames"] += 1
+            s["traceEvents"].extend(events)
+            for name, (count, self_us, total_us) in ops.items():
+                entry = s["torchOps"].setdefault(name, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += self_us
+                entry[2] += total_us
+
+    def _write(self, top=30):
+        with self._lock:
+            s = self._session
+            elapsed = time.time() - s["startedAt"]
+            samples = max(1, s["samples"])
+
+            def ranked(counter):
+                return [{"function": key, "samples": n, "percent": round(100.0 * n / samples, 1)}
+                        for key, n in counter.most_common(top)]
+
+            torch_ops = sorted(s["torchOps"].items(), key=lambda kv: -kv[1][1])[:top]
+            summary = {
+                "dir": s["dir"],
+                "frames": s["frames"],
+                "torchFrames": s["torchFrames"],
+                "seconds": round(elapsed, 2),
+                "samples": s["samples"],
+                "sampleIntervalMs": self.sample_interval * 1000,
+                "topSelf": ranked(s["self"]),
+                "topCumulative": ranked(s["cumulative"]),
+                "torchOps": [{"op": name, "calls": count, "selfCpuMs": round(self_us / 1000.0, 3),
+                              "cpuMs": round(total_us / 1000.0, 3)}
+                             for name, (count, self_us, total_us) in torch_ops],
+            }
+            stacks = s["stacks"]
+            trace_events = s["traceEvents"]
+
+        out_dir = summary["dir"]
+        with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(out_dir, "stacks.folded"), "w", encoding="utf-8") as f:
+            for stack, n in stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        with open(os.path.join(out_dir, "torch_trace.json"), "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events}, f)
+        with open(os.path.join(out_dir, "top_functions.txt"), "w", encoding="utf-8") as f:
+            f.write(f"{summary['frames']} frame, {summary['seconds']}s, {summary['samples']} örnek\n\n")
+            for title, rows in (("Self", summary["topSelf"]), ("Kümülatif", summary["topCumulative"])):
+                f.write(f"== {title} ==\n")
+                for row in rows:
+                    f.write(f"{row['percent']:>6.1f}% {row['samples']:>6}  {row['function']}\n")
+                f.write("\n")
+            f.write(f"== Torch op'ları ({summary['torchFrames']} frame) ==\n")
+            for row in summary["torchOps"]:
+                f.write(f"{row['selfCpuMs']:>10.2f}ms self {row['cpuMs']:>10.2f}ms toplam "
+                        f"{row['calls']:>6}x  {row['op']}\n")
+
+        with self._lock:
+            self.last_summary = {k: summary[k] for k in ("dir", "frames", "torchFrames", "seconds", "samples")}
+            self.last_summary["topSelf"] = summary["topSelf"][:5]
+            self._session = None
+        print(f"🔬 [PROFILE] Tamamlandı: {summary['frames']} frame, {summary['samples']} örnek -> {out_dir}")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+İsimli prompt bank profilleri
+Her profil kendi text embedding matrisini bellekte tutar; aynı image embedding'leri
+birden fazla profile karşı skorlanabilir. Profiller çalışma anında yüklenebilir.
+
+Profil dosyası (prompt_banks/<isim>.json), rescore_embeddings.py --prompts ile aynı format:
+    {"prompts": {"happy": ["...", ...], ...}, "noPersonThreshold": 0.35}
+"""
+
+import json
+import os
+import re
+import threading
+
+import torch
+
+from clip_features import encode_texts, logit_scale
+from emotion_prompts import (
+    emotion_prompt_bank, NO_PERSON_THRESHOLD, flatten_prompt_bank, class_pooling_matrix
+)
+
+DEFAULT_PROFILE = "children"
+MAX_CLASSES = int(os.environ.get("PROMPT_PROFILE_MAX_CLASSES", "32"))
+MAX_PROMPTS = int(os.environ.get("PROMPT_PROFILE_MAX_PROMPTS", "256"))  # profil başına toplam (text encoder maliyeti)
+_VALID_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class PromptProfile:
+    """Tek profil: sınıflar + [dim, num_classes] skor matrisi (logit_scale ve prompt ortalaması dahil)"""
+
+    def __init__(self, name, prompt_bank, no_person_threshold, class_weights):
+        self.name = name
+        self.prompt_bank = prompt_bank
+        self.no_person_threshold = no_person_threshold
+        self.class_names = list(prompt_bank.keys())
+        self.class_weights = class_weights
+        self.no_person_idx = self.class_names.index("no_person") if "no_person" in self.class_names else None
+
+    def class_probs(self, image_embeds):
+        """[N, dim] normalize image embedding -> [N, num_classes] olasılık"""
+        return torch.softmax(image_embeds @ self.class_weights, dim=-1)
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "classes": self.class_names,
+            "prompts": sum(len(p) for p in self.prompt_bank.values()),
+            "noPersonThreshold": self.no_person_threshold,
+        }
+
+
+class PromptProfileRegistry:
+    """Thread-safe profil kaydı; profilleri model yeniden başlatılmadan ekler/yeniler"""
+
+    def __init__(self, model, processor, device, profiles_dir=None):
+        self.model = model
+        self.processor = processor
+        self.device = device
+        self.profiles_dir = profiles_dir
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._file_backed = set()  # profiles_dir'deki dosyalardan gelen profil adları
+
+    def attach(self, model, processor):
+        """Model bırakılıp yeniden yüklenince bağla; hesaplanmış text embedding'leri korunur"""
+        self.model = model
+        self.processor = processor
+
+    def build(self, name, prompt_bank, no_person_threshold=None):
+        """Prompt bank'ı encode edip profile çevir (kayıt yapmaz)"""
+        if not isinstance(name, str) or not _VALID_NAME.match(name):
+            raise ValueError("Profil adı harf, rakam, '_' ve '-' içermeli (en fazla 64 karakter)")
+        if not isinstance(prompt_bank, dict) or not prompt_bank:
+            raise ValueError("prompt bank boş olamaz")
+        if len(prompt_bank) > MAX_CLASSES:
+            raise ValueError(f"En fazla {MAX_CLASSES} sınıf tanımlanabilir")
+        for cls, prompts in prompt_bank.items():
+            if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) for p in prompts):
+                raise ValueError(f"'{cls}' sınıfı için en az bir prompt gerekli")
+        if sum(len(prompts) for prompts in prompt_bank.values()) > MAX_PROMPTS:
+            raise ValueError(f"Profil başına en fazla {MAX_PROMPTS} prompt tanımlanabilir")
+
+        all_texts, class_slices = flatten_prompt_bank(prompt_bank)
+        text_embeds = encode_texts(self.model, self.processor, all_texts, self.device)
+        pool = torch.from_numpy(class_pooling_matrix(class_slices, len(all_texts))).to(self.device)
+        class_weights = logit_scale(self.model) * (text_embeds.T @ pool)
+
+        threshold = NO_PERSON_THRESHOLD if no_person_threshold is None else float(no_person_threshold)
+        return PromptProfile(name, prompt_bank, threshold, class_weights)
+
+    def register(self, name, prompt_bank, no_person_threshold=None):
+        profile = self.build(name, prompt_bank, no_person_threshold)
+        with self._lock:
+            self._profiles[name] = profile
+        print(f"🗂️ [PROFILES] '{name}' yüklendi ({len(profile.class_names)} sınıf)")
+        return profile
+
+    def remove(self, name):
+        if name == DEFAULT_PROFILE:
+            raise ValueError("Varsayılan profil silinemez")
+        with self._lock:
+            return self._profiles.pop(name, None) is not None
+
+    def get(self, name=None):
+        """İsimle profil; bilinmeyen isim KeyError"""
+        with self._lock:
+            return self._profiles[name or DEFAULT_PROFILE]
+
+    def names(self):
+        with self._lock:
+            return list(self._profiles.keys())
+
+    def describe(self):
+        with self._lock:
+            return [p.describe() for p in self._profiles.values()]
+
+    def load_defaults(self):
+        """Varsayılan çocuk profilini ve profiles_dir içindeki dosyaları yükle"""
+        self.register(DEFAULT_PROFILE, emotion_prompt_bank, NO_PERSON_THRESHOLD)
+        return self.load_dir()
+
+    def load_dir(self):
+        """profiles_dir içindeki bütün *.json profillerini (yeniden) yükle
+
+        Dosyası silinmiş profiller kaydan düşer; varsayılan profil yerleşik haline döner.
+        """
+        loaded = []
+        present = set()
+        filenames = sorted(os.listdir(self.profiles_dir)) \
+            if self.profiles_dir and os.path.isdir(self.profiles_dir) else []
+        for filename in filenames:
+            if not filename.endswith(".json"):
+                continue
+            name = filename[:-5]
+            present.add(name)
+            try:
+                with open(os.path.join(self.profiles_dir, filename), encoding="utf-8") as f:
+                    data = json.load(f)
+                self.register(name, data["prompts"], data.get("noPersonThreshold"))
+                loaded.append(name)
+            except Exception as e:
+                print(f"❌ [PROFILES] {filename} yüklenemedi: {e}")
+
+        with self._lock:
+            missing = self._file_backed - present
+            self._file_backed = (self._file_backed & present) | set(loaded)
+            for name in missing - {DEFAULT_PROFILE}:
+                self._profiles.pop(name, None)
+        for name in sorted(missing):
+            if name == DEFAULT_PROFILE:
+                self.register(DEFAULT_PROFILE, emotion_prompt_bank, NO_PERSON_THRESHOLD)
+            else:
+                print(f"🗑️ [PROFILES] '{name}' dosyası silinmiş, kaldırıldı")
+        return loaded
+
+    def save(self, name, prompt_bank, no_person_threshold=None):
+        """Profili diske yaz (yeniden başlatmada da yüklensin)"""
+        if not self.profiles_dir:
+            return None
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        path = os.path.join(self.profiles_dir, f"{name}.json")
+        data = {"prompts": prompt_bank}
+        if no_person_threshold is not None:
+            data["noPersonThreshold"] = float(no_person_threshold)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        with self._lock:
+            self._file_backed.add(name)
+        return path
+
+    def score(self, image_embeds, profile_names):
+        """Tek image encoder çıktısını her frame'in kendi profiliyle skorla
+
+        image_embeds: [N, dim], profile_names: N uzunluğunda liste
+        -> N uzunluğunda [(profile, probs[num_classes])]
+        """
+        profiles = [self.get(name) for name in profile_names]
+        results = [None] * len(profiles)
+
+        # Aynı profile düşen frame'leri grupla -> profil başına tek matris çarpımı
+        groups = {}
+        for idx, profile in enumerate(profiles):
+            groups.setdefault(profile.name, (profile, []))[1].append(idx)
+        for profile, indices in groups.values():
+            probs = profile.class_probs(image_embeds[indices])
+            for row, idx in enumerate(indices):
+                results[idx] = (profile, probs[row])
+        return results
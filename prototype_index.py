@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Çocuk başına few-shot kalibrasyon (prototip indeksi)
+Her çocuk (childId) için duygu başına birkaç etiketli CLIP image embedding'i saklanır;
+sınıf ortalamaları normalize edilip [num_classes, dim] prototip matrisi olarak tutulur.
+Analizde frame embedding'i bu matrisle çarpılır (tek matris-vektör çarpımı, mikro saniyeler),
+prototip olasılıkları prompt olasılıklarıyla harmanlanır. İkinci bir model çalışmaz.
+
+Harmanlama sadece kayıtlı sınıflar arasında yapılır: kayıtlı sınıfların prompt kütlesi korunur,
+kayıtsız sınıflar (örn. no_person) olduğu gibi kalır. Tek sınıf kaydı sonucu değiştirmez.
+
+Kalıcılık: PROTOTYPE_INDEX_PATH (varsayılan models/prototypes.npz), her değişiklikte atomik yazılır.
+"""
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import torch
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "prototypes.npz")
+MAX_PER_CLASS = int(os.environ.get("PROTOTYPE_MAX_PER_CLASS", "20"))  # dolunca en eskinin üstüne yazılır
+BLEND_WEIGHT = float(os.environ.get("PROTOTYPE_BLEND", "0.5"))       # 0 = sadece prompt, 1 = sadece prototip
+PROTOTYPE_SCALE = 100.0  # benzerlik -> logit çarpanı (CLIP logit_scale ile aynı mertebe)
+_VALID_CHILD = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class _Snapshot:
+    """Bir çocuğun değişmez prototip görüntüsü; sıcak yol kilitsiz okur"""
+
+    def __init__(self, labels, matrix):
+        self.labels = labels          # prototip satırlarının sınıf adları
+        self.matrix = matrix          # [len(labels), dim] float32, normalize
+        self._columns = {}            # profil sınıf listesi -> (alt matris, profil sütunları)
+
+    def columns(self, class_names):
+        key = tuple(class_names)
+        cached = self._columns.get(key)
+        if cached is None:
+            rows = [i for i, label in enumerate(self.labels) if label in class_names]
+            cols = np.array([class_names.index(self.labels[i]) for i in rows], dtype=np.int64)
+            cached = (np.ascontiguousarray(self.matrix[rows]), cols)
+            self._columns[key] = cached
+        return cached
+
+
+class _ChildSamples:
+    """Sınıf başına önceden ayrılmış [MAX_PER_CLASS, dim] halka tamponları"""
+
+    def __init__(self, dim, max_per_class):
+        self.dim = dim
+        self.max_per_class = max_per_class
+        self.buffers = {}   # label -> np.ndarray [max_per_class, dim] float32
+        self.counts = {}    # label -> dolu satır sayısı
+        self.cursor = {}    # label -> sıradaki yazılacak satır
+
+    def add(self, label, embeds):
+        buf = self.buffers.get(label)
+        if buf is None:
+            buf = self.buffers[label] = np.zeros((self.max_per_class, self.dim), dtype=np.float32)
+            self.counts[label] = 0
+            self.cursor[label] = 0
+        for row in embeds:
+            buf[self.cursor[label]] = row
+            self.cursor[label] = (self.cursor[label] + 1) % self.max_per_class
+            self.counts[label] = min(self.counts[label] + 1, self.max_per_class)
+
+    def remove(self, label):
+        self.buffers.pop(label, None)
+        self.counts.pop(label, None)
+        self.cursor.pop(label, None)
+
+    def snapshot(self):
+        labels = sorted(self.buffers)
+        matrix = np.zeros((len(labels), self.dim), dtype=np.float32)
+        for i, label in enumerate(labels):
+            mean = self.buffers[label][:self.counts[label]].mean(axis=0)
+            matrix[i] = mean / max(float(np.linalg.norm(mean)), 1e-8)
+        return _Snapshot(labels, matrix)
+
+
+class PrototypeIndex:
+    """Thread-safe çocuk -> prototip indeksi; enroll/remove kilitli, blend kilitsiz"""
+
+    def __init__(self, dim, path=None, model_name=None, max_per_class=MAX_PER_CLASS, blend_weight=BLEND_WEIGHT):
+        self.dim = int(dim)
+        self.path = path or os.environ.get("PROTOTYPE_INDEX_PATH") or DEFAULT_INDEX_PATH
+        self.model_name = model_name
+        self.max_per_class = max_per_class
+        self.blend_weight = blend_weight
+        self._lock = threading.Lock()
+        self._samples = {}     # child_id -> _ChildSamples
+        self._snapshots = {}   # child_id -> _Snapshot (her değişiklikte yeni dict ile değiştirilir)
+        self.load()
+
+    @staticmethod
+    def validate_child(child_id):
+        if not isinstance(child_id, str) or not _VALID_CHILD.match(child_id):
+            raise ValueError("childId harf, rakam, '.', '_' veya '-' içermeli (en fazla 64 karakter)")
+        return child_id
+
+    # ----- Kayıt -----
+
+    def enroll(self, child_id, label, embeds):
+        """[N, dim] normalize embedding'leri çocuğun `label` sınıfına ekle -> çocuğun özeti"""
+        self.validate_child(child_id)
+        embeds = np.asarray(embeds, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            samples = self._samples.setdefault(child_id, _ChildSamples(self.dim, self.max_per_class))
+            samples.add(label, embeds)
+            self._publish_locked(child_id)
+            self._save_locked()
+            return self._describe_locked(child_id)
+
+    def remove(self, child_id, label=None):
+        """Çocuğun bir sınıfını veya bütün kaydını sil -> silindi mi"""
+        with self._lock:
+            samples = self._samples.get(child_id)
+            if samples is None or (label is not None and label not in samples.buffers):
+                return False
+            if label is None:
+                del self._samples[child_id]
+            else:
+                samples.remove(label)
+                if not samples.buffers:
+                    del self._samples[child_id]
+            self._publish_locked(child_id)
+            self._save_locked()
+            return True
+
+    def describe(self, child_id=None):
+        with self._lock:
+            if child_id is not None:
+                return self._describe_locked(child_id) if child_id in self._samples else None
+            return [self._describe_locked(cid) for cid in sorted(self._samples)]
+
+    def _describe_locked(self, child_id):
+        samples = self._samples[child_id]
+        return {"childId": child_id, "emotions": dict(sorted(samples.counts.items())),
+                "maxPerEmotion": self.max_per_class}
+
+    def _publish_locked(self, child_id):
+        snapshots = dict(self._snapshots)
+        if child_id in self._samples:
+            snapshots[child_id] = self._samples[child_id].snapshot()
+        else:
+            snapshots.pop(child_id, None)
+        self._snapshots = snapshots
+
+    # ----- Sıcak yol -----
+
+    def blend(self, child_id, class_names, probs, image_embed):
+        """Prompt olasılıklarını çocuğun prototipleriyle harmanla (kayıt yoksa probs aynen döner)"""
+        snapshot = self._snapshots.get(child_id) if child_id else None
+        if snapshot is None:
+            return probs
+        matrix, cols = snapshot.columns(class_names)
+        if len(cols) < 2:
+            return probs  # tek sınıfla ayırt edilecek bir şey yok
+
+        embed = image_embed.detach().float().cpu().numpy()
+        logits = PROTOTYPE_SCALE * (matrix @ embed)
+        logits -= logits.max()
+        proto = np.exp(logits)
+        proto /= proto.sum()
+
+        out = probs.detach().float().cpu().numpy().copy()
+        mass = out[cols].sum()
+        out[cols] = (1.0 - self.blend_weight) * out[cols] + self.blend_weight * mass * proto
+        return torch.from_numpy(out).to(device=probs.device, dtype=probs.dtype)
+
+    # ----- Kalıcılık -----
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("dim") != self.dim:
+                    print(f"⚠️ [CALIBRATION] {self.path} boyutu uyuşmuyor ({meta.get('dim')} != {self.dim}), yok sayıldı")
+                    return
+                # Aynı boyutlu farklı CLIP varyantlarının (örn. B/32 -> B/16) uzayları uyumsuz
+                if meta.get("model") != self.model_name:
+                    print(f"⚠️ [CALIBRATION] {self.path} modeli uyuşmuyor ({meta.get('model')} != {self.model_name}), yok sayıldı")
+                    return
+                for entry in meta["entries"]:
+                    samples = self._samples.setdefault(entry["childId"], _ChildSamples(self.dim, self.max_per_class))
+                    rows = data[entry["key"]].astype(np.float32)[-self.max_per_class:]
+                    samples.add(entry["label"], rows)
+            for child_id in self._samples:
+                self._publish_locked(child_id)
+            print(f"✅ [CALIBRATION] {len(self._samples)} çocuk prototipi yüklendi: {self.path}")
+        except Exception as e:
+            print(f"❌ [CALIBRATION] {self.path} okunamadı: {e}")
+            self._samples, self._snapshots = {}, {}
+
+    def _save_locked(self):
+        arrays, entries = {}, []
+        for child_id, samples in sorted(self._samples.items()):
+            for label in sorted(samples.buffers):
+                key = f"e{len(entries)}"
+                # Halka sırasını koru: en eski satır başta
+                count, cursor = samples.counts[label], samples.cursor[label]
+                buf = samples.buffers[label]
+                rows = np.concatenate([buf[cursor:count], buf[:cursor]]) if count == self.max_per_class else buf[:count]
+                arrays[key] = rows.astype(np.float16)
+                entries.append({"childId": child_id, "label": label, "key": key})
+        meta = {"dim": self.dim, "model": self.model_name, "entries": entries}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, self.path)
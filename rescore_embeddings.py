@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Saklanan frame embedding'lerini yeni prompt bank / eşik ile yeniden skorla
+Image encoder çalışmaz: sadece yeni promptlar encode edilir, bütün frame'ler tek
+matris çarpımıyla ([N, dim] @ [dim, num_classes]) skorlanır.
+
+Örnek:
+    python rescore_embeddings.py --store embeddings --since 2026-09-01 \\
+        --prompts new_prompts.json --threshold 0.4 --out rescore.json
+
+Prompt dosyası formatı: {"happy": ["...", ...], ...} veya
+{"prompts": {...}, "noPersonThreshold": 0.4}
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from emotion_prompts import (
+    emotion_prompt_bank, NO_PERSON_THRESHOLD, flatten_prompt_bank, class_pooling_matrix
+)
+
+
+def load_prompt_file(path):
+    """-> (prompt_bank, threshold veya None)"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "prompts" in data:
+        return data["prompts"], data.get("noPersonThreshold")
+    return data, None
+
+
+def class_weight_matrix(prompt_bank, model_name, device="cpu"):
+    """Prompt bank'ı tek [dim, num_classes] matrise indir (logit_scale dahil)"""
+    from model_weights import load_clip
+    from clip_features import encode_texts, logit_scale
+
+    model, processor = load_clip(model_name, device)
+    all_texts, class_slices = flatten_prompt_bank(prompt_bank)
+    text_embeds = encode_texts(model, processor, all_texts, device).float().cpu().numpy()
+    pool = class_pooling_matrix(class_slices, len(all_texts))
+    weights = logit_scale(model) * (text_embeds.T @ pool)
+    return weights.astype(np.float32), list(class_slices.keys())
+
+
+def rescore(embeddings, weights, class_names, threshold):
+    """Bütün frame'ler için (tahmin, güven, sınıf olasılıkları) hesapla"""
+    class_logits = embeddings.astype(np.float32) @ weights
+    class_logits -= class_logits.max(axis=1, keepdims=True)
+    probs = np.exp(class_logits)
+    probs /= probs.sum(axis=1, keepdims=True)
+
+    best = probs.argmax(axis=1)
+    confidence = probs[np.arange(len(best)), best]
+    predicted = np.array(class_names, dtype=object)[best]
+
+    # emotion_server.analyze_emotion ile aynı kural: no_person eşiği geçerse neutral
+    if "no_person" in class_names:
+        no_person = probs[:, class_names.index("no_person")] > threshold
+        predicted[no_person] = "neutral"
+    return predicted, confidence, probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding store'u yeni prompt bank ile yeniden skorla")
+    parser.add_argument("--store", required=True, help="EMBEDDING_STORE_DIR klasörü")
+    parser.add_argument("--prompts", default=None, help="Yeni prompt bank JSON (varsayılan: emotion_prompts.py)")
+    parser.add_argument("--threshold", type=float, default=None, help="no_person eşiği")
+    parser.add_argument("--since", default=None, help="Başlangıç günü (YYYY-MM-DD)")
+    parser.add_argument("--until", default=None, help="Bitiş günü (YYYY-MM-DD)")
+    parser.add_argument("--session", default=None, help="Sadece bu session")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--per-frame", action="store_true", help="Çıktıya frame bazlı tahminleri de ekle")
+    parser.add_argument("--out", default=None, help="Sonuç JSON dosyası")
+    args = parser.parse_args()
+
+    prompt_bank, file_threshold = (emotion_prompt_bank, None)
+    if args.prompts:
+        prompt_bank, file_threshold = load_prompt_file(args.prompts)
+    threshold = args.threshold if args.threshold is not None else (
+        file_threshold if file_threshold is not None else NO_PERSON_THRESHOLD)
+
+    store = EmbeddingStore(args.store)
+    started = time.time()
+    embeddings, records = store.load(args.since, args.until, args.session)
+    load_seconds = time.time() - started
+    print(f"📦 [RESCORE] {len(records)} frame yüklendi ({load_seconds:.2f}s)")
+    if not records:
+        return
+
+    model_name = store.meta.get("model") or "openai/clip-vit-base-patch32"
+    weights, class_names = class_weight_matrix(prompt_bank, model_name, args.device)
+    if weights.shape[0] != store.dim:
+        raise SystemExit(f"❌ [RESCORE] Model boyutu {weights.shape[0]}, store boyutu {store.dim}")
+
+    started = time.time()
+    predicted, confidence, _ = rescore(embeddings, weights, class_names, threshold)
+    score_seconds = time.time() - started
+    print(f"⚡ [RESCORE] {len(records)} frame {score_seconds * 1000:.1f}ms'de skorlandı")
+
+    sessions = {}
+    for rec, new_emotion, conf in zip(records, predicted, confidence):
+        sid = rec.get("sessionId", "default")
+        s = sessions.setdefault(sid, {"frames": 0, "changed": 0, "before": Counter(), "after": Counter()})
+        s["frames"] += 1
+        s["before"][rec.get("emotion")] += 1
+        s["after"][new_emotion] += 1
+        if rec.get("emotion") != new_emotion:
+            s["changed"] += 1
+
+    total_changed = sum(s["changed"] for s in sessions.values())
+    print(f"📋 [RESCORE] {len(sessions)} session, {total_changed}/{len(records)} frame'in tahmini değişti "
+          f"(no_person eşiği: {threshold})")
+    for sid, s in sorted(sessions.items(), key=lambda kv: -kv[1]["changed"])[:20]:
+        print(f"   {sid}: {s['changed']}/{s['frames']} değişti | önce {dict(s['before'])} | sonra {dict(s['after'])}")
+
+    if args.out:
+        report = {
+            "frames": len(records),
+            "changed": total_changed,
+            "threshold": threshold,
+            "classes": class_names,
+            "scoreSeconds": round(score_seconds, 4),
+            "sessions": {
+                sid: {"frames": s["frames"], "changed": s["changed"],
+                      "before": dict(s["before"]), "after": dict(s["after"])}
+                for sid, s in sessions.items()
+            },
+        }
+        if args.per_frame:
+            report["perFrame"] = [
+                {"sessionId": rec.get("sessionId"), "timestamp": rec.get("timestamp"),
+                 "before": rec.get("emotion"), "after": str(p), "confidence": round(float(c), 4)}
+                for rec, p, c in zip(records, predicted, confidence)
+            ]
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 [RESCORE] Rapor kaydedildi: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
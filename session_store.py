@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Session state deposu (son sonuç, session toplamları, kamera metadata'sı, node affinity)
+Birden fazla server replikası aynı SQLite dosyasını paylaşırsa hangi node'a düşülürse
+düşülsün aynı sonuç okunur. Affinity kaydı session'ın frame'lerinin sıcak tracker/cache
+tutan node'a yönlendirilmesi için ipucu verir (X-Session-Node header'ı).
+
+Ortam değişkenleri:
+    SESSION_STORE=memory|sqlite    (varsayılan: memory, tek process)
+    SESSION_DB_PATH=<dosya>        (varsayılan: bu klasörde sessions.db)
+    NODE_ID=<isim>                 (varsayılan: hostname:pid)
+    SESSION_AFFINITY_TTL=<saniye>  (varsayılan: 120, sahibi bu süre sessiz kalırsa session devredilir)
+    SESSION_TTL=<saniye>           (varsayılan: 86400, daha eski session'lar silinir)
+"""
+
+import itertools
+import json
+import os
+from abc import ABC, abstractmethod
+import socket
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db")
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+AFFINITY_TTL = _env_float("SESSION_AFFINITY_TTL", 120)
+
+
+def node_id():
+    return os.environ.get("NODE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _empty_aggregate(now):
+    return {"frames": 0, "faceFrames": 0, "lookingFrames": 0, "emotions": {},
+            "firstSeen": now, "lastSeen": now}
+
+
+class SessionStore(ABC):
+    """Depo arayüzü; bütün metodlar thread-safe olmalı (eksik backend oluşturulurken TypeError)"""
+
+    @abstractmethod
+    def put_result(self, session_id, result):
+        """Session'ın son sonucunu yaz ve toplamlarını güncelle"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_result(self, session_id):
+        """Son sonuç dict'i veya None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def latest(self):
+        """Bütün session'lar arasında en son yazılan sonuç veya None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_aggregate(self, session_id):
+        """{"frames", "faceFrames", "lookingFrames", "emotions": {emotion: frames}, "firstSeen", "lastSeen"}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, session_id, node, ttl):
+        """Session sahipsizse veya sahibinin süresi dolduysa node'a ver -> güncel sahip"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def owner(self, session_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_camera(self, camera_id, meta):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_camera(self, camera_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_camera(self, camera_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_cameras(self):
+        """-> {camera_id: meta}"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def forget(self, session_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Tek process içi depo (varsayılan; replikalar arası paylaşılmaz)"""
+
+    kind = "memory"
+    PRUNE_EVERY = 1000  # bu kadar yazmada bir eski session'ları temizle
+
+    def __init__(self, session_ttl=None):
+        self.session_ttl = session_ttl if session_ttl is not None else _env_float("SESSION_TTL", 86400)
+        self._lock = threading.Lock()
+        self._results = {}     # session_id -> (updated_at, result)
+        self._aggregates = {}  # session_id -> aggregate dict
+        self._owners = {}      # session_id -> (node, expires_at)
+        self._cameras = {}     # camera_id -> meta
+        self._latest = None
+        self._writes = 0
+
+    def put_result(self, session_id, result):
+        now = time.time()
+        with self._lock:
+            self._results[session_id] = (now, dict(result))
+            self._latest = dict(result, sessionId=session_id)
+            agg = self._aggregates.setdefault(session_id, _empty_aggregate(now))
+            agg["frames"] += 1
+            agg["faceFrames"] += int(bool(result.get("faceDetected")))
+            agg["lookingFrames"] += int(bool(result.get("lookingAtScreen")))
+            emotion = result.get("emotion")
+            agg["emotions"][emotion] = agg["emotions"].get(emotion, 0) + 1
+            agg["lastSeen"] = now
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._evict_stale_locked(now)
+
+    def _evict_stale_locked(self, now):
+        stale = [sid for sid, (t, _) in self._results.items() if now - t > self.session_ttl]
+        for sid in stale:
+            self._results.pop(sid, None)
+            self._aggregates.pop(sid, None)
+            self._owners.pop(sid, None)
+
+    def get_result(self, session_id):
+        with self._lock:
+            entry = self._results.get(session_id)
+            return dict(entry[1]) if entry else None
+
+    def latest(self):
+        with self._lock:
+            return dict(self._latest) if self._latest else None
+
+    def get_aggregate(self, session_id):
+        with self._lock:
+            agg = self._aggregates.get(session_id)
+            return dict(agg, emotions=dict(agg["emotions"])) if agg else None
+
+    def claim(self, session_id, node, ttl):
+        now = time.time()
+        with self._lock:
+            current = self._owners.get(session_id)
+            if current is None or current[0] == node or current[1] < now:
+                self._owners[session_id] = (node, now + ttl)
+                return node
+            return current[0]
+
+    def owner(self, session_id):
+        with self._lock:
+            current = self._owners.get(session_id)
+            return current[0] if current and current[1] >= time.time() else None
+
+    def set_camera(self, camera_id, meta):
+        with self._lock:
+            self._cameras[camera_id] = dict(meta, updatedAt=time.time())
+
+    def get_camera(self, camera_id):
+        with self._lock:
+            meta = self._cameras.get(camera_id)
+            return dict(meta) if meta else None
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+    def list_cameras(self):
+        with self._lock:
+            return {cid: dict(meta) for cid, meta in self._cameras.items()}
+
+    def forget(self, session_id):
+        with self._lock:
+            self._results.pop(session_id, None)
+            self._aggregates.pop(session_id, None)
+            self._owners.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"kind": self.kind, "sessions": len(self._results), "cameras": len(self._cameras)}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Aynı makinedeki replikalar arasında paylaşılan depo (WAL modunda SQLite)
+
+    Her thread kendi bağlantısını kullanır; toplamlar UPSERT ile atomik artırılır.
+    """
+
+    kind = "sqlite"
+    PRUNE_EVERY = 1000  # bu kadar yazmada bir eski session'ları temizle
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        result TEXT NOT NULL,
+        frames INTEGER NOT NULL DEFAULT 0,
+        face_frames INTEGER NOT NULL DEFAULT 0,
+        looking_frames INTEGER NOT NULL DEFAULT 0,
+        first_seen REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated_at);
+    CREATE TABLE IF NOT EXISTS emotion_counts (
+        session_id TEXT NOT NULL,
+        emotion TEXT NOT NULL,
+        frames INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (session_id, emotion)
+    );
+    CREATE TABLE IF NOT EXISTS affinity (
+        session_id TEXT PRIMARY KEY,
+        node TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS cameras (
+        camera_id TEXT PRIMARY KEY,
+        meta TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path=None, session_ttl=None):
+        self.path = path or os.environ.get("SESSION_DB_PATH") or DEFAULT_DB_PATH
+        self.session_ttl = session_ttl if session_ttl is not None else _env_float("SESSION_TTL", 86400)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._writes = itertools.count(1)  # next() atomik; Flask thread'leri arasında kilitsiz sayaç
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put_result(self, session_id, result):
+        now = time.time()
+        payload = json.dumps(result)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, result, frames, face_frames, looking_frames, first_seen, updated_at) "
+                "VALUES (?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET result = excluded.result, frames = frames + 1, "
+                "face_frames = face_frames + excluded.face_frames, "
+                "looking_frames = looking_frames + excluded.looking_frames, updated_at = excluded.updated_at",
+                (session_id, payload, int(bool(result.get("faceDetected"))),
+                 int(bool(result.get("lookingAtScreen"))), now, now))
+            conn.execute(
+                "INSERT INTO emotion_counts (session_id, emotion, frames) VALUES (?, ?, 1) "
+                "ON CONFLICT(session_id, emotion) DO UPDATE SET frames = frames + 1",
+                (session_id, str(result.get("emotion"))))
+
+        if next(self._writes) % self.PRUNE_EVERY == 0:
+            self.prune(now - self.session_ttl)
+
+    def prune(self, before):
+        with self._conn() as conn:
+            stale = "SELECT session_id FROM sessions WHERE updated_at < ?"
+            conn.execute(f"DELETE FROM emotion_counts WHERE session_id IN ({stale})", (before,))
+            conn.execute(f"DELETE FROM affinity WHERE session_id IN ({stale})", (before,))
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (before,))
+
+    def get_result(self, session_id):
+        row = self._conn().execute("SELECT result FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest(self):
+        row = self._conn().execute(
+            "SELECT session_id, result FROM sessions ORDER BY updated_at DESC LIMIT 1").fetchone()
+        return dict(json.loads(row[1]), sessionId=row[0]) if row else None
+
+    def get_aggregate(self, session_id):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT frames, face_frames, looking_frames, first_seen, updated_at FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        if row is None:
+            return None
+        emotions = dict(conn.execute(
+            "SELECT emotion, frames FROM emotion_counts WHERE session_id = ?", (session_id,)).fetchall())
+        return {"frames": row[0], "faceFrames": row[1], "lookingFrames": row[2], "emotions": emotions,
+                "firstSeen": row[3], "lastSeen": row[4]}
+
+    def claim(self, session_id, node, ttl):
+        now = time.time()
+        with self._conn() as conn:
+            # Sahipsiz, zaten bizim veya süresi dolmuşsa üstüne yaz; değilse mevcut sahip kalır
+            conn.execute(
+                "INSERT INTO affinity (session_id, node, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET node = excluded.node, expires_at = excluded.expires_at "
+                "WHERE affinity.node = excluded.node OR affinity.expires_at < ?",
+                (session_id, node, now + ttl, now))
+            row = conn.execute("SELECT node FROM affinity WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else node
+
+    def owner(self, session_id):
+        row = self._conn().execute(
+            "SELECT node FROM affinity WHERE session_id = ? AND expires_at >= ?",
+            (session_id, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set_camera(self, camera_id, meta):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO cameras (camera_id, meta, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(camera_id) DO UPDATE SET meta = excluded.meta, updated_at = excluded.updated_at",
+                (camera_id, json.dumps(dict(meta, updatedAt=now)), now))
+
+    def get_camera(self, camera_id):
+        row = self._conn().execute("SELECT meta FROM cameras WHERE camera_id = ?", (camera_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remove_camera(self, camera_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cameras WHERE camera_id = ?", (camera_id,))
+
+    def list_cameras(self):
+        rows = self._conn().execute("SELECT camera_id, meta FROM cameras").fetchall()
+        return {cid: json.loads(meta) for cid, meta in rows}
+
+    def forget(self, session_id):
+        with self._conn() as conn:
+            for table in ("sessions", "emotion_counts", "affinity"):
+                conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "kind": self.kind,
+            "path": self.path,
+            "sessions": conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "cameras": conn.execute("SELECT COUNT(*) FROM cameras").fetchone()[0],
+        }
+
+
+def create_session_store(kind=None):
+    """SESSION_STORE ortam değişkenine göre depo oluştur"""
+    kind = (kind or os.environ.get("SESSION_STORE") or "memory").lower()
+    if kind == "sqlite":
+        store = SQLiteSessionStore()
+        print(f"🗄️ [SESSIONS] SQLite deposu: {store.path}")
+        return store
+    if kind != "memory":
+        print(f"⚠️ [SESSIONS] Bilinmeyen SESSION_STORE={kind}, memory kullanılıyor")
+    return MemorySessionStore()
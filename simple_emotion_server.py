@@ -13,6 +13,11 @@ import mediapipe as mp
 from datetime import datetime
 import random
 
+from analysis_cadence import CadenceController
+from camera_discovery import open_camera
+from face_cascade import FaceCascade
+from emotion_student import load_student
+
 # Flask app setup
 app = Flask(__name__)
 CORS(app)  # React uygulamasından gelen isteklere izin ver
@@ -29,20 +34,35 @@ current_emotion_data = {
 camera_active = False
 cap = None
 
-# MediaPipe setup
-mp_face_detection = mp.solutions.face_detection
-mp_face_mesh = mp.solutions.face_mesh
-face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.9)
-face_mesh = mp_face_mesh.FaceMesh(
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# Session bazlı adaptive analiz aralığı (client'lara nextAnalysisMs olarak döner)
+cadence = CadenceController()
+CAMERA_SESSION_ID = "camera"
+
+# MediaPipe setup: küçük kopyada detection -> ROI crop'unda FaceMesh, ROI session bazında taşınır
+face_cascade = FaceCascade(min_detection_confidence=0.9)
+
+# CLIP'ten damıtılmış student modeli varsa (distill_student.py) rastgele seçim yerine o kullanılır.
+# Yüz kutusu cascade ROI'sinden geldiği için student'ın kendi dedektörü yüklenmez.
+student = load_student(with_detector=False)
+
+def analyze_student_emotion(frame, roi):
+    """Student modeliyle ROI crop'undan emotion -> (emotion, confidence)"""
+    probs = student.predict(frame, roi)
+    if student.no_person_idx is not None:
+        # Yüz zaten bulundu; no_person sınıfını yok say
+        probs = probs.clone()
+        probs[student.no_person_idx] = 0.0
+        probs = probs / probs.sum()
+    best_idx = int(probs.argmax().item())
+    return student.class_names[best_idx], float(probs[best_idx].item())
 
 # Basit emotion detection (yüz hareketi bazlı)
-def analyze_simple_emotion(landmarks, face_bbox):
+def analyze_simple_emotion(landmarks, face_bbox, frame=None, roi=None):
     """Basit emotion analysis - MediaPipe landmarks kullanarak"""
     try:
+        if student is not None and landmarks and frame is not None:
+            return analyze_student_emotion(frame, roi)
+
         # Çocuklar için basit duygular
         emotions = ['happy', 'neutral', 'confused', 'focused', 'surprised', 'frustrated']
 
@@ -100,61 +120,22 @@ def camera_loop():
     global cap, camera_active, current_emotion_data
 
     try:
-        # IriUn webcam DirectShow backend ile
-        cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-
-        # IriUn için özel ayarlar
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_FPS, 30)
-        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-
-        if not cap.isOpened():
-            print("❌ [CAMERA] IriUn webcam açılamadı")
-            return
-
-        # IriUn başlangıç frame'lerini atla (siyah frame sorunu)
-        for i in range(10):  # Daha fazla frame atla
-            ret, frame = cap.read()
-            if ret:
-                print(f"🔍 [CAMERA] Init frame {i+1}: {frame.shape}")
-                # Frame'in siyah olup olmadığını kontrol et
-                mean_val = frame.mean()
-                print(f"   Frame brightness: {mean_val:.1f}")
-                if mean_val > 10:  # Siyah değilse
-                    print(f"   ✅ Frame {i+1} normal görünüyor")
-                    break
-            else:
-                print(f"   ❌ Frame {i+1} okunamadı")
-
-        # Son kontrol
-        for j in range(3):
-            ret, frame = cap.read()
-            if ret:
-                mean_val = frame.mean()
-                if mean_val > 10:
-                    print(f"✅ [CAMERA] Normal frame bulundu (brightness: {mean_val:.1f})")
-                    break
-                else:
-                    print(f"⚠️ [CAMERA] Hala siyah frame (brightness: {mean_val:.1f})")
-                    import time
-                    time.sleep(0.5)  # Biraz bekle
-
-        # Test frame
-        ret, test_frame = cap.read()
-        if not ret:
-            print("❌ [CAMERA] Frame okunamadı")
-            cap.release()
+        # Kayıtlı capture profilinden aç; yoksa backend/index'ler paralel denenir
+        cap, profile, test_frame = open_camera()
+        if cap is None or test_frame is None:
+            print("❌ [CAMERA] Webcam açılamadı")
+            if cap is not None:
+                cap.release()
             return
 
         h, w = test_frame.shape[:2]
-        print(f"✅ [CAMERA] IriUn DirectShow ile açıldı: {w}x{h}")
+        print(f"✅ [CAMERA] {profile['backendName']} ile açıldı: {w}x{h}")
 
         print("📹 [CAMERA] Webcam başlatıldı")
         camera_active = True
 
         last_analysis_time = 0
-        analysis_interval = 3.0  # 3 saniyede bir analiz
+        analysis_interval = cadence.base_interval
 
         while camera_active:
             ret, frame = cap.read()
@@ -163,11 +144,12 @@ def camera_loop():
 
             current_time = time.time()
 
-            # 3 saniyede bir emotion analysis
+            # Adaptive aralıkla emotion analysis (kararlıysa seyrek, değişiyorsa sık)
             if current_time - last_analysis_time >= analysis_interval:
                 print(f"🔍 [DEBUG] Frame shape: {frame.shape}, analyzing...")
-                analyze_frame(frame)
+                analyze_frame(frame, CAMERA_SESSION_ID)
                 last_analysis_time = current_time
+                analysis_interval = cadence.recommend(CAMERA_SESSION_ID)
 
             time.sleep(0.1)  # CPU kullanımını azalt
 
@@ -179,17 +161,17 @@ def camera_loop():
         camera_active = False
         print("📹 [CAMERA] Kapatıldı")
 
-def analyze_frame(frame):
+def analyze_frame(frame, session_id=CAMERA_SESSION_ID):
     """Tek frame'de analiz yap"""
     global current_emotion_data
 
+    started = time.time()
+    cadence.begin()
     try:
-        # BGR'den RGB'ye çevir - face_test.py ile aynı
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         h, w, _ = frame.shape
 
-        # Yüz tespiti yap - face_test.py ile aynı
-        results = face_detection.process(rgb_frame)
+        # Yüz tespiti + landmark'lar (önceki ROI geçerliyse detection atlanır)
+        cascade = face_cascade.process(frame, key=session_id)
 
         # DEBUG: Frame'i kaydet (ilk birkaç frame için)
         import os
@@ -201,26 +183,23 @@ def analyze_frame(frame):
         analyze_frame.frame_count = frame_count + 1
 
         if frame_count < 5:  # İlk 5 frame'i kaydet
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             cv2.imwrite(f"{debug_dir}/frame_{frame_count}.jpg", frame)
             cv2.imwrite(f"{debug_dir}/rgb_frame_{frame_count}.jpg", cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR))
             print(f"🔍 [DEBUG] Frame {frame_count} kaydedildi")
 
-        # Sonuçları işle - face_test.py ile aynı
-        if results.detections:
-            print(f"✅ [FACE] {len(results.detections)} yüz bulundu!")
-
-            for detection in results.detections:
-                confidence = detection.score[0]
-                print(f"   Confidence: {confidence:.1%}")
-
-            # Face mesh for detailed landmarks
-            mesh_results = face_mesh.process(rgb_frame)
+        # Sonuçları işle
+        if cascade.landmarks is not None or cascade.detection is not None:
+            if cascade.detected:
+                print(f"✅ [FACE] Yüz bulundu! Confidence: {cascade.detection.score[0]:.1%}")
+            else:
+                print(f"✅ [FACE] Yüz ROI içinde takip ediliyor {cascade.roi}")
 
-            if mesh_results.multi_face_landmarks:
-                landmarks = mesh_results.multi_face_landmarks[0]
+            if cascade.landmarks is not None:
+                landmarks = cascade.landmarks
 
                 # Emotion analysis
-                emotion, confidence = analyze_simple_emotion(landmarks, results.detections[0])
+                emotion, confidence = analyze_simple_emotion(landmarks, cascade.detection, frame, cascade.roi)
 
                 # Gaze detection
                 looking_at_screen = detect_gaze(landmarks, w, h)
@@ -245,6 +224,9 @@ def analyze_frame(frame):
     except Exception as e:
         print(f"❌ [EMOTION] Frame analysis error: {e}")
         current_emotion_data["faceDetected"] = False
+    finally:
+        cadence.end(time.time() - started)
+        cadence.observe(session_id, current_emotion_data["emotion"], current_emotion_data["faceDetected"])
 
 # API Endpoints
 @app.route('/health', methods=['GET'])
@@ -254,6 +236,8 @@ def health_check():
         "status": "healthy",
         "camera_active": camera_active,
         "model_loaded": True,
+        "analyzer": "student" if student is not None else "simple",
+        "cadence": cadence.stats(),
         "timestamp": datetime.now().isoformat()
     })
 
@@ -297,6 +281,7 @@ def analyze_frame_endpoint():
     try:
         data = request.json
         frame_base64 = data.get('frame')
+        session_id = str(data.get('sessionId') or request.remote_addr or "default")
 
         if not frame_base64:
             return jsonify({"error": "Frame data bulunamadı"}), 400
@@ -313,10 +298,12 @@ def analyze_frame_endpoint():
             return jsonify({"error": "Frame decode edilemedi"}), 400
 
         # Frame'i analiz et
-        analyze_frame(frame)
+        analyze_frame(frame, session_id)
 
-        # Güncel emotion data'yı döndür
-        return jsonify(current_emotion_data)
+        # Güncel emotion data'yı ve önerilen bir sonraki analiz aralığını döndür
+        resp = dict(current_emotion_data)
+        resp["nextAnalysisMs"] = int(cadence.recommend(session_id) * 1000)
+        return jsonify(resp)
 
     except Exception as e:
         print(f"❌ [ANALYZE FRAME] Hata: {e}")
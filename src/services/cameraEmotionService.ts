@@ -9,6 +9,8 @@ export interface CameraEmotionData {
   lookingAtScreen: boolean; // Python camelCase
   faceDetected: boolean; // Python field
   timestamp: string;
+  nextAnalysisMs?: number; // Server'ın önerdiği bir sonraki analiz aralığı
+  node?: string; // Session'ın sıcak state'ini tutan server node'u
 }
 
 class CameraEmotionService {
@@ -23,7 +25,27 @@ class CameraEmotionService {
   private onEmotionCallback?: (result: EmotionAnalysisResult) => void;
   private videoRef: React.RefObject<HTMLVideoElement> | null = null;
   private lastAnalysisTime = 0; // Son analiz zamanı (strict timing için)
-  private readonly ANALYSIS_INTERVAL = 3000; // 3 saniye strict interval
+  private readonly DEFAULT_ANALYSIS_INTERVAL = 3000; // Server öneri göndermezse 3 saniye
+  private readonly MIN_ANALYSIS_INTERVAL = 1000;
+  private readonly MAX_ANALYSIS_INTERVAL = 15000;
+  private analysisInterval = this.DEFAULT_ANALYSIS_INTERVAL; // Server'ın nextAnalysisMs önerisi
+  private readonly sessionId = this.createSessionId(); // Server tarafında cadence takibi için
+  private sessionNode: string | null = null; // Load balancer affinity ipucu (X-Session-Node)
+
+  private requestHeaders(): Record<string, string> {
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    if (this.sessionNode) {
+      headers['X-Session-Node'] = this.sessionNode;
+    }
+    return headers;
+  }
+
+  private createSessionId(): string {
+    if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+      return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+  }
 
   /**
    * Kamera erişimini kontrol et
@@ -97,10 +119,10 @@ class CameraEmotionService {
       // });
 
       // Video frame'ini düzenli olarak capture et ve analiz et
-      // Interval 1 saniye ama strict timing kontrolü ile gerçekten 3 saniyede bir analiz
+      // Interval 1 saniye ama strict timing kontrolü ile server'ın önerdiği aralıkta analiz
       this.pollInterval = setInterval(() => {
         this.captureAndAnalyzeFrame(videoElement);
-      }, 1000); // 1 saniyede bir kontrol, ama analiz 3 saniyede bir
+      }, 1000); // 1 saniyede bir kontrol, analiz nextAnalysisMs'e göre (varsayılan 3 saniye)
 
       console.log('✅ [EMOTION] Real-time kamera tracking aktif');
       return true;
@@ -123,12 +145,12 @@ class CameraEmotionService {
       return;
     }
 
-    // STRICT TIMING KONTROLÜ - 3 saniyede bir kesin analiz
+    // STRICT TIMING KONTROLÜ - server'ın önerdiği aralıkta analiz
     const now = Date.now();
-    if (this.lastAnalysisTime > 0 && (now - this.lastAnalysisTime) < this.ANALYSIS_INTERVAL) {
+    if (this.lastAnalysisTime > 0 && (now - this.lastAnalysisTime) < this.analysisInterval) {
       console.log('⏱️ [TIMING] Analiz çok erken, atlanıyor', {
         timeSinceLastAnalysis: `${now - this.lastAnalysisTime}ms`,
-        required: `${this.ANALYSIS_INTERVAL}ms`
+        required: `${this.analysisInterval}ms`
       });
       return;
     }
@@ -152,15 +174,18 @@ class CameraEmotionService {
       // Python server'a frame gönder
       const response = await fetch(`${this.pythonServerUrl}/analyze_frame`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: this.requestHeaders(),
         body: JSON.stringify({
-          frame: imageData.split(',')[1] // base64 kısmını al
+          frame: imageData.split(',')[1], // base64 kısmını al
+          sessionId: this.sessionId
         })
       });
 
       if (response.ok) {
         const data: CameraEmotionData = await response.json();
         const emotionResult = this.convertToEmotionResult(data);
+        this.applyServerCadence(data.nextAnalysisMs);
+        this.sessionNode = response.headers.get('X-Session-Node') || data.node || this.sessionNode;
 
         console.log('✅ [FRAME ANALYSIS] Analiz tamamlandı', {
           emotion: emotionResult.emotion,
@@ -178,6 +203,20 @@ class CameraEmotionService {
     }
   }
 
+  /**
+   * Server'ın önerdiği analiz aralığını güvenli sınırlar içinde uygula
+   */
+  private applyServerCadence(nextAnalysisMs?: number): void {
+    if (typeof nextAnalysisMs !== 'number' || !Number.isFinite(nextAnalysisMs)) {
+      this.analysisInterval = this.DEFAULT_ANALYSIS_INTERVAL;
+      return;
+    }
+    this.analysisInterval = Math.min(
+      this.MAX_ANALYSIS_INTERVAL,
+      Math.max(this.MIN_ANALYSIS_INTERVAL, nextAnalysisMs)
+    );
+  }
+
   /**
    * Python server'dan emotion data çek (fallback)
    */
@@ -185,10 +224,19 @@ class CameraEmotionService {
     if (!this.isActive) return;
 
     try {
-      const response = await fetch(`${this.pythonServerUrl}/emotion_data`, {
+      // Replikalar arasında tutarlı sonuç için kendi session'ımızı sor
+      const params = new URLSearchParams({ sessionId: this.sessionId });
+      let response = await fetch(`${this.pythonServerUrl}/emotion_data?${params}`, {
         method: 'GET',
-        headers: { 'Content-Type': 'application/json' }
+        headers: this.requestHeaders()
       });
+      if (response.status === 404) {
+        // Bu session henüz analiz edilmedi (örn. sadece server kamerası çalışıyor)
+        response = await fetch(`${this.pythonServerUrl}/emotion_data`, {
+          method: 'GET',
+          headers: this.requestHeaders()
+        });
+      }
 
       if (response.ok) {
         const data: CameraEmotionData = await response.json();
@@ -348,7 +396,8 @@ class CameraEmotionService {
 
     this.isAnalysisActive = true;
     this.lastAnalysisTime = 0; // Timing'i sıfırla - ilk analiz hemen yapılabilsin
-    console.log('🎥 [CAMERA] Frame analizi başlatıldı, strict 3s timing aktif');
+    this.analysisInterval = this.DEFAULT_ANALYSIS_INTERVAL;
+    console.log('🎥 [CAMERA] Frame analizi başlatıldı, server yönlendirmeli timing aktif');
   }
 
   /**